@@ -6,12 +6,26 @@
 from datetime import datetime, timedelta
 import os
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Union, Iterator, Iterable, Tuple
 import logging
 from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
 import warnings
+import ast
 import base64
+import hashlib
+import io
+import re
+import shutil
+import tempfile
+import zipfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from itertools import chain
+from urllib.parse import urlsplit
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
@@ -28,6 +42,7 @@ reportlab_available = True
 requests_available = True
 schedule_available = True
 email_available = True
+numexpr_available = True  # 可选：用于加速数值过滤
 
 # 模块引用
 pd = None
@@ -63,6 +78,7 @@ getSampleStyleSheet = None
 json = None
 requests = None
 schedule = None
+numexpr = None
 
 try:
     import pandas as pd
@@ -80,7 +96,8 @@ except ImportError as e:
 
 try:
     import openpyxl
-    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+    from openpyxl.cell import WriteOnlyCell
     from openpyxl.utils import get_column_letter
     from openpyxl.chart import BarChart, LineChart, PieChart, ScatterChart, Reference, Series
 except ImportError as e:
@@ -105,7 +122,7 @@ except ImportError as e:
 try:
     from reportlab.lib import colors
     from reportlab.lib.pagesizes import letter, A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+    from reportlab.platypus import SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph
     from reportlab.lib.styles import getSampleStyleSheet
 except ImportError as e:
     reportlab_available = False
@@ -138,6 +155,12 @@ except ImportError as e:
     logger.error(f"导入 email 模块失败: {e}")
     print(f"警告: 导入 email 模块失败: {e}")
 
+try:
+    import numexpr
+except ImportError:
+    # numexpr 为可选依赖，缺失时使用NumPy计算
+    numexpr_available = False
+
 try:
     import json
 except ImportError as e:
@@ -620,12 +643,33 @@ class ScheduleManager:
         self.running = True
         logger.info("启动调度器")
         
+        # 预热调度任务使用的数据库连接池
+        self._warm_up_engines()
+        
         # 在单独的线程中运行调度器
-        import threading
         self._thread = threading.Thread(target=self._run_scheduler, daemon=True)
         self._thread.start()
         return True
     
+    def _warm_up_engines(self):
+        """为调度任务中的SQL数据源预热连接池"""
+        sources = {}
+        for report_config, _ in self.tasks.values():
+            ds_configs = list(report_config.data_sources)
+            if report_config.data_source_type == 'sql' and report_config.data_source_path:
+                ds_configs.append(DataSourceConfig(
+                    type='sql',
+                    path=report_config.data_source_path,
+                    parameters=report_config.parameters or {}
+                ))
+            for ds_config in ds_configs:
+                if ds_config.type.lower() == 'sql':
+                    pool_options = SQLEngineRegistry.get_pool_options(ds_config.parameters)
+                    sources[(ds_config.path, tuple(sorted(pool_options.items())))] = pool_options
+        
+        if sources:
+            engine_registry.warm_up([(path, options) for (path, _), options in sources.items()])
+    
     def _run_scheduler(self):
         """在后台运行调度器的内部方法"""
         while self.running:
@@ -829,13 +873,275 @@ def get_config_from_dict(config_dict: Dict[str, Any]) -> ReportConfig:
         data_source_path=config_dict.get('data_source_path')
     )
 
+class FrameCache:
+    """基于文件指纹的列式磁盘缓存
+
+    每个缓存条目是一个目录，每列保存为一个 .npy 文件，读取时通过内存映射加载；
+    条目按最近使用时间进行 LRU 淘汰，总大小不超过 max_bytes。
+    字符串列保存为UTF-8字节缓冲区、偏移量和空值掩码，占用空间与实际文本长度成正比；
+    缓冲区同样通过内存映射读取，但字符串对象需要在读取时解码生成。
+    """
+
+    DEFAULT_DIR = os.path.join(str(Path(__file__).parent), '.cache', 'frames')
+    DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2GB
+    META_FILE = 'meta.json'
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or self.DEFAULT_DIR
+        self.max_bytes = max_bytes or self.DEFAULT_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(path: str, **extra) -> str:
+        """根据路径、文件大小、修改时间及读取参数生成缓存键"""
+        stat = os.stat(path)
+        fingerprint = [os.path.abspath(path), stat.st_size, stat.st_mtime_ns, sorted(extra.items())]
+        return hashlib.sha256(
+            json.dumps(fingerprint, ensure_ascii=False, default=str).encode('utf-8')
+        ).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> Optional['pd.DataFrame']:
+        """读取缓存的数据框，未命中时返回None"""
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, self.META_FILE)
+        if not os.path.exists(meta_path):
+            self.misses += 1
+            return None
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+
+            columns = {}
+            for position, col_meta in enumerate(meta['columns']):
+                # 使用写时复制的内存映射，避免只读数组导致后续处理失败
+                values = np.load(os.path.join(entry_dir, col_meta['file']), mmap_mode='c').view(np.ndarray)
+                kind = col_meta['kind']
+                if kind == 'utf8':
+                    offsets = np.load(os.path.join(entry_dir, col_meta['offsets']))
+                    series = pd.Series(self._decode_strings(values, offsets), dtype=col_meta['dtype'])
+                    mask = np.load(os.path.join(entry_dir, col_meta['mask']))
+                    if mask.any():
+                        series = series.where(~mask, None)
+                elif kind == 'category':
+                    categories = np.load(os.path.join(entry_dir, col_meta['categories']))
+                    series = pd.Series(pd.Categorical.from_codes(
+                        values, categories=categories, ordered=col_meta.get('ordered', False)
+                    ))
+                elif kind == 'numpy':
+                    series = pd.Series(values, copy=False)
+                else:
+                    raise ValueError(f"未知的列类型: {kind}")
+                columns[position] = series
+
+            df = pd.DataFrame(columns, copy=False)
+            df.columns = [col_meta['name'] for col_meta in meta['columns']]
+
+            # 更新访问时间，用于LRU淘汰
+            os.utime(meta_path)
+            self.hits += 1
+            return df
+        except Exception as e:
+            logger.warning(f"读取缓存失败，将重新解析数据: {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, df: 'pd.DataFrame', extra: Optional[Dict[str, Any]] = None) -> bool:
+        """将数据框写入缓存
+
+        包含不支持的列类型（或非默认索引）时跳过缓存并返回False。缓存目录可能被共享，
+        条目只使用按列的 .npy 格式（不允许pickle），读取时不会执行任意代码。
+        extra 为随条目保存的附加元数据，可通过 get_extra 读取。
+        """
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+
+        try:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            columns_meta = self._write_columns(tmp_dir, df)
+            if columns_meta is None:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return False
+            meta = {'columns': columns_meta}
+
+            size = sum(
+                os.path.getsize(os.path.join(tmp_dir, filename)) for filename in os.listdir(tmp_dir)
+            )
+            meta.update({'rows': len(df), 'size': size, 'created_at': datetime.now().isoformat(),
+                         'extra': extra})
+            with open(os.path.join(tmp_dir, self.META_FILE), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, default=str)
+
+            # 原子替换，避免并发读取到写了一半的条目
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+            logger.info(f"数据已写入缓存: {key[:12]}（{size/1024/1024:.2f}MB）")
+        except Exception as e:
+            logger.warning(f"写入缓存失败: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+
+        self._evict()
+        return True
+
+    def _write_columns(self, entry_dir: str, df: 'pd.DataFrame') -> Optional[List[Dict[str, Any]]]:
+        """按列写入数据，遇到不支持的索引或列类型时返回None"""
+        if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1:
+            logger.debug("数据框索引不是默认索引，无法按列缓存")
+            return None
+
+        columns_meta = []
+        for position, name in enumerate(df.columns):
+            col_meta = self._write_column(entry_dir, f"col_{position:04d}", df.iloc[:, position])
+            if col_meta is None:
+                logger.debug(f"列 '{name}' 的数据类型不支持按列缓存")
+                return None
+            col_meta['name'] = name
+            columns_meta.append(col_meta)
+        return columns_meta
+
+    def get_extra(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取条目的附加元数据，条目不存在时返回None"""
+        meta_path = os.path.join(self._entry_dir(key), self.META_FILE)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('extra') or {}
+        except (OSError, ValueError):
+            return None
+
+    def update_extra(self, key: str, extra: Dict[str, Any]) -> bool:
+        """更新条目的附加元数据（不重写数据）"""
+        meta_path = os.path.join(self._entry_dir(key), self.META_FILE)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            meta['extra'] = {**(meta.get('extra') or {}), **extra}
+            tmp_path = f"{meta_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, meta_path)
+            return True
+        except (OSError, ValueError) as e:
+            logger.warning(f"更新缓存元数据失败: {e}")
+            return False
+
+    @staticmethod
+    def _write_column(entry_dir: str, name: str, series: 'pd.Series') -> Optional[Dict[str, Any]]:
+        """写入单列数据，返回列元数据"""
+        dtype = series.dtype
+
+        if isinstance(dtype, pd.CategoricalDtype):
+            categories = np.asarray(dtype.categories)
+            if categories.dtype.kind not in 'biufcMmU' and not all(isinstance(v, str) for v in categories):
+                return None
+            np.save(os.path.join(entry_dir, f"{name}.npy"), series.cat.codes.to_numpy())
+            np.save(os.path.join(entry_dir, f"{name}.categories.npy"), categories.astype(str)
+                    if categories.dtype.kind == 'O' else categories)
+            return {'kind': 'category', 'file': f"{name}.npy",
+                    'categories': f"{name}.categories.npy", 'ordered': bool(dtype.ordered)}
+
+        if isinstance(dtype, np.dtype) and dtype.kind in 'biufcMm':
+            np.save(os.path.join(entry_dir, f"{name}.npy"), series.to_numpy())
+            return {'kind': 'numpy', 'file': f"{name}.npy"}
+
+        if dtype == object or pd.api.types.is_string_dtype(dtype):
+            mask = series.isna().to_numpy()
+            values = series.to_numpy(dtype=object)
+            if not all(isinstance(v, str) for v in values[~mask]):
+                return None
+            encoded = [value.encode('utf-8') for value in np.where(mask, '', values)]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+            np.save(os.path.join(entry_dir, f"{name}.npy"), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+            np.save(os.path.join(entry_dir, f"{name}.offsets.npy"), offsets)
+            np.save(os.path.join(entry_dir, f"{name}.mask.npy"), mask)
+            return {'kind': 'utf8', 'file': f"{name}.npy", 'offsets': f"{name}.offsets.npy",
+                    'mask': f"{name}.mask.npy", 'dtype': str(dtype)}
+
+        return None
+
+    @staticmethod
+    def _decode_strings(buffer: 'np.ndarray', offsets: 'np.ndarray') -> List[str]:
+        """将UTF-8字节缓冲区按偏移量切分为字符串（整体解码一次，再按字符偏移切片）"""
+        # 字节偏移减去之前的UTF-8后续字节数即为字符偏移
+        continuation = np.zeros(len(buffer) + 1, dtype=np.int64)
+        np.cumsum((buffer & 0xC0) == 0x80, out=continuation[1:])
+        char_offsets = (offsets - continuation[offsets]).tolist()
+        text = buffer.tobytes().decode('utf-8')
+        return [text[start:stop] for start, stop in zip(char_offsets[:-1], char_offsets[1:])]
+
+    def _evict(self):
+        """按最近使用时间淘汰缓存条目，直到总大小不超过上限"""
+        entries = []
+        total_size = 0
+        for key in os.listdir(self.cache_dir):
+            meta_path = os.path.join(self._entry_dir(key), self.META_FILE)
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    size = json.load(f).get('size', 0)
+                entries.append((os.path.getmtime(meta_path), size, key))
+                total_size += size
+            except (OSError, ValueError):
+                continue
+
+        for _, size, key in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total_size -= size
+            logger.info(f"淘汰缓存条目: {key[:12]}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存命中统计"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+_frame_caches: Dict[Tuple[str, int], FrameCache] = {}
+
+
+def get_frame_cache(cache_dir: Optional[str] = None, max_bytes: Optional[int] = None) -> FrameCache:
+    """获取（按目录复用的）数据框缓存实例"""
+    cache_key = (cache_dir or FrameCache.DEFAULT_DIR, max_bytes or FrameCache.DEFAULT_MAX_BYTES)
+    if cache_key not in _frame_caches:
+        _frame_caches[cache_key] = FrameCache(*cache_key)
+    return _frame_caches[cache_key]
+
 class DataSource(ABC):
     """数据源抽象基类"""
     
+    # 数据验证要求的列，查询计划裁剪列时始终保留
+    REQUIRED_COLUMNS: Tuple[str, ...] = ()
+    
     @abstractmethod
     def load_data(self, config: ReportConfig) -> 'pd.DataFrame':
         pass
-    
+
+    def iter_chunks(self, config: ReportConfig) -> Iterator['pd.DataFrame']:
+        """按批次产出数据（默认实现：整体加载后作为单个批次产出）"""
+        yield self.load_data(config)
+
+    def should_stream(self, config: ReportConfig) -> bool:
+        """是否使用流式处理（默认仅在参数 streaming 为 True 时启用）"""
+        return bool((config.parameters or {}).get('streaming', False))
+
+    def _get_frame_cache(self, config: ReportConfig) -> Optional[FrameCache]:
+        """获取数据框缓存（参数 cache 为 False 时禁用）"""
+        parameters = config.parameters or {}
+        if not parameters.get('cache', True):
+            return None
+        try:
+            return get_frame_cache(parameters.get('cache_dir'), parameters.get('cache_max_bytes'))
+        except OSError as e:
+            logger.warning(f"缓存目录不可用，跳过缓存: {e}")
+            return None
+
     def validate_data(self, df: 'pd.DataFrame') -> bool:
         """验证数据（默认实现）"""
         # 基础数据验证
@@ -844,69 +1150,241 @@ class DataSource(ABC):
             return False
         return True
 
+def iter_xlsx_batches(path: str, sheet_name: Union[str, int] = 0,
+                      batch_size: int = 50000,
+                      columns: Optional[List[str]] = None) -> Iterator['pd.DataFrame']:
+    """以恒定内存流式读取xlsx工作表
+
+    使用 openpyxl 只读模式逐行解析工作表XML，不构建完整的单元格对象树，
+    第一行作为表头，每 batch_size 行产出一个数据框（索引在批次之间连续）。
+    指定 columns 时只保留这些列（不存在的列忽略）。
+    """
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, int):
+            worksheet = workbook.worksheets[sheet_name]
+        else:
+            worksheet = workbook[sheet_name]
+
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            yield pd.DataFrame()
+            return
+        names = [
+            value if value is not None else f"Unnamed: {i}" for i, value in enumerate(header)
+        ]
+        width = len(names)
+        keep = None
+        if columns is not None:
+            selected = set(columns)
+            keep = [i for i, name in enumerate(names) if name in selected]
+            names = [names[i] for i in keep]
+
+        start = 0
+        batch = []
+        for row in rows:
+            if len(row) != width:
+                row = (tuple(row) + (None,) * width)[:width]
+            if keep is not None:
+                row = tuple(row[i] for i in keep)
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch, columns=names, index=pd.RangeIndex(start, start + len(batch)))
+                start += len(batch)
+                batch = []
+        if batch or start == 0:
+            yield pd.DataFrame(batch, columns=names, index=pd.RangeIndex(start, start + len(batch)))
+    finally:
+        workbook.close()
+
+
+def _read_excel_sheet(path: str, engine: Optional[str], sheet_name: Union[str, int],
+                      chunksize: Optional[int] = None,
+                      columns: Optional[List[str]] = None) -> 'pd.DataFrame':
+    """读取单个工作表（模块级函数，便于在进程池中执行）"""
+    if chunksize and engine == 'openpyxl':
+        # pd.read_excel 不支持分块读取，使用流式读取器
+        return pd.concat(iter_xlsx_batches(path, sheet_name, chunksize, columns), ignore_index=True)
+    usecols = None
+    if columns is not None:
+        selected = set(columns)
+        usecols = lambda name: name in selected
+    return pd.read_excel(path, engine=engine, sheet_name=sheet_name, usecols=usecols)
+
+
 class ExcelDataSource(DataSource):
-    """Excel数据源"""
+    """Excel数据源
+
+    工作表按需解析：
+        - sheet_name: 读取指定的单个工作表
+        - sheets: 工作表名称列表或 'all'，读取后按 sheet_combine 合并
+        - sheet_combine: 'concat'（按行拼接）或 'union'（拼接后去重），默认 'concat'
+        - sheet_column: 可选，记录来源工作表名称的列名
+        - sheet_workers: 多个工作表时并行解析的进程数，默认1（顺序解析）
+    未指定工作表时只解析第一个工作表。
+    
+    流式读取（xlsx）：
+        - streaming: True/False/'auto'，'auto' 时文件超过 LARGE_FILE_SIZE 自动启用
+        - chunksize: 每批行数，默认 DEFAULT_CHUNKSIZE
+    
+    projection: 查询计划确定的列清单，只解析这些列
+    """
+    
+    REQUIRED_COLUMNS = ('日期', '金额', '类别')
+    SHEET_COMBINE_MODES = ('concat', 'union')
+    LARGE_FILE_SIZE = 50 * 1024 * 1024
+    DEFAULT_CHUNKSIZE = 50000
+    
+    @staticmethod
+    def _get_engine(path: str) -> Optional[str]:
+        """根据扩展名选择Excel读取引擎"""
+        if path.endswith('.xlsx'):
+            return 'openpyxl'
+        elif path.endswith('.xls'):
+            return 'xlrd'
+        return None
+    
+    def _select_sheets(self, config: ReportConfig, engine: Optional[str]) -> List[Union[str, int]]:
+        """确定需要解析的工作表，未指定时只解析第一个"""
+        parameters = config.parameters or {}
+        if 'sheet_name' in parameters:
+            sheet_name = parameters['sheet_name']
+            return list(sheet_name) if isinstance(sheet_name, (list, tuple)) else [sheet_name]
+        
+        sheets = parameters.get('sheets')
+        if sheets is None:
+            return [0]
+        if sheets == 'all':
+            with pd.ExcelFile(config.data_source_path, engine=engine) as xl:
+                return list(xl.sheet_names)
+        return list(sheets)
+    
+    def _read_sheets(self, path: str, engine: Optional[str], sheets: List[Union[str, int]],
+                     chunksize: Optional[int], workers: int,
+                     columns: Optional[List[str]] = None) -> List['pd.DataFrame']:
+        """解析选定的工作表，多个工作表时可在进程池中并行解析"""
+        if len(sheets) > 1 and workers > 1:
+            logger.info(f"使用 {min(workers, len(sheets))} 个进程并行解析 {len(sheets)} 个工作表")
+            with ProcessPoolExecutor(max_workers=min(workers, len(sheets))) as executor:
+                return list(executor.map(
+                    _read_excel_sheet,
+                    [path] * len(sheets), [engine] * len(sheets), sheets, [chunksize] * len(sheets),
+                    [columns] * len(sheets)
+                ))
+        return [_read_excel_sheet(path, engine, sheet, chunksize, columns) for sheet in sheets]
+    
+    def _cache_key(self, frame_cache: FrameCache, config: ReportConfig) -> str:
+        """生成缓存键"""
+        parameters = config.parameters or {}
+        return frame_cache.make_key(
+            config.data_source_path,
+            source='excel',
+            sheet_name=parameters.get('sheet_name'),
+            sheets=parameters.get('sheets'),
+            sheet_combine=parameters.get('sheet_combine', 'concat'),
+            sheet_column=parameters.get('sheet_column'),
+            projection=parameters.get('projection')
+        )
+    
+    def should_stream(self, config: ReportConfig) -> bool:
+        """显式配置 streaming 时按配置处理，否则大型xlsx文件自动启用流式处理"""
+        streaming = (config.parameters or {}).get('streaming', 'auto')
+        if streaming != 'auto':
+            return bool(streaming)
+        return (self._get_engine(config.data_source_path) == 'openpyxl'
+                and os.path.getsize(config.data_source_path) > self.LARGE_FILE_SIZE)
+    
+    def iter_chunks(self, config: ReportConfig) -> Iterator['pd.DataFrame']:
+        """逐批读取工作表（xlsx使用恒定内存的流式读取器）"""
+        parameters = config.parameters or {}
+        engine = self._get_engine(config.data_source_path)
+        chunksize = parameters.get('chunksize') or self.DEFAULT_CHUNKSIZE
+        
+        # 命中缓存时直接按块切片，无需重新解析
+        frame_cache = self._get_frame_cache(config)
+        if frame_cache is not None:
+            cached = frame_cache.get(self._cache_key(frame_cache, config))
+            if cached is not None:
+                logger.info(f"使用缓存数据流式处理: {config.data_source_path}")
+                for start in range(0, max(len(cached), 1), chunksize):
+                    yield cached.iloc[start:start + chunksize]
+                return
+        
+        if engine != 'openpyxl':
+            yield self.load_data(config)
+            return
+        
+        if parameters.get('sheet_combine', 'concat') == 'union':
+            logger.warning("流式读取不支持 union 去重，将按 concat 方式拼接工作表")
+        sheet_column = parameters.get('sheet_column')
+        
+        logger.info(f"流式读取Excel: {config.data_source_path}（{chunksize} 行/批）")
+        offset = 0
+        loaded_rows = 0
+        for sheet in self._select_sheets(config, engine):
+            for batch in iter_xlsx_batches(config.data_source_path, sheet, chunksize,
+                                           parameters.get('projection')):
+                # 多个工作表之间保持索引连续
+                batch.index = batch.index + offset
+                if sheet_column:
+                    batch[sheet_column] = sheet
+                loaded_rows += len(batch)
+                logger.info(f"已读取 {loaded_rows} 行数据")
+                yield batch
+            offset = loaded_rows
     
     def load_data(self, config: ReportConfig) -> 'pd.DataFrame':
         try:
             logger.info(f"从Excel加载数据: {config.data_source_path}")
+            parameters = config.parameters or {}
+            
+            sheet_combine = parameters.get('sheet_combine', 'concat')
+            if sheet_combine not in self.SHEET_COMBINE_MODES:
+                raise ValueError(f"不支持的工作表合并方式: {sheet_combine}")
+            sheet_column = parameters.get('sheet_column')
+            
+            # 文件未变化时直接使用缓存，跳过解析
+            frame_cache = self._get_frame_cache(config)
+            if frame_cache is not None:
+                cache_key = self._cache_key(frame_cache, config)
+                df = frame_cache.get(cache_key)
+                if df is not None:
+                    logger.info(f"使用缓存数据，形状: {df.shape}")
+                    return df
             
             # 支持多种Excel读取方式
-            if config.data_source_path.endswith('.xlsx'):
-                engine = 'openpyxl'
-            elif config.data_source_path.endswith('.xls'):
-                engine = 'xlrd'
-            else:
-                engine = None
+            engine = self._get_engine(config.data_source_path)
             
-            # 获取分块大小参数
-            chunksize = config.parameters.get('chunksize', None)
+            # 只解析实际使用的工作表
+            sheets = self._select_sheets(config, engine)
+            frames = self._read_sheets(
+                config.data_source_path,
+                engine,
+                sheets,
+                parameters.get('chunksize', None),
+                int(parameters.get('sheet_workers', 1) or 1),
+                parameters.get('projection')
+            )
             
-            # 读取Excel文件
-            if 'sheet_name' in config.parameters:
-                sheet_name = config.parameters.get('sheet_name')
-                
-                if chunksize:
-                    # 分块加载大数据
-                    chunks = []
-                    for chunk in pd.read_excel(
-                        config.data_source_path,
-                        engine=engine,
-                        sheet_name=sheet_name,
-                        chunksize=chunksize
-                    ):
-                        chunks.append(chunk)
-                    df = pd.concat(chunks, ignore_index=True)
-                else:
-                    df = pd.read_excel(
-                        config.data_source_path,
-                        engine=engine,
-                        sheet_name=sheet_name
-                    )
+            if len(frames) == 1:
+                df = frames[0]
+                if sheet_column:
+                    df = df.assign(**{sheet_column: sheets[0]})
             else:
-                # 尝试读取所有sheet
-                xl = pd.ExcelFile(config.data_source_path, engine=engine)
-                if len(xl.sheet_names) > 1:
-                    dfs = {}
-                    for sheet in xl.sheet_names:
-                        if chunksize:
-                            chunks = []
-                            for chunk in xl.parse(sheet, chunksize=chunksize):
-                                chunks.append(chunk)
-                            dfs[sheet] = pd.concat(chunks, ignore_index=True)
-                        else:
-                            dfs[sheet] = xl.parse(sheet)
-                    # 合并所有sheet或选择第一个
-                    df = dfs[list(dfs.keys())[0]]
-                else:
-                    sheet_name = xl.sheet_names[0]
-                    if chunksize:
-                        chunks = []
-                        for chunk in xl.parse(sheet_name, chunksize=chunksize):
-                            chunks.append(chunk)
-                        df = pd.concat(chunks, ignore_index=True)
-                    else:
-                        df = xl.parse(sheet_name)
+                df = pd.concat(frames, ignore_index=True)
+                # 来源工作表列在去重之后添加，union 只按数据列判断重复（保留第一次出现的工作表）
+                tags = np.repeat(np.array(sheets, dtype=object), [len(frame) for frame in frames])
+                if sheet_combine == 'union':
+                    keep = ~df.duplicated().to_numpy()
+                    df = df[keep].reset_index(drop=True)
+                    tags = tags[keep]
+                if sheet_column:
+                    df[sheet_column] = tags
+                logger.info(f"已合并 {len(frames)} 个工作表（{sheet_combine}）")
+            
+            if frame_cache is not None:
+                frame_cache.put(cache_key, df)
             
             logger.info(f"数据加载完成，形状: {df.shape}")
             return df
@@ -934,8 +1412,7 @@ class ExcelDataSource(DataSource):
             return False
         
         # 检查必要列
-        required_cols = ['日期', '金额', '类别']  # 可根据配置调整
-        missing_cols = [col for col in required_cols if col not in df.columns]
+        missing_cols = [col for col in self.REQUIRED_COLUMNS if col not in df.columns]
         
         if missing_cols:
             logger.warning(f"缺少必要列: {missing_cols}")
@@ -944,48 +1421,544 @@ class ExcelDataSource(DataSource):
         return True
 
 class CSVDataSource(DataSource):
-    """CSV数据源"""
-    
+    """CSV数据源
+
+    projection 为查询计划确定的列清单，转换为 usecols 只解析这些列（已显式指定 usecols 时不生效）。
+    """
+
+    # 大文件阈值（超过后默认启用流式处理）与默认分块大小
+    LARGE_FILE_SIZE = 100 * 1024 * 1024
+    DEFAULT_CHUNKSIZE = 100000
+    # 由引擎使用、不传递给 pd.read_csv 的参数
+    ENGINE_PARAMETERS = {'streaming', 'chunksize', 'cache', 'cache_dir', 'cache_max_bytes',
+                         'projection', 'predicates', 'pushdown', 'output_columns', 'max_concurrent_sources',
+                         'optimize_dtypes', 'approximate_metrics', 'incremental', 'business_rules',
+                         'memory_budget', 'merge_config', 'spill_dir', 'spill_workers', 'excel', 'pdf'}
+    # 使用这些参数时无法按字节偏移读取追加的数据
+    NON_APPENDABLE_PARAMETERS = ('header', 'names', 'skiprows', 'skipfooter', 'nrows', 'index_col', 'compression')
+
+    def _get_csv_params(self, config: ReportConfig, apply_projection: bool = True) -> Dict[str, Any]:
+        """获取传递给 pd.read_csv 的参数"""
+        parameters = config.parameters or {}
+        csv_params = {
+            key: value for key, value in parameters.items()
+            if key not in self.ENGINE_PARAMETERS
+        }
+        if 'parse_dates' not in csv_params:
+            # 尝试自动解析所有可能的日期列
+            csv_params['parse_dates'] = True
+        projection = parameters.get('projection')
+        if apply_projection and projection is not None and 'usecols' not in csv_params:
+            # 不存在的列直接忽略，不会导致读取失败
+            selected = set(projection)
+            csv_params['usecols'] = lambda name: name in selected
+        return csv_params
+
+    def should_stream(self, config: ReportConfig) -> bool:
+        """显式配置 streaming 时按配置处理，否则大文件自动启用流式处理"""
+        streaming = (config.parameters or {}).get('streaming', 'auto')
+        if streaming != 'auto':
+            return bool(streaming)
+        return os.path.getsize(config.data_source_path) > self.LARGE_FILE_SIZE
+
+    def _get_cached(self, config: ReportConfig) -> Tuple[Optional[FrameCache], Optional[str], Optional['pd.DataFrame']]:
+        """查询缓存，返回 (缓存实例, 缓存键, 缓存数据)"""
+        frame_cache = self._get_frame_cache(config)
+        if frame_cache is None:
+            return None, None, None
+        cache_key = frame_cache.make_key(
+            config.data_source_path, source='csv', params=self._get_csv_params(config, apply_projection=False),
+            projection=(config.parameters or {}).get('projection')
+        )
+        return frame_cache, cache_key, frame_cache.get(cache_key)
+
+    def iter_chunks(self, config: ReportConfig) -> Iterator['pd.DataFrame']:
+        """逐块读取CSV，每次只在内存中保留一个分块"""
+        chunksize = (config.parameters or {}).get('chunksize') or self.DEFAULT_CHUNKSIZE
+
+        # 命中缓存时直接按块切片（内存映射数据，无需重新解析）
+        _, _, cached = self._get_cached(config)
+        if cached is not None:
+            logger.info(f"使用缓存数据流式处理: {config.data_source_path}")
+            for start in range(0, max(len(cached), 1), chunksize):
+                yield cached.iloc[start:start + chunksize]
+            return
+
+        logger.info(f"流式读取CSV: {config.data_source_path}（{chunksize} 行/块）")
+
+        loaded_rows = 0
+        with pd.read_csv(
+            config.data_source_path,
+            chunksize=chunksize,
+            **self._get_csv_params(config)
+        ) as reader:
+            for chunk in reader:
+                loaded_rows += len(chunk)
+                logger.info(f"已读取 {loaded_rows} 行数据")
+                yield chunk
+
+    def supports_append(self, config: ReportConfig) -> bool:
+        """表头在首行且未压缩时，可以按字节偏移读取追加的数据"""
+        csv_params = self._get_csv_params(config, apply_projection=False)
+        if any(key in csv_params for key in self.NON_APPENDABLE_PARAMETERS):
+            return False
+        return not config.data_source_path.lower().endswith(('.gz', '.bz2', '.zip', '.xz', '.zst'))
+
+    def read_header(self, config: ReportConfig) -> List[str]:
+        """读取CSV表头（不应用列裁剪）"""
+        csv_params = self._get_csv_params(config, apply_projection=False)
+        csv_params.pop('usecols', None)
+        return list(pd.read_csv(config.data_source_path, nrows=0, **csv_params).columns)
+
+    def iter_appended(self, config: ReportConfig, start: int, end: int,
+                      header: List[str]) -> Iterator['pd.DataFrame']:
+        """逐块读取字节区间 [start, end) 内追加的数据行"""
+        with open(config.data_source_path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        if not data.strip():
+            return
+        logger.info(f"读取追加的CSV数据: {len(data)} 字节")
+
+        csv_params = self._get_csv_params(config)
+        csv_params.update(header=None, names=header)
+        chunksize = (config.parameters or {}).get('chunksize') or self.DEFAULT_CHUNKSIZE
+        with pd.read_csv(io.BytesIO(data), chunksize=chunksize, **csv_params) as reader:
+            yield from reader
+
     def load_data(self, config: ReportConfig) -> 'pd.DataFrame':
         try:
             logger.info(f"从CSV加载数据: {config.data_source_path}")
-            
+
+            # 文件未变化时直接使用缓存，跳过解析
+            frame_cache, cache_key, df = self._get_cached(config)
+            if df is not None:
+                logger.info(f"使用缓存数据，共 {len(df)} 行")
+                return df
+
             # 检查文件大小
             file_size = os.path.getsize(config.data_source_path)
-            
-            # 设置默认参数，自动解析日期列
-            csv_params = config.parameters.copy()
-            if 'parse_dates' not in csv_params:
-                # 尝试自动解析所有可能的日期列
-                csv_params['parse_dates'] = True
-            
-            if file_size > 100 * 1024 * 1024:  # 大于100MB
+
+            if file_size > self.LARGE_FILE_SIZE:
                 logger.info(f"检测到大型CSV文件 ({file_size/1024/1024:.2f}MB)，使用分块加载")
-                
-                # 分块读取数据
-                chunks = []
-                for chunk in pd.read_csv(
-                    config.data_source_path,
-                    chunksize=100000,  # 10万行/块
-                    **csv_params
-                ):
-                    chunks.append(chunk)
-                    logger.info(f"已加载 {len(chunks) * 100000} 行数据")
-                
-                # 合并数据
-                df = pd.concat(chunks, ignore_index=True)
+                df = pd.concat(self.iter_chunks(config), ignore_index=True)
             else:
                 # 小文件直接读取
-                df = pd.read_csv(config.data_source_path, **csv_params)
-            
+                df = pd.read_csv(config.data_source_path, **self._get_csv_params(config))
+
+            if frame_cache is not None:
+                frame_cache.put(cache_key, df)
+
             logger.info(f"成功加载 {len(df)} 行数据")
             return df
         except Exception as e:
             logger.error(f"加载CSV数据失败: {e}")
             raise
 
+class SQLEngineRegistry:
+    """进程级SQLAlchemy引擎注册表
+
+    按连接字符串和连接池参数复用引擎，使连接池在同一进程内的多次报表运行之间保持有效，
+    避免每次加载都重新建立连接（包括TLS握手和认证）。
+    """
+
+    # 可通过数据源参数配置的连接池选项
+    POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_recycle', 'pool_pre_ping', 'pool_timeout')
+    DEFAULT_POOL_OPTIONS = {'pool_pre_ping': True, 'pool_recycle': 3600}
+
+    def __init__(self):
+        self._engines: Dict[Tuple[str, Tuple], Any] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def get_pool_options(cls, parameters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """从数据源参数中提取连接池选项"""
+        parameters = parameters or {}
+        return {key: parameters[key] for key in cls.POOL_OPTIONS if parameters.get(key) is not None}
+
+    def get_engine(self, connection_str: str, **pool_options) -> 'sa.engine.Engine':
+        """获取（或创建并注册）数据库引擎"""
+        options = {**self.DEFAULT_POOL_OPTIONS, **pool_options}
+        key = (connection_str, tuple(sorted(options.items())))
+
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is not None:
+                self.hits += 1
+                return engine
+
+            self.misses += 1
+            engine = self._create_engine(connection_str, options)
+            self._engines[key] = engine
+            logger.info(f"创建数据库引擎: {self._mask_url(connection_str)}，连接池选项: {options}")
+            return engine
+
+    @staticmethod
+    def _create_engine(connection_str: str, options: Dict[str, Any]) -> 'sa.engine.Engine':
+        """创建引擎，连接池不支持容量参数时去掉这些参数后重试"""
+        try:
+            return sa.create_engine(connection_str, **options)
+        except TypeError as e:
+            logger.warning(f"连接池不支持容量参数，使用默认连接池: {e}")
+            options = {key: value for key, value in options.items()
+                       if key not in ('pool_size', 'max_overflow', 'pool_timeout')}
+            return sa.create_engine(connection_str, **options)
+
+    @staticmethod
+    def _mask_url(connection_str: str) -> str:
+        """隐藏连接字符串中的密码"""
+        try:
+            return sa.engine.make_url(connection_str).render_as_string(hide_password=True)
+        except Exception:
+            return '<无法解析的连接字符串>'
+
+    def warm_up(self, sources: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, bool]:
+        """预热连接池：为每个数据源建立一次连接并执行探测查询
+
+        Args:
+            sources: (连接字符串, 连接池选项) 列表
+
+        Returns:
+            Dict[str, bool]: 每个连接（已隐藏密码）的预热结果
+        """
+        results = {}
+        for connection_str, pool_options in sources:
+            masked = self._mask_url(connection_str)
+            try:
+                engine = self.get_engine(connection_str, **pool_options)
+                with engine.connect() as conn:
+                    conn.execute(sa.text('SELECT 1'))
+                results[masked] = True
+                logger.info(f"连接池预热成功: {masked}")
+            except Exception as e:
+                results[masked] = False
+                logger.warning(f"连接池预热失败: {masked}，错误: {e}")
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取引擎复用统计及各连接池状态"""
+        with self._lock:
+            return {
+                'engines': len(self._engines),
+                'hits': self.hits,
+                'misses': self.misses,
+                'pools': {
+                    self._mask_url(connection_str): engine.pool.status()
+                    for (connection_str, _), engine in self._engines.items()
+                }
+            }
+
+    def dispose_all(self):
+        """释放所有引擎及其连接池"""
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+        logger.info("已释放所有数据库引擎")
+
+
+# 创建全局引擎注册表
+engine_registry = SQLEngineRegistry()
+
+class SQLPushdownBuilder:
+    """将报表的过滤条件与分组聚合翻译为SQL，在数据库端执行聚合
+
+    原始查询作为子查询包装：SELECT ... FROM (原始查询) AS _src WHERE ... GROUP BY ...
+    只翻译能与pandas语义保持一致的表达式，无法翻译时返回None，由调用方回退到pandas处理。
+    """
+
+    AGG_FUNCS = {'sum': 'SUM', 'mean': 'AVG', 'count': 'COUNT', 'min': 'MIN', 'max': 'MAX'}
+    PARAM_PREFIX = '_pushdown_'
+
+    def __init__(self, dialect):
+        self.preparer = dialect.identifier_preparer
+        self.params: Dict[str, Any] = {}
+
+    def quote(self, name: str) -> str:
+        """引用标识符"""
+        return self.preparer.quote_identifier(str(name))
+
+    def _bind(self, value: Any) -> str:
+        """注册绑定参数，返回占位符"""
+        name = f"{self.PARAM_PREFIX}{len(self.params)}"
+        self.params[name] = value
+        return f":{name}"
+
+    @staticmethod
+    def _is_scalar(value: Any) -> bool:
+        return isinstance(value, (str, int, float, bool, datetime)) and value is not None
+
+    def translate_filters(self, filters: Dict[str, Any]) -> Optional[List[str]]:
+        """将过滤条件翻译为WHERE子句列表，存在无法翻译的条件时返回None"""
+        clauses = []
+        for column, condition in (filters or {}).items():
+            col = self.quote(column)
+            if isinstance(condition, dict):
+                if 'min' in condition and 'max' in condition:
+                    if not (self._is_scalar(condition['min']) and self._is_scalar(condition['max'])):
+                        return None
+                    clauses.append(f"{col} >= {self._bind(condition['min'])} AND {col} <= {self._bind(condition['max'])}")
+                elif 'values' in condition:
+                    clause = self._translate_in(col, condition['values'])
+                    if clause is None:
+                        return None
+                    clauses.append(clause)
+                else:
+                    return None
+            elif isinstance(condition, list):
+                clause = self._translate_in(col, condition)
+                if clause is None:
+                    return None
+                clauses.append(clause)
+            elif self._is_scalar(condition):
+                clauses.append(f"{col} = {self._bind(condition)}")
+            else:
+                return None
+        return clauses
+
+    def _translate_in(self, col: str, values: List[Any]) -> Optional[str]:
+        if not all(self._is_scalar(value) for value in values):
+            return None
+        if not values:
+            return "1 = 0"
+        return f"{col} IN ({', '.join(self._bind(value) for value in values)})"
+
+    def _translate_aggregates(self, aggregate: Dict[str, Union[str, List[str]]]) -> Optional[List[Tuple[str, str, str]]]:
+        """翻译聚合定义，返回 (列名, 聚合函数, 结果别名) 列表"""
+        if not isinstance(aggregate, dict) or not aggregate:
+            return None
+        items = []
+        for column, funcs in aggregate.items():
+            func_list = list(funcs) if isinstance(funcs, (list, tuple)) else [funcs]
+            for func in func_list:
+                if not isinstance(func, str) or func not in self.AGG_FUNCS:
+                    return None
+                items.append((column, func, f"{column}__{func}"))
+        return items
+
+    def _select_aggregate(self, column: str, func: str, alias: str) -> str:
+        expression = f"{self.AGG_FUNCS[func]}({self.quote(column)})"
+        if func == 'sum':
+            # pandas 对全空分组求和结果为0
+            expression = f"COALESCE({expression}, 0)"
+        return f"{expression} AS {self.quote(alias)}"
+
+    def _build_query(self, base_query: str, group_cols: List[str],
+                     aggregates: List[Tuple[str, str, str]], where: List[str]) -> str:
+        # pandas 分组默认丢弃空键，并按分组键排序
+        where = where + [f"{self.quote(col)} IS NOT NULL" for col in group_cols]
+        select = [self.quote(col) for col in group_cols]
+        select += [self._select_aggregate(*item) for item in aggregates]
+        group_by = ', '.join(self.quote(col) for col in group_cols)
+        return (
+            f"SELECT {', '.join(select)} FROM ({base_query}) AS _src"
+            f" WHERE {' AND '.join(where)}"
+            f" GROUP BY {group_by} ORDER BY {group_by}"
+        )
+
+    def build(self, base_query: str, filters: Dict[str, Any],
+              calculation: Dict[str, Any]) -> Optional[Tuple[str, Any]]:
+        """生成下推查询
+
+        Returns:
+            (SQL语句, 结果整理函数) 或 None（无法下推）
+        """
+        where = self.translate_filters(filters)
+        if where is None:
+            return None
+        base_query = base_query.strip().rstrip(';')
+
+        if calculation.get('operation') == 'groupby':
+            group_cols = calculation.get('group_by', [])
+            aggregates = self._translate_aggregates(calculation.get('aggregate', {}))
+            if not group_cols or aggregates is None:
+                return None
+            group_cols = list(group_cols) if isinstance(group_cols, (list, tuple)) else [group_cols]
+            has_list = any(isinstance(funcs, (list, tuple)) for funcs in calculation['aggregate'].values())
+
+            def finalize(df: 'pd.DataFrame') -> 'pd.DataFrame':
+                # 还原为与 DataFrame.groupby().agg().reset_index() 相同的列结构
+                if has_list:
+                    df.columns = pd.MultiIndex.from_tuples(
+                        [(col, '') for col in group_cols] + [(col, func) for col, func, _ in aggregates]
+                    )
+                else:
+                    df.columns = group_cols + [col for col, _, _ in aggregates]
+                return df
+
+            return self._build_query(base_query, group_cols, aggregates, where), finalize
+
+        if calculation.get('operation') == 'pivot':
+            index = calculation.get('index', [])
+            columns = calculation.get('columns', [])
+            values = calculation.get('values', [])
+            aggfunc = calculation.get('aggfunc', 'mean')
+            if not index or not values or not isinstance(aggfunc, str) or aggfunc not in self.AGG_FUNCS:
+                return None
+            index_cols = list(index) if isinstance(index, (list, tuple)) else [index]
+            pivot_cols = list(columns) if isinstance(columns, (list, tuple)) else [columns]
+            value_cols = list(values) if isinstance(values, (list, tuple)) else [values]
+            aggregates = [(col, aggfunc, col) for col in value_cols]
+
+            def finalize(df: 'pd.DataFrame') -> 'pd.DataFrame':
+                # 每个单元格只有一个已聚合的值，透视时求和即保持原值
+                return pd.pivot_table(
+                    df, index=index, columns=columns, values=values, aggfunc='sum', fill_value=0
+                ).reset_index()
+
+            return self._build_query(base_query, index_cols + pivot_cols, aggregates, where), finalize
+
+        return None
+
 class SQLDataSource(DataSource):
-    """SQL数据库数据源"""
+    """SQL数据库数据源
+    
+    流式读取（streaming 为 True 时启用）：
+        - chunksize: 每批行数，默认 DEFAULT_CHUNKSIZE
+        - dtype: 可选，列类型映射；未指定时以首批数据的类型为准统一后续批次
+    支持服务端游标的方言使用 stream_results 逐批拉取结果，其余方言按批次读取游标。
+    
+    查询计划下推：projection（列清单）和 predicates（过滤条件）将原查询包装为子查询，
+    只选择需要的列并在数据库端过滤。
+    """
+    
+    DEFAULT_CHUNKSIZE = 50000
+    
+    def _apply_plan(self, conn, query: str, params: Any,
+                    parameters: Dict[str, Any]) -> Tuple[Any, Any]:
+        """按查询计划包装查询：只选择 projection 中的列，并将可翻译的 predicates 下推为WHERE子句
+        
+        无法包装（位置参数、pushdown 为 False 或执行失败）时返回原查询。
+        """
+        projection = parameters.get('projection')
+        predicates = parameters.get('predicates')
+        if not (projection or predicates) or not parameters.get('pushdown', True):
+            return query, params
+        if params and not isinstance(params, dict):
+            return query, params
+        params = params or {}
+        
+        try:
+            base_query = query.strip().rstrip(';')
+            # 只获取结果集的列名，不读取数据
+            available = list(pd.read_sql_query(
+                sa.text(f"SELECT * FROM ({base_query}) AS _src WHERE 1 = 0"), conn, params=params
+            ).columns)
+            builder = SQLPushdownBuilder(conn.dialect)
+            
+            select = '*'
+            if projection:
+                selected = set(projection)
+                columns = [col for col in available if col in selected]
+                if columns and len(columns) < len(available):
+                    select = ', '.join(builder.quote(col) for col in columns)
+            
+            where = []
+            for column, condition in (predicates or {}).items():
+                if column not in available:
+                    continue
+                bound = dict(builder.params)
+                clauses = builder.translate_filters({column: condition})
+                if clauses is None:
+                    # 无法翻译的条件留给pandas处理
+                    builder.params = bound
+                    continue
+                where.extend(clauses)
+            
+            if select == '*' and not where:
+                return query, params
+            planned = f"SELECT {select} FROM ({base_query}) AS _src"
+            if where:
+                planned += f" WHERE {' AND '.join(where)}"
+            logger.info(f"按查询计划读取: {planned}")
+            return sa.text(planned), {**params, **builder.params}
+        except Exception as e:
+            logger.warning(f"应用查询计划失败，使用原查询: {e}")
+            return query, params
+    
+    def iter_chunks(self, config: ReportConfig) -> Iterator['pd.DataFrame']:
+        """使用服务端游标按批次产出类型一致的数据框"""
+        parameters = config.parameters or {}
+        query = parameters.get('query')
+        params = parameters.get('params', {})
+        chunksize = parameters.get('chunksize') or self.DEFAULT_CHUNKSIZE
+        dtype = parameters.get('dtype')
+        
+        if not query:
+            raise ValueError("SQL查询不能为空")
+        
+        engine = engine_registry.get_engine(
+            config.data_source_path, **SQLEngineRegistry.get_pool_options(parameters)
+        )
+        logger.info(f"流式读取SQL查询结果（{chunksize} 行/批）")
+        
+        with engine.connect() as conn:
+            query, params = self._apply_plan(conn, query, params, parameters)
+            conn = conn.execution_options(stream_results=True, max_row_buffer=chunksize)
+            schema = None
+            loaded_rows = 0
+            for batch in pd.read_sql_query(query, conn, params=params, chunksize=chunksize, dtype=dtype):
+                if schema is None:
+                    schema = batch.dtypes
+                elif dtype is None:
+                    batch = self._align_dtypes(batch, schema)
+                batch.index = pd.RangeIndex(loaded_rows, loaded_rows + len(batch))
+                loaded_rows += len(batch)
+                logger.info(f"已读取 {loaded_rows} 行数据")
+                yield batch
+            
+            if schema is None:
+                # 查询无结果时仍产出带列名的空数据框
+                yield pd.read_sql_query(query, conn, params=params, dtype=dtype)
+    
+    @staticmethod
+    def _align_dtypes(batch: 'pd.DataFrame', schema: 'pd.Series') -> 'pd.DataFrame':
+        """将批次的列类型统一为首批数据的类型，无法安全转换的列保持原样"""
+        for col, target in schema.items():
+            if col in batch.columns and batch[col].dtype != target:
+                try:
+                    batch[col] = batch[col].astype(target)
+                except (TypeError, ValueError):
+                    logger.debug(f"列 '{col}' 无法转换为 {target}，保留类型 {batch[col].dtype}")
+        return batch
+    
+    def load_pushdown(self, config: ReportConfig, filters: Dict[str, Any],
+                      calculation: Dict[str, Any]) -> Optional['pd.DataFrame']:
+        """将过滤条件和分组/透视计算下推到数据库执行
+        
+        Returns:
+            聚合后的数据框；无法下推或下推执行失败时返回None，由调用方回退到pandas处理
+        """
+        parameters = config.parameters or {}
+        query = parameters.get('query')
+        params = parameters.get('params', {}) or {}
+        # 只有命名参数（:name）的查询可以安全地包装为子查询
+        if not query or not parameters.get('pushdown', True) or not isinstance(params, dict):
+            return None
+        
+        engine = engine_registry.get_engine(
+            config.data_source_path, **SQLEngineRegistry.get_pool_options(parameters)
+        )
+        builder = SQLPushdownBuilder(engine.dialect)
+        plan = builder.build(query, filters, calculation)
+        if plan is None:
+            logger.info("计算包含无法翻译为SQL的表达式，回退到pandas处理")
+            return None
+        
+        pushdown_query, finalize = plan
+        logger.info(f"聚合下推到数据库执行: {pushdown_query}")
+        try:
+            with engine.connect() as conn:
+                df = pd.read_sql_query(sa.text(pushdown_query), conn, params={**params, **builder.params})
+        except Exception as e:
+            logger.warning(f"聚合下推执行失败，回退到pandas处理: {e}")
+            return None
+        
+        df = finalize(df)
+        logger.info(f"下推聚合完成，形状: {df.shape}")
+        return df
     
     def load_data(self, config: ReportConfig) -> 'pd.DataFrame':
         try:
@@ -999,10 +1972,14 @@ class SQLDataSource(DataSource):
             if not query:
                 raise ValueError("SQL查询不能为空")
             
-            engine = sa.create_engine(connection_str)
+            # 复用进程级引擎及其连接池
+            engine = engine_registry.get_engine(
+                connection_str, **SQLEngineRegistry.get_pool_options(config.parameters)
+            )
             
             # 执行查询，支持参数化查询
             with engine.connect() as conn:
+                query, params = self._apply_plan(conn, query, params, config.parameters)
                 df = pd.read_sql_query(query, conn, params=params)
             
             logger.info(f"数据加载完成，形状: {df.shape}")
@@ -1028,66 +2005,375 @@ class SQLDataSource(DataSource):
         return not df.empty
 
 
-class APIDataSource(DataSource):
-    """API数据源"""
-    
-    def load_data(self, config: ReportConfig) -> 'pd.DataFrame':
-        """从API加载数据"""
-        try:
-            # 获取API配置参数
-            url = config.data_source_path
-            method = config.parameters.get('method', 'GET').upper()
-            headers = config.parameters.get('headers', {})
-            params = config.parameters.get('params', {})
-            data = config.parameters.get('data', {})
-            json_data = config.parameters.get('json', None)
-            auth = config.parameters.get('auth', None)
-            response_key = config.parameters.get('response_key', None)
-            timeout = config.parameters.get('timeout', 30)
-            retries = config.parameters.get('retries', 3)
-            retry_delay = config.parameters.get('retry_delay', 1)
-            
-            # 发送请求（带重试机制）
-            for attempt in range(retries):
-                try:
-                    logger.info(f"发送{method}请求到API: {url} (尝试 {attempt+1}/{retries})")
-                    
-                    if method == 'GET':
-                        response = requests.get(url, headers=headers, params=params, auth=auth, timeout=timeout)
-                    elif method == 'POST':
-                        response = requests.post(url, headers=headers, params=params, 
-                                               data=data, json=json_data, auth=auth, timeout=timeout)
-                    elif method == 'PUT':
-                        response = requests.put(url, headers=headers, params=params, 
-                                              data=data, json=json_data, auth=auth, timeout=timeout)
-                    elif method == 'DELETE':
-                        response = requests.delete(url, headers=headers, params=params, auth=auth, timeout=timeout)
-                    else:
-                        raise ValueError(f"不支持的HTTP方法: {method}")
-                    
-                    # 检查响应状态
-                    response.raise_for_status()
-                    break  # 成功，退出重试循环
-                
-                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
-                    if attempt < retries - 1:
-                        logger.warning(f"API请求失败，将重试: {e}")
-                        import time
-                        time.sleep(retry_delay)
-                    else:
-                        logger.error(f"API请求失败，已达到最大重试次数: {e}")
-                        raise
+class HTTPSessionPool:
+    """按主机复用的HTTP会话池
+
+    每个 (协议, 主机, 连接数上限) 对应一个长期存活的 requests.Session，
+    连接保持 keep-alive，在同一进程内的多次加载之间复用TCP/TLS连接。
+    """
+
+    DEFAULT_POOL_MAXSIZE = 10
+
+    def __init__(self):
+        self._sessions: Dict[Tuple[str, str, int], 'requests.Session'] = {}
+        self._lock = threading.Lock()
+
+    def get_session(self, url: str, pool_maxsize: Optional[int] = None) -> 'requests.Session':
+        """获取指定URL所在主机的会话"""
+        parts = urlsplit(url)
+        pool_maxsize = max(pool_maxsize or 0, self.DEFAULT_POOL_MAXSIZE)
+        key = (parts.scheme, parts.netloc, pool_maxsize)
+
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+                session.mount(f"{parts.scheme}://", adapter)
+                self._sessions[key] = session
+                logger.info(f"创建HTTP会话: {parts.scheme}://{parts.netloc}（连接数上限 {pool_maxsize}）")
+            return session
+
+    def close_all(self):
+        """关闭所有会话"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+# 创建全局HTTP会话池
+http_session_pool = HTTPSessionPool()
+
+
+class TokenBucket:
+    """线程安全的令牌桶限流器"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """获取一个令牌，令牌不足时等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class APIDataSource(DataSource):
+    """API数据源
+    
+    请求通过按主机复用的会话发送。分页接口通过参数 pagination 声明：
+        - type: 'page'、'offset'、'cursor' 或 'link'（Link响应头）
+        - page_param/size_param/start_page: 页码分页参数，默认 page/page_size/1
+        - offset_param/limit_param: 偏移分页参数，默认 offset/limit
+        - page_size: 每页记录数，默认100
+        - cursor_param/cursor_key: 游标请求参数名及响应中下一页游标的路径（如 meta.next_cursor）
+        - total_key/total_pages_key: 响应中总记录数/总页数的路径，用于确定需要请求的页
+        - max_pages: 最多请求的页数
+        - concurrency: 并发请求数（页码/偏移分页），默认4
+        - rate_limit/burst: 每秒请求数上限及突发容量
+    
+    查询计划下推：
+        - fields_param: 字段选择的查询参数名（如 fields），projection 以逗号分隔传递
+        - filter_params: 过滤列到查询参数的映射，如 {"地区": "region", "日期": {"min": "start", "max": "end"}}
+    未映射的过滤条件和列裁剪在加载后由pandas处理。
+    
+    每页响应解析后的数据框缓存在磁盘上（参数 cache 为 False 时禁用），缓存键由请求方法、URL、
+    查询参数、请求体以及请求头和认证信息的摘要决定（凭据不以明文保存），不同凭据不会共用缓存条目。
+    cache_ttl 秒内直接使用缓存（默认0，即每次都重新验证）；过期后携带 If-None-Match/If-Modified-Since
+    发送条件请求，服务器返回304时复用缓存的数据框，不再解析JSON。包含嵌套字段等无法按列缓存的响应不缓存。
+    """
+    
+    PAGINATION_TYPES = ('page', 'offset', 'cursor', 'link')
+    
+    @staticmethod
+    def _credentials_digest(options: Dict[str, Any]) -> str:
+        """请求头和认证信息的摘要（请求头名称不区分大小写）"""
+        headers = sorted((str(name).lower(), str(value)) for name, value in (options.get('headers') or {}).items())
+        auth = options.get('auth')
+        if auth is not None and not isinstance(auth, (str, list, tuple, dict)):
+            # requests 的认证对象按类型和属性区分
+            auth = [type(auth).__name__, getattr(auth, '__dict__', repr(auth))]
+        return hashlib.sha256(
+            json.dumps([headers, auth], ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+    
+    @classmethod
+    def _cache_key(cls, method: str, url: str, params: Optional[Dict[str, Any]], options: Dict[str, Any]) -> str:
+        """根据请求方法、URL、查询参数、请求体和凭据摘要生成缓存键"""
+        body = [options.get('data'), options.get('json')] if method in ('POST', 'PUT') else None
+        fingerprint = ['api', method, url, sorted((params or {}).items()), body,
+                       options.get('response_key'), options.get('pagination'), cls._credentials_digest(options)]
+        return hashlib.sha256(
+            json.dumps(fingerprint, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+    
+    @staticmethod
+    def _get_path(data: Any, path: Optional[str]) -> Any:
+        """按点分隔路径读取嵌套字段"""
+        if not path:
+            return None
+        for key in path.split('.'):
+            if not isinstance(data, dict):
+                return None
+            data = data.get(key)
+        return data
+    
+    @staticmethod
+    def _planned_params(params: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+        """将查询计划的列清单和过滤条件转换为API查询参数"""
+        params = dict(params or {})
+        projection = options.get('projection')
+        if projection and options.get('fields_param'):
+            params[options['fields_param']] = ','.join(str(col) for col in projection)
+        
+        filter_params = options.get('filter_params') or {}
+        for column, condition in (options.get('predicates') or {}).items():
+            mapping = filter_params.get(column)
+            if not mapping:
+                continue
+            if isinstance(mapping, dict):
+                # 范围条件映射为上下界参数
+                if isinstance(condition, dict):
+                    for bound in ('min', 'max'):
+                        if bound in condition and mapping.get(bound):
+                            params[mapping[bound]] = condition[bound]
+            elif isinstance(condition, dict) and 'values' in condition:
+                params[mapping] = ','.join(str(value) for value in condition['values'])
+            elif isinstance(condition, list):
+                params[mapping] = ','.join(str(value) for value in condition)
+            elif not isinstance(condition, dict):
+                params[mapping] = condition
+        return params
+    
+    def _request(self, session: 'requests.Session', method: str, url: str,
+                 params: Optional[Dict[str, Any]], options: Dict[str, Any],
+                 rate_limiter: Optional[TokenBucket] = None,
+                 extra_headers: Optional[Dict[str, str]] = None) -> 'requests.Response':
+        """发送请求（带重试机制）"""
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
+            raise ValueError(f"不支持的HTTP方法: {method}")
+        
+        retries = options.get('retries', 3)
+        request_kwargs = {
+            'headers': {**options.get('headers', {}), **(extra_headers or {})},
+            'params': params,
+            'auth': options.get('auth', None),
+            'timeout': options.get('timeout', 30)
+        }
+        if method in ('POST', 'PUT'):
+            request_kwargs['data'] = options.get('data', {})
+            request_kwargs['json'] = options.get('json', None)
+        
+        for attempt in range(retries):
+            try:
+                if rate_limiter is not None:
+                    rate_limiter.acquire()
+                logger.info(f"发送{method}请求到API: {url} (尝试 {attempt+1}/{retries})")
+                response = session.request(method, url, **request_kwargs)
+                
+                # 检查响应状态
+                response.raise_for_status()
+                return response
+            
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt < retries - 1:
+                    logger.warning(f"API请求失败，将重试: {e}")
+                    time.sleep(options.get('retry_delay', 1))
+                else:
+                    logger.error(f"API请求失败，已达到最大重试次数: {e}")
+                    raise
+    
+    def _fetch_page(self, session: 'requests.Session', method: str, url: str,
+                    params: Optional[Dict[str, Any]], options: Dict[str, Any],
+                    rate_limiter: Optional[TokenBucket] = None,
+                    cache: Optional[FrameCache] = None) -> Tuple['pd.DataFrame', Dict[str, Any]]:
+        """请求单页数据，返回 (数据框, 分页信息)"""
+        if cache is None:
+            return self._parse_response(
+                self._request(session, method, url, params, options, rate_limiter), options
+            )
+        
+        cache_key = self._cache_key(method, url, params, options)
+        cache_ttl = float(options.get('cache_ttl', 0))
+        entry = cache.get_extra(cache_key)
+        conditional_headers = {}
+        if entry is not None:
+            if time.time() - entry.get('stored_at', 0) < cache_ttl:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"API响应缓存未过期，直接使用缓存: {url}")
+                    return cached, entry.get('page_info', {})
+            if entry.get('etag'):
+                conditional_headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                conditional_headers['If-Modified-Since'] = entry['last_modified']
+        
+        response = self._request(session, method, url, params, options, rate_limiter, conditional_headers)
+        if response.status_code == 304:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"API数据未修改（304），复用缓存: {url}")
+                cache.update_extra(cache_key, {
+                    'stored_at': time.time(),
+                    'etag': response.headers.get('ETag', entry.get('etag')),
+                    'last_modified': response.headers.get('Last-Modified', entry.get('last_modified'))
+                })
+                return cached, entry.get('page_info', {})
+            # 缓存条目在验证期间被淘汰，重新发送无条件请求
+            response = self._request(session, method, url, params, options, rate_limiter)
+        
+        df, page_info = self._parse_response(response, options)
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        if etag or last_modified or cache_ttl > 0:
+            stored = cache.put(cache_key, df, extra={
+                'stored_at': time.time(), 'etag': etag, 'last_modified': last_modified,
+                'page_info': page_info
+            })
+            if not stored:
+                logger.debug(f"API响应包含无法按列缓存的数据，未缓存: {url}")
+        return df, page_info
+    
+    def _parse_response(self, response: 'requests.Response',
+                        options: Dict[str, Any]) -> Tuple['pd.DataFrame', Dict[str, Any]]:
+        """解析响应JSON，返回 (数据框, 分页信息)"""
+        response_data = response.json()
+        
+        pagination = options.get('pagination') or {}
+        page_info = {
+            'total': self._get_path(response_data, pagination.get('total_key')),
+            'total_pages': self._get_path(response_data, pagination.get('total_pages_key')),
+            'cursor': self._get_path(response_data, pagination.get('cursor_key')),
+            'next_url': response.links.get('next', {}).get('url')
+        }
+        
+        # 如果指定了响应键，提取对应的数据
+        response_key = options.get('response_key', None)
+        if response_key:
+            for key in response_key.split('.'):
+                response_data = response_data.get(key, {})
+        
+        # 转换为DataFrame
+        return pd.DataFrame(response_data), page_info
+    
+    def _fetch_paginated(self, session: 'requests.Session', method: str, url: str,
+                         params: Dict[str, Any], options: Dict[str, Any],
+                         rate_limiter: Optional[TokenBucket],
+                         cache: Optional[FrameCache] = None) -> List['pd.DataFrame']:
+        """按分页配置请求所有页，返回按页序排列的数据框列表"""
+        pagination = options['pagination']
+        pagination_type = pagination.get('type', 'page')
+        if pagination_type not in self.PAGINATION_TYPES:
+            raise ValueError(f"不支持的分页类型: {pagination_type}")
+        
+        page_size = int(pagination.get('page_size', 100))
+        max_pages = pagination.get('max_pages')
+        
+        def fetch(page_params, page_url=url):
+            return self._fetch_page(session, method, page_url, page_params, options, rate_limiter, cache)
+        
+        if pagination_type in ('cursor', 'link'):
+            # 游标和Link分页依赖上一页的响应，只能顺序请求
+            cursor_param = pagination.get('cursor_param', 'cursor')
+            frames = []
+            page_params, page_url = dict(params), url
+            while max_pages is None or len(frames) < max_pages:
+                frame, page_info = fetch(page_params, page_url)
+                frames.append(frame)
+                if frame.empty:
+                    break
+                if pagination_type == 'cursor':
+                    if not page_info['cursor']:
+                        break
+                    page_params = {**params, cursor_param: page_info['cursor']}
+                else:
+                    if not page_info['next_url']:
+                        break
+                    # 下一页链接已包含查询参数
+                    page_params, page_url = None, page_info['next_url']
+            return frames
+        
+        # 页码/偏移分页：各页相互独立，可以并发请求
+        if pagination_type == 'page':
+            page_param = pagination.get('page_param', 'page')
+            start_page = int(pagination.get('start_page', 1))
+            size_param = pagination.get('size_param', 'page_size')
+            page_params_for = lambda i: {**params, page_param: start_page + i, size_param: page_size}
+        else:
+            offset_param = pagination.get('offset_param', 'offset')
+            limit_param = pagination.get('limit_param', 'limit')
+            page_params_for = lambda i: {**params, offset_param: i * page_size, limit_param: page_size}
+        
+        first_frame, page_info = fetch(page_params_for(0))
+        frames = [first_frame]
+        
+        total_pages = page_info['total_pages']
+        if total_pages is None and page_info['total'] is not None:
+            total_pages = -(-int(page_info['total']) // page_size)
+        if max_pages is not None:
+            total_pages = min(total_pages, max_pages) if total_pages is not None else max_pages
+        
+        concurrency = max(1, int(pagination.get('concurrency', 4)))
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            if total_pages is not None:
+                # 总页数已知：并发请求剩余的所有页
+                remaining = [page_params_for(i) for i in range(1, int(total_pages))]
+                frames.extend(frame for frame, _ in executor.map(fetch, remaining))
+            else:
+                # 总页数未知：按批次并发请求，遇到不满一页的数据后停止
+                next_page = 1
+                while len(frames[-1]) >= page_size:
+                    batch = [page_params_for(i) for i in range(next_page, next_page + concurrency)]
+                    next_page += concurrency
+                    for frame, _ in executor.map(fetch, batch):
+                        frames.append(frame)
+                        if len(frame) < page_size:
+                            break
+        
+        logger.info(f"分页请求完成，共 {len(frames)} 页")
+        return frames
+    
+    def load_data(self, config: ReportConfig) -> 'pd.DataFrame':
+        """从API加载数据"""
+        try:
+            # 获取API配置参数
+            url = config.data_source_path
+            options = config.parameters or {}
+            method = options.get('method', 'GET').upper()
+            params = self._planned_params(options.get('params', {}), options)
+            pagination = options.get('pagination')
             
-            # 解析响应
-            response_data = response.json()
+            rate_limiter = None
+            if pagination and pagination.get('rate_limit'):
+                rate_limiter = TokenBucket(pagination['rate_limit'], pagination.get('burst'))
             
-            # 如果指定了响应键，提取对应的数据
-            if response_key:
-                for key in response_key.split('.'):
-                    response_data = response_data.get(key, {})
+            # 复用主机对应的keep-alive会话
+            concurrency = int(pagination.get('concurrency', 4)) if pagination else 1
+            session = http_session_pool.get_session(url, concurrency)
+            cache = self._get_frame_cache(config)
+            
+            if pagination:
+                frames = self._fetch_paginated(session, method, url, params, options, rate_limiter, cache)
+                df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            else:
+                df, _ = self._fetch_page(session, method, url, params, options, rate_limiter, cache)
             
-            # 转换为DataFrame
-            df = pd.DataFrame(response_data)
+            projection = options.get('projection')
+            if projection:
+                columns = [col for col in df.columns if col in set(projection)]
+                if columns and len(columns) < len(df.columns):
+                    df = df[columns]
             
             logger.info(f"从API加载了 {len(df)} 条记录")
             return df
@@ -1105,47 +2391,993 @@ class APIDataSource(DataSource):
             logger.error(f"从API加载数据失败: {e}")
             raise
 
+class LRUCache:
+    """容量有限的线程安全LRU缓存，用于复用编译后的过滤条件和计算计划"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: 'OrderedDict[Any, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get_or_create(self, key: Any, factory) -> Any:
+        """返回键对应的值；不存在时调用 factory 创建，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        value = factory()
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return value
+
+class FilterPredicate:
+    """单个过滤条件（列 + 运算符 + 值），对给定的行位置计算布尔掩码"""
+
+    # 相对计算代价，用于确定条件的执行顺序
+    COSTS = {'matches_regex': 10.0, 'contains': 5.0, 'not_empty': 2.0, 'is_empty': 2.0,
+             'in_list': 2.0, 'not_in_list': 2.0}
+    COMPARISONS = {
+        'greater_than': np.greater, 'greater_than_or_equal': np.greater_equal,
+        'less_than': np.less, 'less_than_or_equal': np.less_equal,
+        'equals': np.equal, 'not_equals': np.not_equal,
+    } if numpy_available else {}
+    NUMEXPR_SYMBOLS = {'greater_than': '>', 'greater_than_or_equal': '>=', 'less_than': '<',
+                       'less_than_or_equal': '<=', 'equals': '==', 'not_equals': '!='}
+
+    def __init__(self, column: str, operator: str, value: Any = None, keep_null: bool = False,
+                 value_column: Optional[str] = None):
+        if value_column is not None and operator not in self.COMPARISONS:
+            raise ValueError(f"运算符 {operator} 不支持与其他列比较")
+        self.column = column
+        self.operator = operator
+        self.value = value
+        self.keep_null = keep_null
+        self.value_column = value_column
+        self.cost = self.COSTS.get(operator, 1.0)
+        self._pattern = re.compile(value) if operator == 'matches_regex' else None
+
+    def __repr__(self) -> str:
+        if self.value_column is not None:
+            return f"{self.column} {self.operator} 列 {self.value_column}"
+        return f"{self.column} {self.operator} {self.value!r}"
+
+    @staticmethod
+    def _values(series: 'pd.Series') -> 'pd.Series':
+        """分类类型的列按原始值比较"""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series.astype(series.cat.categories.dtype)
+        return series
+
+    def _operand(self, df: 'pd.DataFrame', series: 'pd.Series',
+                 positions: Optional['np.ndarray']) -> Any:
+        """比较运算的右操作数：指定 value_column 时与该列逐行比较，日期列的值转换为时间戳"""
+        value = self.value
+        if self.value_column is not None:
+            other = df[self.value_column] if positions is None else df[self.value_column].iloc[positions]
+            return self._values(other).to_numpy()
+        if pd.api.types.is_datetime64_any_dtype(series.dtype) and isinstance(value, str):
+            timestamp = pd.Timestamp(value)
+            return np.datetime64(timestamp) if isinstance(series.dtype, np.dtype) else timestamp
+        return value
+
+    @staticmethod
+    def _is_text(series: 'pd.Series') -> bool:
+        dtype = series.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtype = dtype.categories.dtype
+        return dtype == object or pd.api.types.is_string_dtype(dtype)
+
+    def evaluate(self, df: 'pd.DataFrame', positions: Optional['np.ndarray'] = None) -> 'np.ndarray':
+        """计算条件在指定行位置（None表示全部行）上的布尔掩码"""
+        series = df[self.column] if positions is None else df[self.column].iloc[positions]
+        operator = self.operator
+
+        if operator in ('is_empty', 'not_empty'):
+            # 空值和仅含空白的字符串都视为空
+            empty = series.isna().to_numpy()
+            if self._is_text(series):
+                empty = empty | series.astype(object).map(
+                    lambda item: isinstance(item, str) and not item.strip()
+                ).to_numpy(dtype=bool)
+            return empty if operator == 'is_empty' else ~empty
+
+        operand = self.value
+        if operator in ('equals', 'not_equals', 'greater_than', 'greater_than_or_equal',
+                        'less_than', 'less_than_or_equal'):
+            operand = self._operand(df, series, positions)
+
+        if operator in ('in_list', 'not_in_list') or (
+                operator == 'equals' and self._is_text(series) and not isinstance(operand, np.ndarray)):
+            # isin 基于哈希表（比逐个字符串比较更快）；分类列只比较类别编码
+            values = self.value if operator != 'equals' else [operand]
+            mask = series.isin(list(values)).to_numpy(dtype=bool)
+            if operator == 'not_in_list':
+                mask = ~mask
+        elif operator == 'between':
+            low, high = self.value
+            values = self._values(series)
+            mask = ((values >= low) & (values <= high)).to_numpy(dtype=bool, na_value=False)
+        elif operator in ('matches_regex', 'contains'):
+            if self._is_text(series):
+                # 分类列只对类别执行匹配
+                mask = series.str.contains(
+                    self._pattern if operator == 'matches_regex' else str(self.value),
+                    regex=operator == 'matches_regex', na=False
+                ).to_numpy(dtype=bool)
+            else:
+                mask = series.astype(str).str.contains(
+                    self._pattern if operator == 'matches_regex' else str(self.value),
+                    regex=operator == 'matches_regex'
+                ).to_numpy(dtype=bool)
+        else:
+            values = self._values(series)
+            if isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biufM':
+                # 数值/日期列直接在NumPy数组上比较，NaN 与任何值比较均为False
+                mask = np.asarray(self.COMPARISONS[operator](values.to_numpy(), operand), dtype=bool)
+            else:
+                result = self.COMPARISONS[operator](values, operand)
+                mask = pd.Series(result).to_numpy(dtype=bool, na_value=False)
+
+        # 空值不满足任何值条件（keep_null 为 True 时保留空值行）；
+        # 其余运算对空值的结果本身即为False，无需再计算空值掩码
+        if self.keep_null:
+            return mask | series.isna().to_numpy()
+        if operator in ('not_equals', 'not_in_list', 'contains', 'matches_regex'):
+            return mask & ~series.isna().to_numpy()
+        return mask
+
+    def numexpr_term(self, df: 'pd.DataFrame', name: str) -> Optional[Tuple[str, Any]]:
+        """可融合到numexpr表达式中的条件返回 (表达式, 列数组)，否则返回None"""
+        symbol = self.NUMEXPR_SYMBOLS.get(self.operator)
+        series = df[self.column]
+        if (symbol is None or self.keep_null or self.value_column is not None
+                or not isinstance(series.dtype, np.dtype)
+                or series.dtype.kind not in 'iuf' or isinstance(self.value, bool)
+                or not isinstance(self.value, (int, float))):
+            return None
+        term = f"({name} {symbol} {float(self.value)!r})"
+        if self.operator == 'not_equals' and series.dtype.kind == 'f':
+            # numexpr 中 NaN != x 为True，与非融合路径一致排除空值（NaN == NaN 为False）
+            term = f"({term} & ({name} == {name}))"
+        return term, series.to_numpy()
+
+
+class FilterCompiler:
+    """将过滤条件编译为向量化的布尔掩码计算
+
+    支持的条件写法：
+        - {"min": a, "max": b}（含边界）、{"values": [...]}、值列表、单个值（原有写法）
+        - {"operator": "greater_than", "value": 0}，或多个此类条件组成的列表（同一列的条件为"且"关系）
+    运算符沿用 business_rules.json 的命名：greater_than、greater_than_or_equal、less_than、
+    less_than_or_equal、equals、not_equals、in_list、not_in_list、between、contains、
+    matches_regex、not_empty、is_empty，以及简写 gt/gte/lt/lte/eq/ne/in/not_in。
+    value 始终按字面值比较；比较运算使用 {"operator": "greater_than", "value_column": "目标"} 与另一列逐行比较。
+
+    空值不满足除 is_empty 外的任何条件（条件中 keep_null 为 True 时保留空值行）。
+    执行时先在抽样上估计各条件的选择率，按 代价/(1-选择率) 排序，后续条件只在仍满足的行上计算，
+    全部被过滤时提前结束；numexpr 可用时数值比较条件融合为一次表达式计算。
+    """
+
+    ALIASES = {'gt': 'greater_than', 'gte': 'greater_than_or_equal', 'lt': 'less_than',
+               'lte': 'less_than_or_equal', 'eq': 'equals', 'ne': 'not_equals',
+               'in': 'in_list', 'not_in': 'not_in_list'}
+    OPERATORS = ('greater_than', 'greater_than_or_equal', 'less_than', 'less_than_or_equal',
+                 'equals', 'not_equals', 'in_list', 'not_in_list', 'between', 'contains',
+                 'matches_regex', 'not_empty', 'is_empty')
+    SAMPLE_SIZE = 2000
+    # 行数超过该值时才按抽样选择率排序
+    REORDER_MIN_ROWS = 50000
+    # 缓存的已编译过滤条件数（过滤条件每次运行都变化时避免无限增长）
+    CACHE_SIZE = 128
+
+    _cache = LRUCache(CACHE_SIZE)
+
+    def __init__(self, filters: Dict[str, Any]):
+        self.predicates: List[FilterPredicate] = []
+        for column, condition in (filters or {}).items():
+            self.predicates.extend(self._compile_condition(column, condition))
+
+    @classmethod
+    def compile(cls, filters: Dict[str, Any]) -> 'FilterCompiler':
+        """编译过滤条件（最近使用过的相同条件复用已编译的结果）"""
+        key = json.dumps(filters, ensure_ascii=False, sort_keys=True, default=str)
+        return cls._cache.get_or_create(key, lambda: cls(filters))
+
+    @classmethod
+    def _compile_condition(cls, column: str, condition: Any) -> List[FilterPredicate]:
+        if isinstance(condition, dict) and 'operator' in condition:
+            operator = cls.ALIASES.get(condition['operator'], condition['operator'])
+            if operator not in cls.OPERATORS:
+                raise ValueError(f"不支持的过滤运算符: {condition['operator']}")
+            return [FilterPredicate(column, operator, condition.get('value'),
+                                    bool(condition.get('keep_null', False)), condition.get('value_column'))]
+        if isinstance(condition, dict):
+            if 'min' in condition and 'max' in condition:
+                return [FilterPredicate(column, 'between', (condition['min'], condition['max']))]
+            if 'values' in condition:
+                return [FilterPredicate(column, 'in_list', condition['values'])]
+            predicates = []
+            if 'min' in condition:
+                predicates.append(FilterPredicate(column, 'greater_than_or_equal', condition['min']))
+            if 'max' in condition:
+                predicates.append(FilterPredicate(column, 'less_than_or_equal', condition['max']))
+            return predicates
+        if isinstance(condition, list):
+            if condition and all(isinstance(item, dict) and 'operator' in item for item in condition):
+                return [p for item in condition for p in cls._compile_condition(column, item)]
+            return [FilterPredicate(column, 'in_list', condition)]
+        return [FilterPredicate(column, 'equals', condition)]
+
+    def _order(self, df: 'pd.DataFrame', predicates: List[FilterPredicate]) -> List[FilterPredicate]:
+        """按抽样估计的选择率和代价排序，最能排除数据的廉价条件先执行"""
+        if len(predicates) < 2 or len(df) < self.REORDER_MIN_ROWS:
+            return predicates
+        positions = np.random.default_rng(0).choice(len(df), self.SAMPLE_SIZE, replace=False)
+        positions.sort()
+        ranked = []
+        for predicate in predicates:
+            try:
+                selectivity = float(predicate.evaluate(df, positions).mean())
+            except (TypeError, ValueError):
+                selectivity = 1.0
+            ranked.append((predicate.cost / max(1.0 - selectivity, 1e-6), predicate))
+        ranked.sort(key=lambda item: item[0])
+        return [predicate for _, predicate in ranked]
+
+    def _fused_numexpr(self, df: 'pd.DataFrame',
+                       predicates: List[FilterPredicate]) -> Tuple[Optional['np.ndarray'], List[FilterPredicate]]:
+        """将可融合的数值条件合并为一次numexpr计算，返回 (掩码, 剩余条件)"""
+        if not numexpr_available:
+            return None, predicates
+        terms, local_dict, remaining = [], {}, []
+        for predicate in predicates:
+            term = predicate.numexpr_term(df, f"c{len(local_dict)}")
+            if term is None:
+                remaining.append(predicate)
+            else:
+                terms.append(term[0])
+                local_dict[f"c{len(local_dict)}"] = term[1]
+        if len(terms) < 2:
+            return None, predicates
+        return numexpr.evaluate(' & '.join(terms), local_dict=local_dict), remaining
+
+    def mask(self, df: 'pd.DataFrame') -> 'np.ndarray':
+        """计算所有条件的合取掩码"""
+        predicates = []
+        for predicate in self.predicates:
+            if predicate.column not in df.columns:
+                logger.warning(f"过滤列 '{predicate.column}' 不存在于数据中，跳过该过滤条件")
+            elif predicate.value_column is not None and predicate.value_column not in df.columns:
+                logger.warning(f"比较列 '{predicate.value_column}' 不存在于数据中，跳过该过滤条件")
+            else:
+                predicates.append(predicate)
+
+        mask, predicates = self._fused_numexpr(df, predicates)
+        positions = None if mask is None else np.flatnonzero(mask)
+        for predicate in self._order(df, predicates):
+            if positions is not None and len(positions) == 0:
+                break
+            try:
+                current = predicate.evaluate(df, positions)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"过滤条件 '{predicate}' 执行失败，列数据类型不匹配: {e}")
+                continue
+            positions = np.flatnonzero(current) if positions is None else positions[current]
+
+        result = np.ones(len(df), dtype=bool)
+        if positions is not None:
+            result[:] = False
+            result[positions] = True
+        return result
+
+
+class FormulaExpression:
+    """解析后的计算公式
+
+    公式按白名单解析为语法树后编译为NumPy运算（numexpr可用且涉及的列均为数值时使用numexpr）。
+    列的写法：列名、`含空格的列名`、df['列名']；支持四则运算、幂、取模、比较（含链式比较和 in/not in）、
+    &/|/~ 及 and/or/not，以及 FUNCTIONS 中的函数。不支持的写法抛出 ValueError。
+    """
+
+    FUNCTIONS = {
+        'abs': np.abs, 'round': np.round, 'sqrt': np.sqrt, 'log': np.log, 'log10': np.log10,
+        'exp': np.exp, 'floor': np.floor, 'ceil': np.ceil, 'where': np.where,
+        'minimum': np.minimum, 'maximum': np.maximum, 'isnull': pd.isna, 'notnull': pd.notna,
+    } if numpy_available and pandas_available else {}
+    NUMEXPR_FUNCTIONS = {'abs', 'sqrt', 'log', 'log10', 'exp', 'where'}
+    BINARY_OPERATORS = {
+        ast.Add: (np.add, '+'), ast.Sub: (np.subtract, '-'), ast.Mult: (np.multiply, '*'),
+        ast.Div: (np.true_divide, '/'), ast.FloorDiv: (np.floor_divide, None), ast.Mod: (np.mod, '%'),
+        ast.Pow: (np.power, '**'), ast.BitAnd: (np.logical_and, '&'), ast.BitOr: (np.logical_or, '|'),
+    } if numpy_available else {}
+    COMPARE_OPERATORS = {
+        ast.Lt: (np.less, '<'), ast.LtE: (np.less_equal, '<='), ast.Gt: (np.greater, '>'),
+        ast.GtE: (np.greater_equal, '>='), ast.Eq: (np.equal, '=='), ast.NotEq: (np.not_equal, '!='),
+    } if numpy_available else {}
+
+    def __init__(self, formula: str):
+        self.formula = formula
+        self._placeholders: Dict[str, str] = {}
+        self.columns: List[str] = []
+        source = re.sub(r'`([^`]+)`', self._replace_backtick, formula).strip()
+        try:
+            tree = ast.parse(source, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"公式语法错误: {formula}") from e
+        self._evaluate, self._numexpr = self._compile(tree.body)
+
+    def _replace_backtick(self, match) -> str:
+        name = f"__column_{len(self._placeholders)}"
+        self._placeholders[name] = match.group(1)
+        return name
+
+    def _column(self, name: str):
+        if name not in self.columns:
+            self.columns.append(name)
+        alias = f"c{self.columns.index(name)}"
+        return (lambda env: env[name]), alias
+
+    def _compile(self, node: ast.AST) -> Tuple[Any, Optional[str]]:
+        """编译语法树节点，返回 (求值函数, numexpr表达式或None)"""
+        if isinstance(node, ast.Constant):
+            value = node.value
+            if not isinstance(value, (int, float, str, bool)) and value is not None:
+                raise ValueError(f"不支持的常量: {value!r}")
+            numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+            return (lambda env: value), (repr(value) if numeric or isinstance(value, bool) else None)
+
+        if isinstance(node, ast.Name):
+            if node.id == 'df':
+                raise ValueError("df 只能以 df['列名'] 的形式引用列")
+            return self._column(self._placeholders.get(node.id, node.id))
+
+        if (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == 'df'
+                and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str)):
+            return self._column(node.slice.value)
+
+        if isinstance(node, ast.BinOp) and type(node.op) in self.BINARY_OPERATORS:
+            func, symbol = self.BINARY_OPERATORS[type(node.op)]
+            left, left_expr = self._compile(node.left)
+            right, right_expr = self._compile(node.right)
+            expr = f"({left_expr} {symbol} {right_expr})" if symbol and left_expr and right_expr else None
+            return (lambda env: func(left(env), right(env))), expr
+
+        if isinstance(node, ast.UnaryOp):
+            operand, operand_expr = self._compile(node.operand)
+            if isinstance(node.op, ast.USub):
+                return (lambda env: np.negative(operand(env))), (f"(-{operand_expr})" if operand_expr else None)
+            if isinstance(node.op, ast.UAdd):
+                return operand, operand_expr
+            if isinstance(node.op, (ast.Not, ast.Invert)):
+                return (lambda env: np.logical_not(operand(env))), (f"(~{operand_expr})" if operand_expr else None)
+
+        if isinstance(node, ast.BoolOp):
+            func, symbol = (np.logical_and, '&') if isinstance(node.op, ast.And) else (np.logical_or, '|')
+            compiled = [self._compile(value) for value in node.values]
+
+            def evaluate_bool(env):
+                result = compiled[0][0](env)
+                for item, _ in compiled[1:]:
+                    result = func(result, item(env))
+                return result
+
+            expressions = [expr for _, expr in compiled]
+            expr = f"({f' {symbol} '.join(expressions)})" if all(expressions) else None
+            return evaluate_bool, expr
+
+        if isinstance(node, ast.Compare):
+            return self._compile_compare(node)
+
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in self.FUNCTIONS and not node.keywords):
+            func = self.FUNCTIONS[node.func.id]
+            compiled = [self._compile(arg) for arg in node.args]
+            expressions = [expr for _, expr in compiled]
+            expr = None
+            if node.func.id in self.NUMEXPR_FUNCTIONS and all(expressions):
+                expr = f"{node.func.id}({', '.join(expressions)})"
+            return (lambda env: func(*(item(env) for item, _ in compiled))), expr
+
+        raise ValueError(f"公式包含不支持的表达式: {ast.unparse(node)}")
+
+    def _compile_compare(self, node: ast.Compare) -> Tuple[Any, Optional[str]]:
+        """编译比较表达式，链式比较 a < b < c 展开为 (a < b) & (b < c)"""
+        terms = []
+        left = self._compile(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                if not isinstance(comparator, (ast.List, ast.Tuple)):
+                    raise ValueError("in/not in 只支持常量列表")
+                values = [ast.literal_eval(item) for item in comparator.elts]
+                negate = isinstance(op, ast.NotIn)
+                terms.append((lambda env, left=left[0], values=values, negate=negate:
+                              np.isin(left(env), values, invert=negate), None))
+                continue
+            if type(op) not in self.COMPARE_OPERATORS:
+                raise ValueError(f"不支持的比较运算: {ast.unparse(node)}")
+            func, symbol = self.COMPARE_OPERATORS[type(op)]
+            right = self._compile(comparator)
+            expr = f"({left[1]} {symbol} {right[1]})" if left[1] and right[1] else None
+            terms.append((lambda env, func=func, a=left[0], b=right[0]: func(a(env), b(env)), expr))
+            left = right
+
+        def evaluate_compare(env):
+            result = terms[0][0](env)
+            for term, _ in terms[1:]:
+                result = np.logical_and(result, term(env))
+            return result
+
+        expressions = [expr for _, expr in terms]
+        return evaluate_compare, (f"({' & '.join(expressions)})" if all(expressions) else None)
+
+    @staticmethod
+    def _column_values(series: 'pd.Series') -> 'np.ndarray':
+        """取列的NumPy数组（可空数值类型转换为float，空值为NaN；压缩过的窄整数转换为int64，避免计算溢出）"""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series.astype(series.cat.categories.dtype).to_numpy()
+        if not isinstance(series.dtype, np.dtype) and pd.api.types.is_numeric_dtype(series.dtype) \
+                and not pd.api.types.is_bool_dtype(series.dtype):
+            return series.to_numpy(dtype=float, na_value=np.nan)
+        if series.dtype.kind in 'iu' and series.dtype.itemsize < 8:
+            return series.to_numpy().astype(np.int64)
+        return series.to_numpy()
+
+    def evaluate(self, frame: 'pd.DataFrame') -> Any:
+        """在数据框上计算公式，返回数组或标量"""
+        missing = [col for col in self.columns if col not in frame.columns]
+        if missing:
+            raise KeyError(f"公式引用的列不存在: {missing}")
+        env = {col: self._column_values(frame[col]) for col in self.columns}
+
+        with np.errstate(all='ignore'):
+            if (numexpr_available and self._numexpr and self.columns
+                    and all(values.dtype.kind in 'biuf' for values in env.values())):
+                local_dict = {f"c{i}": env[col] for i, col in enumerate(self.columns)}
+                return numexpr.evaluate(self._numexpr, local_dict=local_dict)
+            return self._evaluate(env)
+
+
+class CalculationPlan:
+    """编译后的计算流水线
+
+    计算按分组/透视操作划分为多个阶段（公式 → 分组 → 公式 ...），前一阶段的结果是后一阶段的输入。
+    同一阶段内的公式按依赖关系拓扑排序，可以引用同阶段其他公式生成的列：引用绑定到之前最近的一次定义，
+    没有之前的定义且输入数据中也没有该列时才绑定到之后的定义（与按顺序执行的结果一致）；
+    排序结果按输入数据中存在的引用列缓存。
+    新列在一次浅拷贝的数据框上添加，不复制原始数据。解析结果按计算配置缓存（LRU，最多 CACHE_SIZE 个），
+    供定时任务重复运行时复用。无法解析的公式回退到 DataFrame.eval(engine='python')。
+    """
+
+    AGGREGATE_OPERATIONS = ('groupby', 'pivot')
+    CACHE_SIZE = 128
+    # 每个计划缓存的执行顺序数（按输入数据中存在的引用列区分）
+    ORDER_CACHE_SIZE = 16
+
+    _cache = LRUCache(CACHE_SIZE)
+
+    def __init__(self, calculations: List[Dict[str, Any]]):
+        self.stages: List[Tuple[str, Any]] = []
+        formulas: List[Dict[str, Any]] = []
+        for calc in calculations or []:
+            if calc.get('column') and calc.get('formula'):
+                formulas.append(calc)
+            elif calc.get('operation') in self.AGGREGATE_OPERATIONS:
+                if formulas:
+                    self.stages.append(('formulas', self._parse_formulas(formulas)))
+                    formulas = []
+                self.stages.append((calc['operation'], calc))
+        if formulas:
+            self.stages.append(('formulas', self._parse_formulas(formulas)))
+        self._orders = LRUCache(self.ORDER_CACHE_SIZE)
+
+    @classmethod
+    def compile(cls, calculations: List[Dict[str, Any]]) -> 'CalculationPlan':
+        """编译计算配置（最近使用过的相同配置复用已编译的计划）"""
+        key = json.dumps(calculations, ensure_ascii=False, sort_keys=True, default=str)
+        return cls._cache.get_or_create(key, lambda: cls(calculations))
+
+    @staticmethod
+    def _parse_formulas(formulas: List[Dict[str, Any]]) -> List[Tuple[str, str, Optional[FormulaExpression]]]:
+        """解析公式，返回 [(列名, 公式, 解析结果)]"""
+        parsed = []
+        for calc in formulas:
+            try:
+                expression = FormulaExpression(calc['formula'])
+            except ValueError as e:
+                logger.info(f"公式无法编译，将使用pandas求值: {e}")
+                expression = None
+            parsed.append((calc['column'], calc['formula'], expression))
+        return parsed
+
+    def _ordered(self, stage_index: int, parsed: List[Tuple[str, str, Optional[FormulaExpression]]],
+                 columns: 'pd.Index') -> List[Tuple[str, str, Optional[FormulaExpression]]]:
+        """按输入数据中存在的引用列取得（缓存的）执行顺序"""
+        referenced = {name for _, _, expression in parsed for name in (expression.columns if expression else [])}
+        key = (stage_index, frozenset(name for name in referenced if name in columns))
+        return self._orders.get_or_create(key, lambda: self._order_formulas(parsed, key[1]))
+
+    @staticmethod
+    def _order_formulas(parsed: List[Tuple[str, str, Optional[FormulaExpression]]],
+                        available: frozenset) -> List[Tuple[str, str, Optional[FormulaExpression]]]:
+        """按依赖关系拓扑排序
+
+        引用绑定到列表中位于之前的最后一次定义；没有之前的定义时，输入数据中已有该列则使用输入的值，
+        否则绑定到之后的定义。读取某列的公式必须在该列之后的重新定义之前执行。
+        """
+        definitions: Dict[str, List[int]] = {}
+        for index, (column, _, _) in enumerate(parsed):
+            definitions.setdefault(column, []).append(index)
+        dependencies = [set() for _ in parsed]
+        for index, (column, _, expression) in enumerate(parsed):
+            for name in (expression.columns if expression else []):
+                candidates = definitions.get(name, [])
+                earlier = [i for i in candidates if i < index]
+                later = [i for i in candidates if i > index]
+                if earlier:
+                    dependencies[index].add(earlier[-1])
+                elif later and name != column and name not in available:
+                    dependencies[index].add(later[0])
+                    continue
+                # 之后对该列的重新定义不能覆盖本公式读取的值
+                for redefinition in later:
+                    dependencies[redefinition].add(index)
+
+        # Kahn算法，同层按配置顺序
+        ordered, done = [], set()
+        while len(done) < len(parsed):
+            ready = [i for i in range(len(parsed)) if i not in done and dependencies[i] <= done]
+            if not ready:
+                cycle = [parsed[i][0] for i in range(len(parsed)) if i not in done]
+                logger.warning(f"计算字段存在循环依赖，已跳过: {cycle}")
+                break
+            ordered.append(parsed[ready[0]])
+            done.add(ready[0])
+        return ordered
+
+    def execute(self, df: 'pd.DataFrame') -> 'pd.DataFrame':
+        """依次执行各阶段计算"""
+        result = df
+        for stage_index, (kind, stage) in enumerate(self.stages):
+            if kind == 'formulas':
+                result = self._execute_formulas(result, self._ordered(stage_index, stage, result.columns))
+            elif kind == 'groupby':
+                group_cols = stage.get('group_by', [])
+                agg_cols = stage.get('aggregate', {})
+                if group_cols and agg_cols:
+                    result = result.groupby(group_cols).agg(agg_cols).reset_index()
+                    logger.info(f"成功执行分组聚合: {group_cols}")
+            elif kind == 'pivot':
+                index = stage.get('index', [])
+                values = stage.get('values', [])
+                if index and values:
+                    result = pd.pivot_table(
+                        result,
+                        index=index,
+                        columns=stage.get('columns', []),
+                        values=values,
+                        aggfunc=stage.get('aggfunc', 'mean'),
+                        fill_value=0
+                    ).reset_index()
+                    logger.info(f"成功执行透视表: {index} -> {values}")
+        return result
+
+    @staticmethod
+    def _execute_formulas(df: 'pd.DataFrame',
+                          formulas: List[Tuple[str, str, Optional[FormulaExpression]]]) -> 'pd.DataFrame':
+        # 浅拷贝：新增列不影响输入数据框，也不复制已有列的数据
+        result = df.copy(deep=False)
+        for column, formula, expression in formulas:
+            try:
+                if expression is not None:
+                    values = expression.evaluate(result)
+                    if isinstance(values, np.ndarray) and values.ndim == 0:
+                        values = values.item()
+                    result[column] = values
+                else:
+                    # 与编译路径一致，窄整数列按int64计算
+                    narrow = {col: np.int64 for col, dtype in result.dtypes.items()
+                              if isinstance(dtype, np.dtype) and dtype.kind in 'iu' and dtype.itemsize < 8}
+                    result[column] = (result.astype(narrow) if narrow else result).eval(formula, engine='python')
+                logger.info(f"成功计算字段: {column}")
+            except Exception as e:
+                logger.warning(f"计算失败: {formula}，错误: {str(e)}")
+        return result
+
+
+class JoinPlanner:
+    """多数据框连接计划
+
+    - 连接键：配置的 on，否则取两侧共同列中按左表列顺序的第一列（确定性）；
+      键的类型在连接前统一一次（分类转原始值、数值统一精度、日期与非日期统一为日期）。
+    - 连接顺序：inner 连接按估计的输出行数贪心选择下一个表（行数 × 每个键值的平均重复数），
+      其他连接方式保持配置顺序；结果列按各数据框的原始列顺序排列。
+    - 大表行数至少为小表的 PREFILTER_RATIO 倍时，先用小表键的哈希集合过滤大表中不可能匹配的行。
+    - inner 连接以较小的表作为构建侧；构建侧键唯一且行数不超过 BROADCAST_MAX_ROWS 时使用广播连接
+      （按位置索引取出构建侧的列），不再对两侧构建连接哈希表。
+    """
+
+    BROADCAST_MAX_ROWS = 1000000
+    PREFILTER_RATIO = 4
+
+    def __init__(self, how: str = 'inner', on: Union[str, List[str], None] = None,
+                 suffixes: Tuple[str, str] = ('_1', '_2'), **merge_options):
+        self.how = how
+        self.on = [on] if isinstance(on, str) else (list(on) if on else None)
+        self.suffixes = tuple(suffixes)
+        self.merge_options = merge_options
+        self.stats: List[Dict[str, Any]] = []
+
+    def choose_keys(self, left: 'pd.DataFrame', right: 'pd.DataFrame') -> List[str]:
+        """确定连接键"""
+        if self.on is not None:
+            return [col for col in self.on if col in left.columns and col in right.columns]
+        right_columns = set(right.columns)
+        common = [col for col in left.columns if col in right_columns]
+        return common[:1]
+
+    @staticmethod
+    def normalize_keys(left: 'pd.DataFrame', right: 'pd.DataFrame',
+                       keys: List[str]) -> Tuple['pd.DataFrame', 'pd.DataFrame']:
+        """统一两侧连接键的数据类型（不修改输入）"""
+        left_updates, right_updates = {}, {}
+        for key in keys:
+            left_values, right_values = left[key], right[key]
+            if isinstance(left_values.dtype, pd.CategoricalDtype):
+                left_values = left_updates[key] = left_values.astype(left_values.cat.categories.dtype)
+            if isinstance(right_values.dtype, pd.CategoricalDtype):
+                right_values = right_updates[key] = right_values.astype(right_values.cat.categories.dtype)
+            left_dtype, right_dtype = left_values.dtype, right_values.dtype
+            if left_dtype == right_dtype:
+                continue
+
+            left_datetime = pd.api.types.is_datetime64_any_dtype(left_dtype)
+            right_datetime = pd.api.types.is_datetime64_any_dtype(right_dtype)
+            left_numeric = pd.api.types.is_numeric_dtype(left_dtype) and not pd.api.types.is_bool_dtype(left_dtype)
+            right_numeric = pd.api.types.is_numeric_dtype(right_dtype) and not pd.api.types.is_bool_dtype(right_dtype)
+            if left_datetime and right_datetime:
+                right_updates[key] = right_values.astype(left_dtype)
+            elif left_datetime:
+                right_updates[key] = pd.to_datetime(right_values, errors='coerce')
+            elif right_datetime:
+                left_updates[key] = pd.to_datetime(left_values, errors='coerce')
+            elif left_numeric and right_numeric:
+                common = np.result_type(left_dtype, right_dtype)
+                left_updates[key] = left_values.astype(common)
+                right_updates[key] = right_values.astype(common)
+            elif left_numeric or right_numeric:
+                # 文本键可完整转换为数值时按数值连接，否则统一为字符串
+                text, number = (right_values, left_values) if left_numeric else (left_values, right_values)
+                converted = pd.to_numeric(text, errors='coerce')
+                if converted.isna().sum() == text.isna().sum():
+                    target = right_updates if left_numeric else left_updates
+                    target[key] = converted
+                else:
+                    target = left_updates if left_numeric else right_updates
+                    target[key] = number.astype(str).where(number.notna())
+        if left_updates:
+            left = left.assign(**left_updates)
+        if right_updates:
+            right = right.assign(**right_updates)
+        return left, right
+
+    @staticmethod
+    def _key_index(df: 'pd.DataFrame', keys: List[str]) -> 'pd.Index':
+        return pd.Index(df[keys[0]]) if len(keys) == 1 else pd.MultiIndex.from_frame(df[keys])
+
+    @staticmethod
+    def _key_hashes(df: 'pd.DataFrame', keys: List[str]) -> 'np.ndarray':
+        if len(keys) == 1:
+            return df[keys[0]].to_numpy()
+        return pd.util.hash_pandas_object(df[keys], index=False).to_numpy()
+
+    @classmethod
+    def _prefilter(cls, large: 'pd.DataFrame', small: 'pd.DataFrame', keys: List[str]) -> 'pd.DataFrame':
+        """只保留键在小表中出现过的行（多列键使用哈希值，冲突只会多保留行）"""
+        small_keys = pd.unique(cls._key_hashes(small, keys))
+        return large[pd.Series(cls._key_hashes(large, keys)).isin(small_keys).to_numpy()]
+
+    def _broadcast(self, left: 'pd.DataFrame', right: 'pd.DataFrame', keys: List[str],
+                   right_index: 'pd.Index') -> 'pd.DataFrame':
+        """广播连接：右表键唯一，按位置取出右表的列"""
+        indexer = right_index.get_indexer(self._key_index(left, keys))
+        if self.how == 'inner':
+            matched = indexer >= 0
+            left, indexer = left[matched], indexer[matched]
+        right_part = right.drop(columns=keys).reset_index(drop=True)
+        right_part = right_part.iloc[indexer] if self.how == 'inner' else right_part.reindex(indexer)
+
+        overlap = [col for col in right_part.columns if col in left.columns]
+        left = left.reset_index(drop=True)
+        right_part = right_part.reset_index(drop=True)
+        if overlap:
+            left = left.rename(columns={col: f"{col}{self.suffixes[0]}" for col in overlap})
+            right_part = right_part.rename(columns={col: f"{col}{self.suffixes[1]}" for col in overlap})
+        return pd.concat([left, right_part], axis=1)
+
+    def join(self, left: 'pd.DataFrame', right: 'pd.DataFrame', keys: List[str]) -> 'pd.DataFrame':
+        """按键连接两个数据框并记录统计"""
+        start_time = time.perf_counter()
+        left, right = self.normalize_keys(left, right, keys)
+        overlap = (set(left.columns) & set(right.columns)) - set(keys)
+        columns = list(dict.fromkeys(list(left.columns) + list(right.columns)))
+        swapped = self.how == 'inner' and len(left) < len(right) and not overlap
+        if swapped:
+            # inner 连接时较小的表作为构建（广播）侧
+            left, right = right, left
+        left_rows, right_rows = len(left), len(right)
+
+        if self.how in ('inner', 'right') and left_rows >= self.PREFILTER_RATIO * max(right_rows, 1):
+            left = self._prefilter(left, right, keys)
+        if self.how in ('inner', 'left') and right_rows >= self.PREFILTER_RATIO * max(left_rows, 1):
+            right = self._prefilter(right, left, keys)
+        removed = (left_rows - len(left)) + (right_rows - len(right))
+
+        strategy = 'hash'
+        result = None
+        if self.how in ('inner', 'left') and not self.merge_options and len(right) <= self.BROADCAST_MAX_ROWS:
+            right_index = self._key_index(right, keys)
+            if right_index.is_unique:
+                strategy = 'broadcast'
+                result = self._broadcast(left, right, keys, right_index)
+        if result is None:
+            result = pd.merge(left, right, on=keys, how=self.how, suffixes=self.suffixes, **self.merge_options)
+        if swapped:
+            result = result[columns]
+
+        elapsed = time.perf_counter() - start_time
+        self.stats.append({'keys': keys, 'left_rows': left_rows, 'right_rows': right_rows,
+                           'prefiltered': removed, 'strategy': strategy, 'rows': len(result), 'seconds': elapsed})
+        logger.info(f"连接 {left_rows} × {right_rows} 行（键: {keys}，{strategy}，预过滤剔除 {removed} 行）"
+                    f"→ {len(result)} 行，耗时 {elapsed * 1000:.1f}ms")
+        return result
+
+    def plan_order(self, frames: List['pd.DataFrame']) -> List[int]:
+        """确定连接顺序（数据框下标列表）"""
+        if self.how != 'inner' or len(frames) <= 2:
+            return list(range(len(frames)))
+
+        def fanout(index: int, keys: List[str]) -> float:
+            # 每个键值的平均行数
+            frame = frames[index]
+            distinct = len(frame[keys].drop_duplicates()) if len(keys) > 1 else frame[keys[0]].nunique(dropna=False)
+            return len(frame) / max(distinct, 1)
+
+        remaining = list(range(len(frames)))
+        current = min(remaining, key=lambda index: (len(frames[index]), index))
+        order, columns, estimate = [current], set(frames[current].columns), float(len(frames[current]))
+        remaining.remove(current)
+        while remaining:
+            candidates = []
+            for index in remaining:
+                keys = self.on if self.on is not None else [col for col in frames[index].columns if col in columns][:1]
+                keys = [col for col in (keys or []) if col in columns and col in frames[index].columns]
+                if keys:
+                    candidates.append((estimate * fanout(index, keys), index))
+            if not candidates:
+                # 没有可连接的表时按原顺序处理（拼接）
+                order.extend(remaining)
+                break
+            estimate, chosen = min(candidates)
+            order.append(chosen)
+            columns |= set(frames[chosen].columns)
+            remaining.remove(chosen)
+        return order
+
+    def execute(self, frames: List['pd.DataFrame']) -> 'pd.DataFrame':
+        """按计划依次连接所有数据框"""
+        order = self.plan_order(frames)
+        if order != sorted(order):
+            logger.info(f"连接顺序: {[index + 1 for index in order]}")
+        result = frames[order[0]]
+        for index in order[1:]:
+            df = frames[index]
+            keys = self.choose_keys(result, df)
+            if not keys:
+                logger.warning("没有找到共同列，使用 concat 进行合并")
+                result = pd.concat([result, df], axis=1)
+                continue
+            try:
+                result = self.join(result, df, keys)
+            except Exception as e:
+                # 合并失败，使用concat代替
+                logger.warning(f"合并失败: {e}，使用concat进行合并")
+                result = pd.concat([result, df], axis=1)
+
+        if order != sorted(order):
+            # 恢复按配置顺序连接时的列顺序
+            original = list(dict.fromkeys(col for frame in frames for col in frame.columns))
+            ordered = [col for col in original if col in result.columns]
+            result = result[ordered + [col for col in result.columns if col not in set(ordered)]]
+        return result
+
+
+def _join_spilled_partition(task: Tuple[List[str], List[str], 'pd.DataFrame', 'pd.DataFrame',
+                                         List[str], str, Tuple[str, str]]) -> 'pd.DataFrame':
+    """读取一对溢写分区文件并在内存中连接（可在子进程中执行）"""
+    left_files, right_files, left_schema, right_schema, keys, how, suffixes = task
+    left = pd.concat([pd.read_pickle(path) for path in left_files], ignore_index=True) if left_files else left_schema
+    right = pd.concat([pd.read_pickle(path) for path in right_files], ignore_index=True) if right_files else right_schema
+    return JoinPlanner(how, keys, suffixes).join(left, right, keys)
+
+
+class SpillJoiner:
+    """溢写到磁盘的哈希分区连接
+
+    两侧数据逐块按连接键的哈希值分到 partitions 个分区，每块的各分区写入单独的 pickle 文件；
+    之后逐个分区读取两侧文件并用 JoinPlanner 在内存中连接（spill_workers > 1 时在子进程中并行），
+    连接结果按分区依次产出，峰值内存约为单个分区的大小。
+    分区前按两侧首块确定每个键的比较类型（日期/数值/文本），保证连接后相等的键落在同一分区。
+    """
+
+    DEFAULT_PARTITIONS = 16
+    # 各类文件数据源加载到内存后相对文件大小的膨胀系数（用于估计内存占用）
+    MEMORY_FACTORS = {'csv': 3.0, 'excel': 8.0}
+    SIZE_UNITS = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4, 'B': 1}
+
+    def __init__(self, keys: List[str], key_kinds: Dict[str, str], how: str = 'inner',
+                 suffixes: Tuple[str, str] = ('_1', '_2'), partitions: Optional[int] = None,
+                 spill_dir: Optional[str] = None, max_workers: int = 1):
+        self.keys = list(keys)
+        self.key_kinds = key_kinds
+        self.how = how
+        self.suffixes = tuple(suffixes)
+        self.partitions = partitions or self.DEFAULT_PARTITIONS
+        self.max_workers = max(1, int(max_workers))
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.spill_dir = tempfile.mkdtemp(prefix='spill_join_', dir=spill_dir)
+        self._files = {side: [[] for _ in range(self.partitions)] for side in ('left', 'right')}
+        self._schemas: Dict[str, 'pd.DataFrame'] = {}
+        self.rows = {'left': 0, 'right': 0}
+        self.spilled_bytes = 0
+
+    def __enter__(self) -> 'SpillJoiner':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """删除溢写文件"""
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    @classmethod
+    def parse_size(cls, value: Union[int, float, str]) -> int:
+        """解析内存大小：字节数或带单位的字符串（如 '4GB'、'512MB'）"""
+        if isinstance(value, (int, float)):
+            return int(value)
+        text = str(value).strip().upper()
+        for unit in ('KB', 'MB', 'GB', 'TB', 'B'):
+            if text.endswith(unit):
+                return int(float(text[:-len(unit)]) * cls.SIZE_UNITS[unit])
+        return int(float(text))
+
+    @classmethod
+    def estimate_source_bytes(cls, ds_config: DataSourceConfig) -> int:
+        """根据文件大小估计数据源加载到内存后的大小（非文件数据源无法估计，返回0）"""
+        factor = cls.MEMORY_FACTORS.get(ds_config.type.lower())
+        if factor is None or not ds_config.path or not os.path.isfile(ds_config.path):
+            return 0
+        return int(os.path.getsize(ds_config.path) * factor)
+
+    @staticmethod
+    def key_kinds(left: 'pd.DataFrame', right: 'pd.DataFrame', keys: List[str]) -> Dict[str, str]:
+        """按两侧的类型确定每个键的比较类型（与 JoinPlanner.normalize_keys 一致）"""
+        kinds = {}
+        for key in keys:
+            dtypes = []
+            for series in (left[key], right[key]):
+                dtype = series.dtype
+                dtypes.append(dtype.categories.dtype if isinstance(dtype, pd.CategoricalDtype) else dtype)
+            if any(pd.api.types.is_datetime64_any_dtype(dtype) for dtype in dtypes):
+                kinds[key] = 'datetime'
+            elif any(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+                     for dtype in dtypes):
+                kinds[key] = 'numeric'
+            else:
+                kinds[key] = 'text'
+        return kinds
+
+    def _partition_ids(self, chunk: 'pd.DataFrame') -> 'np.ndarray':
+        canonical = {}
+        for key in self.keys:
+            values = chunk[key]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype(values.cat.categories.dtype)
+            kind = self.key_kinds[key]
+            if kind == 'datetime':
+                values = pd.to_datetime(values, errors='coerce')
+                canonical[key] = values.dt.tz_localize(None) if values.dt.tz is not None else values
+                canonical[key] = canonical[key].astype('datetime64[ns]').to_numpy().view('int64')
+            elif kind == 'numeric':
+                # 无法转换为数值的文本与任何数值都不相等，统一落入空值所在分区
+                canonical[key] = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            else:
+                canonical[key] = values.astype(object).where(values.notna(), None).to_numpy()
+        if len(self.keys) == 1:
+            hashes = pd.util.hash_array(canonical[self.keys[0]])
+        else:
+            hashes = pd.util.hash_pandas_object(pd.DataFrame(canonical), index=False).to_numpy()
+        return (hashes % np.uint64(self.partitions)).astype(np.int64)
+
+    def add(self, side: str, chunks: Iterable['pd.DataFrame']):
+        """将一侧的数据块按分区写入磁盘"""
+        for chunk in chunks:
+            if side not in self._schemas:
+                self._schemas[side] = chunk.iloc[:0]
+            if chunk.empty:
+                continue
+            ids = self._partition_ids(chunk)
+            order = np.argsort(ids, kind='stable')
+            bounds = np.searchsorted(ids[order], np.arange(self.partitions + 1))
+            for partition in range(self.partitions):
+                start, stop = bounds[partition], bounds[partition + 1]
+                if start == stop:
+                    continue
+                path = os.path.join(self.spill_dir, f"{side}_{partition}_{len(self._files[side][partition])}.pkl")
+                chunk.iloc[order[start:stop]].to_pickle(path)
+                self._files[side][partition].append(path)
+                self.spilled_bytes += os.path.getsize(path)
+            self.rows[side] += len(chunk)
+        logger.info(f"溢写连接: {side} 侧 {self.rows[side]} 行写入 {self.partitions} 个分区")
+
+    def _tasks(self) -> Iterator[Tuple]:
+        for partition in range(self.partitions):
+            left_files, right_files = self._files['left'][partition], self._files['right'][partition]
+            if not left_files and self.how in ('inner', 'left'):
+                continue
+            if not right_files and self.how in ('inner', 'right'):
+                continue
+            if not left_files and not right_files:
+                continue
+            yield (left_files, right_files, self._schemas['left'], self._schemas['right'],
+                   self.keys, self.how, self.suffixes)
+
+    def iter_results(self) -> Iterator['pd.DataFrame']:
+        """逐个分区连接并产出结果"""
+        start_time = time.perf_counter()
+        output_rows = 0
+        if self.max_workers > 1:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                # 最多同时提交 2 × 进程数 个分区，避免已完成但未消费的结果堆积在内存中
+                pending = []
+                for task in self._tasks():
+                    pending.append(executor.submit(_join_spilled_partition, task))
+                    if len(pending) >= 2 * self.max_workers:
+                        result = pending.pop(0).result()
+                        output_rows += len(result)
+                        yield result
+                for future in pending:
+                    result = future.result()
+                    output_rows += len(result)
+                    yield result
+        else:
+            for task in self._tasks():
+                result = _join_spilled_partition(task)
+                output_rows += len(result)
+                yield result
+        logger.info(f"溢写连接完成: {self.rows['left']} × {self.rows['right']} 行 → {output_rows} 行，"
+                    f"溢写 {self.spilled_bytes / 1024 / 1024:.1f}MB，耗时 {time.perf_counter() - start_time:.2f}s")
+
+
 class DataProcessor:
     """数据处理类"""
     
     @staticmethod
     def apply_filters(df: 'pd.DataFrame', filters: Dict[str, Union[Dict[str, Any], List[Any], Any]]) -> 'pd.DataFrame':
-        """应用数据过滤器"""
+        """应用数据过滤器（条件写法与运算符见 FilterCompiler）"""
         if not filters:
             return df
         
         try:
-            # 创建一个掩码数组而不是多次复制数据框
-            mask = pd.Series([True] * len(df), index=df.index)
-            
-            for column, condition in filters.items():
-                # 检查列是否存在
-                if column not in df.columns:
-                    logger.warning(f"过滤列 '{column}' 不存在于数据中，跳过该过滤条件")
-                    continue
-                    
-                if isinstance(condition, dict):
-                    # 范围过滤
-                    if 'min' in condition and 'max' in condition:
-                        try:
-                            mask &= (df[column] >= condition['min']) & (df[column] <= condition['max'])
-                        except TypeError as e:
-                            logger.warning(f"范围过滤失败，列 '{column}' 数据类型不匹配: {e}")
-                    # 值列表过滤
-                    elif 'values' in condition:
-                        mask &= df[column].isin(condition['values'])
-                elif isinstance(condition, list):
-                    # 多值过滤
-                    mask &= df[column].isin(condition)
-                else:
-                    # 单值过滤
-                    try:
-                        mask &= (df[column] == condition)
-                    except TypeError as e:
-                        logger.warning(f"单值过滤失败，列 '{column}' 数据类型不匹配: {e}")
-            
-            # 应用掩码
-            filtered_df = df[mask].copy()
+            # 编译后一次性计算所有条件的掩码
+            mask = FilterCompiler.compile(filters).mask(df)
+            filtered_df = df[mask]
             
             # 检查过滤后的数据是否为空
             if filtered_df.empty:
@@ -1159,53 +3391,73 @@ class DataProcessor:
     
     @staticmethod
     def apply_calculations(df: 'pd.DataFrame', calculations: List[Dict[str, Any]]) -> 'pd.DataFrame':
-        """应用计算字段"""
+        """应用计算字段及分组/透视计算（执行方式见 CalculationPlan）"""
         if not calculations:
             return df
         
-        result_df = df.copy()
+        return CalculationPlan.compile(calculations).execute(df)
+    
+    @staticmethod
+    def optimize_dtypes(df: 'pd.DataFrame', category_ratio: float = 0.5,
+                        sample_size: int = 10000) -> 'pd.DataFrame':
+        """压缩数据框的列类型以减少内存占用
         
-        for calc in calculations:
-            column_name = calc.get('column')
-            formula = calc.get('formula')
-            operation = calc.get('operation')
+        Args:
+            df: 数据框
+            category_ratio: 字符串列在抽样中的唯一值占比不超过该值时转换为分类类型
+            sample_size: 估计唯一值占比时的抽样行数
+        
+        Returns:
+            压缩后的数据框：低基数字符串列转换为分类类型，整数列向下转换为能容纳数据的整数类型
+            （不窄于int32，避免后续计算溢出），浮点列仅在转换为float32不损失精度时向下转换
+        """
+        if df.empty:
+            return df
+        
+        bytes_before = df.memory_usage(deep=True).sum()
+        result = df.copy(deep=False)
+        converted = {}
+        
+        for column in df.columns:
+            series = df[column]
+            dtype = series.dtype
             
-            if column_name and formula:
-                try:
-                    # 简化执行环境，使用更安全的方式执行计算
-                    result_df[column_name] = df.eval(formula, engine='python')
-                    logger.info(f"成功计算字段: {column_name}")
-                except Exception as e:
-                    logger.warning(f"计算失败: {formula}，错误: {str(e)}")
-            elif operation == 'groupby':
-                # 分组聚合
-                group_cols = calc.get('group_by', [])
-                agg_cols = calc.get('aggregate', {})
-                
-                if group_cols and agg_cols:
-                    grouped = result_df.groupby(group_cols).agg(agg_cols).reset_index()
-                    logger.info(f"成功执行分组聚合: {group_cols}")
-                    return grouped
-            elif operation == 'pivot':
-                # 透视表
-                index = calc.get('index', [])
-                columns = calc.get('columns', [])
-                values = calc.get('values', [])
-                aggfunc = calc.get('aggfunc', 'mean')
-                
-                if index and values:
-                    pivoted = pd.pivot_table(
-                        result_df, 
-                        index=index, 
-                        columns=columns, 
-                        values=values, 
-                        aggfunc=aggfunc, 
-                        fill_value=0
-                    ).reset_index()
-                    logger.info(f"成功执行透视表: {index} -> {values}")
-                    return pivoted
+            if dtype == object or pd.api.types.is_string_dtype(dtype):
+                non_null = series.dropna()
+                if non_null.empty:
+                    continue
+                sample = non_null.sample(sample_size, random_state=0) if len(non_null) > sample_size else non_null
+                # 混合类型的列保持原样，避免改变比较语义
+                if not all(isinstance(value, str) for value in sample):
+                    continue
+                if sample.nunique() / len(sample) <= category_ratio:
+                    result[column] = series.astype('category')
+                    converted[column] = 'category'
+            elif pd.api.types.is_bool_dtype(dtype):
+                continue
+            elif pd.api.types.is_integer_dtype(dtype) and isinstance(dtype, np.dtype):
+                downcast = pd.to_numeric(series, downcast='integer')
+                if downcast.dtype.itemsize < 4:
+                    downcast = downcast.astype(np.int32)
+                if downcast.dtype != dtype:
+                    result[column] = downcast
+                    converted[column] = str(downcast.dtype)
+            elif pd.api.types.is_float_dtype(dtype) and dtype == np.float64:
+                values = series.to_numpy()
+                compact = values.astype(np.float32)
+                finite = np.isfinite(values)
+                # 只有所有值都能被float32精确表示时才向下转换
+                if (np.abs(values[finite]) <= np.finfo(np.float32).max).all() and \
+                        np.array_equal(compact.astype(np.float64), values, equal_nan=True):
+                    result[column] = pd.Series(compact, index=series.index, name=column)
+                    converted[column] = 'float32'
         
-        return result_df
+        bytes_after = result.memory_usage(deep=True).sum()
+        logger.info(
+            f"列类型压缩完成: {bytes_before/1024/1024:.2f}MB -> {bytes_after/1024/1024:.2f}MB，"
+            f"转换 {len(converted)} 列 {converted}"
+        )
+        return result
     
     @staticmethod
     def preview_data(df: 'pd.DataFrame', num_rows: int = 10) -> str:
@@ -1270,63 +3522,13 @@ class DataProcessor:
         
         try:
             if merge_type == 'merge':
-                # 多表合并
-                result = dataframes[0]
-                for df in dataframes[1:]:
-                    # 查找共同列作为合并键
-                    common_cols = list(set(result.columns) & set(df.columns))
-                    if common_cols:
-                        on = default_config.get('on', common_cols[0])
-                        
-                        try:
-                            # 尝试统一日期列的数据类型
-                            if on in result.columns and on in df.columns:
-                                # 检查是否都是日期时间类型
-                                result_dtype = str(result[on].dtype)
-                                df_dtype = str(df[on].dtype)
-                                
-                                # 如果类型不一致，尝试转换为datetime
-                                if 'datetime' in result_dtype and 'datetime' not in df_dtype:
-                                    df[on] = pd.to_datetime(df[on], errors='coerce')
-                                elif 'datetime' not in result_dtype and 'datetime' in df_dtype:
-                                    result[on] = pd.to_datetime(result[on], errors='coerce')
-                                elif 'datetime' not in result_dtype and 'datetime' not in df_dtype:
-                                    # 尝试将两者都转换为datetime（如果可能）
-                                    try:
-                                        result[on] = pd.to_datetime(result[on])
-                                        df[on] = pd.to_datetime(df[on])
-                                    except:
-                                        # 如果转换失败，保持原样
-                                        pass
-                            
-                            # 为pd.merge创建配置（移除axis参数，因为merge不支持）
-                            merge_config = default_config.copy()
-                            if 'axis' in merge_config:
-                                del merge_config['axis']
-                            result = pd.merge(result, df, on=on, **merge_config)
-                            logger.info(f"合并完成，当前数据框形状: {result.shape}")
-                        except Exception as e:
-                            # 合并失败，使用concat代替
-                            logger.warning(f"合并失败: {e}，使用concat进行合并")
-                            # 为pd.concat创建配置，使用axis=1并移除pd.concat不支持的参数
-                            concat_config = default_config.copy()
-                            concat_config['axis'] = 1
-                            # 移除concat不支持的参数
-                            for param in ['how', 'on', 'suffixes']:
-                                if param in concat_config:
-                                    del concat_config[param]
-                            result = pd.concat([result, df], **concat_config)
-                    else:
-                        # 没有共同列，使用 concat
-                        logger.warning("没有找到共同列，使用 concat 进行合并")
-                        # 为pd.concat创建配置，使用axis=1并移除pd.concat不支持的参数
-                        concat_config = default_config.copy()
-                        concat_config['axis'] = 1
-                        # 移除concat不支持的参数
-                        for param in ['how', 'on', 'suffixes']:
-                            if param in concat_config:
-                                del concat_config[param]
-                        result = pd.concat([result, df], **concat_config)
+                # 多表合并：由连接计划确定连接键、顺序和连接方式
+                merge_options = {key: value for key, value in default_config.items()
+                                 if key not in ('how', 'on', 'suffixes', 'axis')}
+                planner = JoinPlanner(default_config['how'], default_config.get('on'),
+                                      default_config['suffixes'], **merge_options)
+                result = planner.execute(dataframes)
+                logger.info(f"合并完成，当前数据框形状: {result.shape}")
             else:
                 # 简单拼接
                 # 确保concat配置正确，移除pd.concat不支持的参数
@@ -1340,71 +3542,1109 @@ class DataProcessor:
             
             return result
         except Exception as e:
-            logger.error(f"数据框合并失败: {e}")
-            raise
-    
+            logger.error(f"数据框合并失败: {e}")
+            raise
+    
+    @staticmethod
+    def calculate_metrics(df: 'pd.DataFrame',
+                          approximate: Union[bool, Dict[str, Any], None] = None) -> Dict[str, Union[int, Dict[str, Any]]]:
+        """计算关键指标（优化版）
+        
+        数值列的均值、最小值、最大值和标准差由 StatisticsKernel 一次遍历计算，
+        中位数和分类列频次按列并行计算，大数据集同样输出完整指标。
+        approximate 为 True 或误差界字典时，行数达到 min_rows 的数据集改用可合并草图估计
+        中位数、不同值个数和最高频值。
+        """
+        sketch_options = StreamingMetrics.get_sketch_options(approximate)
+        if sketch_options is not None and len(df) >= sketch_options['min_rows']:
+            logger.info(f"使用近似指标: 分位数误差 {sketch_options['quantile_error']}, "
+                        f"基数误差 {sketch_options['distinct_error']}, 频次误差 {sketch_options['topk_error']}")
+            return StreamingMetrics.from_frame(df, sketch_options).result()
+        
+        metrics = {
+            'total_records': len(df),
+            'total_columns': len(df.columns),
+            'missing_values': {},
+            'numeric_stats': {},
+            'categorical_stats': {}
+        }
+        
+        # 计算缺失值
+        missing_values = df.isnull().sum()
+        metrics['missing_values'] = missing_values[missing_values > 0].to_dict()
+        
+        # 数值列统计
+        numeric_cols = list(df.select_dtypes(include=[np.number]).columns)
+        if numeric_cols:
+            moments = StatisticsKernel.compute(df, numeric_cols)
+            medians = StatisticsKernel.map_columns(StatisticsKernel.median, df, numeric_cols)
+            for position, col in enumerate(numeric_cols):
+                n, mean, m2, min_value, max_value = moments[:, position]
+                metrics['numeric_stats'][col] = {
+                    'mean': mean,
+                    'median': medians[col],
+                    'min': min_value,
+                    'max': max_value,
+                    'std': np.sqrt(m2 / (n - 1)) if n > 1 else np.nan
+                }
+        
+        # 分类列统计（包括压缩后的分类类型列）
+        categorical_cols = StatisticsKernel.categorical_columns(df)
+        if len(categorical_cols) > 0:
+            value_counts = StatisticsKernel.map_columns(
+                lambda series: series.value_counts(dropna=True, sort=False), df, categorical_cols
+            )
+            for col in categorical_cols:
+                counts = value_counts[col]
+                if isinstance(counts.index, pd.CategoricalIndex):
+                    # 分类列只统计实际出现的值
+                    counts = counts[counts > 0]
+                metrics['categorical_stats'][col] = {
+                    'unique_count': int(len(counts)),
+                    'top_value': StatisticsKernel.top_value(counts)
+                }
+        
+        return metrics
+
+class BusinessRulesEngine:
+    """业务规则引擎（执行 business_rules.json）
+
+    规则按 priority 升序执行。每个条件编译为 FilterPredicate 并计算整列布尔掩码，
+    带 aggregation/group_by 的条件先按分组聚合（transform）再比较；相同的条件在所有规则间只计算一次，
+    动作修改了条件引用的列时该条件的缓存失效。
+    按周期聚合（daily/weekly/monthly/yearly）的条件需要日期列：依次取条件、规则或 default_settings 中的
+    date_field，均未配置时记录警告并跳过该规则。
+    validation 类规则的动作作用于不满足条件的记录，其他类别作用于满足全部条件的记录，
+    else_actions 作用于其余记录。数据动作（flag_record、tag_record、new_field、update_field、
+    strip_whitespace、uppercase）均为整列运算；log_error/log_alert 记录命中数量，其余动作不在数据处理范围内。
+    """
+
+    DEFAULT_PATH = os.path.join(str(Path(__file__).parent), 'business_rules.json')
+    # 条件表示"必须满足"的规则类别
+    VALIDATION_CATEGORIES = ('validation',)
+    TAG_COLUMN = '标签'
+    AGGREGATION_PERIODS = {'daily': 'D', 'weekly': 'W', 'monthly': 'M', 'yearly': 'Y'}
+
+    def __init__(self, rules: List[Dict[str, Any]], settings: Optional[Dict[str, Any]] = None):
+        active = [rule for rule in rules if rule.get('active', True)]
+        self.rules = sorted(active, key=lambda rule: rule.get('priority', float('inf')))
+        self.settings = settings or {}
+        self.stats: List[Dict[str, Any]] = []
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> 'BusinessRulesEngine':
+        """从规则文件创建引擎"""
+        with open(path or cls.DEFAULT_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('business_rules', []), data.get('default_settings'))
+
+    @staticmethod
+    def _condition_key(condition: Dict[str, Any]) -> str:
+        return json.dumps([condition.get(key) for key in
+                           ('field', 'operator', 'value', 'aggregation', 'group_by', 'agg_func', 'date_field')],
+                          ensure_ascii=False, default=str)
+
+    def _resolve_conditions(self, rule: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """按周期聚合的条件补充日期列（条件 → 规则 → default_settings），无法确定时抛出 ValueError"""
+        conditions = []
+        for condition in rule.get('conditions', []):
+            if condition.get('aggregation') in self.AGGREGATION_PERIODS and not condition.get('date_field'):
+                date_field = rule.get('date_field') or self.settings.get('date_field')
+                if not date_field:
+                    raise ValueError(f"按 {condition['aggregation']} 聚合的条件未配置日期列 date_field")
+                condition = dict(condition, date_field=date_field)
+            conditions.append(condition)
+        return conditions
+
+    @staticmethod
+    def _group_keys(condition: Dict[str, Any]) -> List[str]:
+        group_by = condition.get('group_by') or []
+        return [group_by] if isinstance(group_by, str) else list(group_by)
+
+    def column_usage(self) -> Optional[Tuple[List[str], List[str]]]:
+        """按执行顺序推导规则引用的源数据列和规则新建的列（供查询计划裁剪列），无法解析公式时返回None
+
+        条件中 value_column 指定的比较列一并列入引用列，数据源中不存在的列在投影时被忽略。
+        flag_record/tag_record/update_field 会与已有的列合并，其目标列也视为引用列；
+        只有 new_field 整列生成的列是新建列。
+        """
+        referenced: Dict[str, None] = {}
+        created = set()
+
+        def use(columns):
+            for column in columns:
+                if column is not None and column not in created:
+                    referenced[column] = None
+
+        for rule in self.rules:
+            try:
+                conditions = self._resolve_conditions(rule)
+            except ValueError:
+                # 执行时跳过该规则
+                continue
+            for condition in conditions:
+                use([condition.get('field'), *self._group_keys(condition), condition.get('date_field'),
+                     condition.get('value_column')])
+            for action in rule.get('actions', []) + rule.get('else_actions', []):
+                action_type = action.get('type')
+                if action_type == 'new_field':
+                    try:
+                        use(FormulaExpression(action['formula']).columns)
+                    except ValueError:
+                        return None
+                    if action['name'] not in referenced:
+                        created.add(action['name'])
+                elif action_type == 'flag_record':
+                    use([action.get('flag') or rule.get('id')])
+                elif action_type == 'tag_record':
+                    use([action.get('column', self.TAG_COLUMN)])
+                else:
+                    use([action.get('field')])
+        return list(referenced), sorted(created)
+
+    def _condition_columns(self, condition: Dict[str, Any]) -> List[str]:
+        """条件引用的列（与其他列比较时也包括 value_column）"""
+        columns = [condition['field']] + self._group_keys(condition)
+        if condition.get('value_column'):
+            columns.append(condition['value_column'])
+        if condition.get('aggregation') in self.AGGREGATION_PERIODS and condition.get('date_field'):
+            columns.append(condition['date_field'])
+        return columns
+
+    def _evaluate_condition(self, df: 'pd.DataFrame', condition: Dict[str, Any]) -> 'np.ndarray':
+        field_name = condition['field']
+        operator = FilterCompiler.ALIASES.get(condition['operator'], condition['operator'])
+        if operator not in FilterCompiler.OPERATORS:
+            raise ValueError(f"不支持的规则运算符: {condition['operator']}")
+        predicate = FilterPredicate(field_name, operator, condition.get('value'),
+                                    bool(condition.get('keep_null', False)), condition.get('value_column'))
+
+        group_keys = self._group_keys(condition)
+        if condition.get('aggregation') and group_keys:
+            # 分组聚合后广播回每条记录再比较
+            keys = [df[col] for col in group_keys]
+            freq = self.AGGREGATION_PERIODS.get(condition['aggregation'])
+            if freq:
+                keys.append(pd.to_datetime(df[condition['date_field']], errors='coerce').dt.to_period(freq))
+            aggregated = df[field_name].groupby(keys, dropna=False).transform(condition.get('agg_func', 'sum'))
+            return predicate.evaluate(df.assign(**{field_name: aggregated}))
+        return predicate.evaluate(df)
+
+    def _apply_action(self, df: 'pd.DataFrame', rule: Dict[str, Any], action: Dict[str, Any],
+                      mask: 'np.ndarray', failures: List[Tuple[Dict[str, Any], int]]) -> Optional[str]:
+        """执行单个动作，返回被修改的列名"""
+        action_type = action.get('type')
+        count = int(mask.sum())
+
+        if action_type == 'flag_record':
+            column = action.get('flag') or rule.get('id')
+            flags = mask if column not in df.columns else (df[column].fillna(False).to_numpy(dtype=bool) | mask)
+            df[column] = flags
+            return column
+        if action_type == 'tag_record':
+            column = action.get('column', self.TAG_COLUMN)
+            tags = df[column].fillna('').astype(str) if column in df.columns else pd.Series('', index=df.index)
+            tagged = tags.mask(tags != '', tags + ',') + str(action['tag'])
+            df[column] = tags.where(~mask, tagged)
+            return column
+        if action_type == 'new_field':
+            # 与计算字段相同，只支持 FormulaExpression 白名单内的写法
+            values = FormulaExpression(action['formula']).evaluate(df)
+            df[action['name']] = pd.Series(values, index=df.index).where(mask)
+            return action['name']
+        if action_type == 'update_field':
+            column = action['field']
+            current = df[column] if column in df.columns else pd.Series(None, index=df.index, dtype=object)
+            if isinstance(current.dtype, pd.CategoricalDtype):
+                current = current.astype(current.cat.categories.dtype)
+            df[column] = current.mask(mask, action.get('value'))
+            return column
+        if action_type in ('strip_whitespace', 'uppercase'):
+            column = action['field']
+            if column not in df.columns or not FilterPredicate._is_text(df[column]):
+                return None
+            series = df[column]
+            transformed = series.str.strip() if action_type == 'strip_whitespace' else series.str.upper()
+            df[column] = series.where(~mask, transformed) if not mask.all() else transformed
+            return column
+        if action_type in ('log_error', 'log_alert'):
+            level = getattr(logging, str(action.get('level', 'warning')).upper(), logging.WARNING)
+            logger.log(level, f"规则 {rule.get('name', rule.get('id'))}: {count} 条记录命中")
+            for condition, violations in failures:
+                if violations and condition.get('error_message'):
+                    logger.log(level, f"  {condition['error_message']}: {violations} 条")
+            return None
+        logger.debug(f"规则 {rule.get('id')} 的动作 {action_type} 不在数据处理范围内，已跳过")
+        return None
+
+    def apply(self, df: 'pd.DataFrame') -> 'pd.DataFrame':
+        """按优先级执行所有规则，返回处理后的数据框（不修改输入）"""
+        result = df.copy(deep=False)
+        cache: Dict[str, 'np.ndarray'] = {}
+        cache_columns: Dict[str, List[str]] = {}
+        self.stats = []
+
+        for rule in self.rules:
+            start_time = time.perf_counter()
+            try:
+                conditions = self._resolve_conditions(rule)
+            except ValueError as e:
+                logger.warning(f"规则 {rule.get('id')} 已跳过: {e}")
+                continue
+            referenced = [col for condition in conditions for col in self._condition_columns(condition)]
+            missing = [col for col in referenced if col not in result.columns]
+            if missing:
+                logger.debug(f"规则 {rule.get('id')} 跳过: 缺少列 {sorted(set(missing))}")
+                continue
+
+            matched = np.ones(len(result), dtype=bool)
+            failures = []
+            try:
+                for condition in conditions:
+                    key = self._condition_key(condition)
+                    if key not in cache:
+                        cache[key] = self._evaluate_condition(result, condition)
+                        cache_columns[key] = self._condition_columns(condition)
+                    matched = matched & cache[key]
+                    failures.append((condition, int((~cache[key]).sum())))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"规则 {rule.get('id')} 条件计算失败，已跳过: {e}")
+                continue
+
+            if rule.get('category') in self.VALIDATION_CATEGORIES:
+                matched = ~matched
+            targets = [(rule.get('actions', []), matched), (rule.get('else_actions', []), ~matched)]
+            for actions, mask in targets:
+                for action in actions:
+                    try:
+                        modified = self._apply_action(result, rule, action, mask, failures)
+                    except Exception as e:
+                        logger.warning(f"规则 {rule.get('id')} 的动作 {action.get('type')} 执行失败: {e}")
+                        continue
+                    if modified is not None:
+                        # 引用了被修改列的条件需要重新计算
+                        for key in [key for key, columns in cache_columns.items() if modified in columns]:
+                            cache.pop(key, None)
+                            cache_columns.pop(key, None)
+
+            elapsed = time.perf_counter() - start_time
+            self.stats.append({'id': rule.get('id'), 'name': rule.get('name'),
+                               'matched': int(matched.sum()), 'seconds': elapsed})
+            logger.info(f"执行规则 {rule.get('name', rule.get('id'))}: 命中 {int(matched.sum())} 条，"
+                        f"耗时 {elapsed * 1000:.1f}ms")
+
+        return result
+
+
+class StatisticsKernel:
+    """融合的数值统计内核
+
+    将所有数值列按行块转换为二维float数组，每个行块一次向量化计算各列的
+    计数、总和、中心化平方和（M2）、最小值和最大值，行块之间使用并行方差公式（Chan等）合并。
+    行块在线程池中并行计算（NumPy运算释放GIL），内存占用只与行块大小有关。
+    """
+
+    BLOCK_ROWS = 262144
+    MAX_WORKERS = min(8, os.cpu_count() or 1)
+    # 参与分类统计的列类型：object、pandas 3 默认的 str 以及分类类型
+    CATEGORICAL_DTYPES = ['object', 'str', 'category']
+
+    @classmethod
+    def categorical_columns(cls, df: 'pd.DataFrame') -> 'pd.Index':
+        """参与分类统计的列（calculate_metrics 与 StreamingMetrics 共用）"""
+        try:
+            return df.select_dtypes(include=cls.CATEGORICAL_DTYPES).columns
+        except TypeError:
+            # pandas 2 不接受 'str'（字符串列为 object 类型）
+            return df.select_dtypes(include=['object', 'category']).columns
+
+    @staticmethod
+    def block_moments(block: 'np.ndarray') -> 'np.ndarray':
+        """计算二维数组各列的矩统计，返回形状为 (5, 列数) 的数组：计数、均值、M2、最小值、最大值"""
+        valid = ~np.isnan(block)
+        count = valid.sum(axis=0).astype(float)
+        if len(block) and count.min() == len(block):
+            # 无缺失值的行块直接计算，省去掩码
+            mean = block.mean(axis=0)
+            centered = block - mean
+            return np.vstack([count, mean, np.einsum('ij,ij->j', centered, centered),
+                              block.min(axis=0), block.max(axis=0)])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(valid, block, 0.0).sum(axis=0) / count
+            centered = np.where(valid, block - mean, 0.0)
+        m2 = np.einsum('ij,ij->j', centered, centered)
+        minimum = np.where(valid, block, np.inf).min(axis=0, initial=np.inf)
+        maximum = np.where(valid, block, -np.inf).max(axis=0, initial=-np.inf)
+        empty = count == 0
+        mean[empty], minimum[empty], maximum[empty] = np.nan, np.nan, np.nan
+        return np.vstack([count, mean, m2, minimum, maximum])
+
+    @staticmethod
+    def merge_moments(a: 'np.ndarray', b: 'np.ndarray') -> 'np.ndarray':
+        """合并两组矩统计（并行方差公式），空分区不影响结果"""
+        n_a, mean_a, m2_a, min_a, max_a = a
+        n_b, mean_b, m2_b, min_b, max_b = b
+        n = n_a + n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = np.nan_to_num(mean_b) - np.nan_to_num(mean_a)
+            weight = np.where(n > 0, n_b / np.where(n > 0, n, 1), 0.0)
+            mean = np.where(n_a == 0, mean_b, np.where(n_b == 0, mean_a, mean_a + delta * weight))
+            m2 = m2_a + m2_b + delta ** 2 * n_a * weight
+        return np.vstack([n, mean, m2, np.fmin(min_a, min_b), np.fmax(max_a, max_b)])
+
+    @classmethod
+    def compute(cls, df: 'pd.DataFrame', columns: List[Any]) -> 'np.ndarray':
+        """计算指定数值列的矩统计，返回形状为 (5, 列数) 的数组"""
+        columns = list(columns)
+        if not columns or df.empty:
+            moments = np.zeros((5, len(columns)))
+            moments[[1, 3, 4]] = np.nan
+            return moments
+
+        frame = df[columns]
+
+        def block(start: int) -> 'np.ndarray':
+            values = frame.iloc[start:start + cls.BLOCK_ROWS].to_numpy(dtype=float, na_value=np.nan)
+            return cls.block_moments(values)
+
+        starts = range(0, len(frame), cls.BLOCK_ROWS)
+        if len(starts) == 1 or cls.MAX_WORKERS <= 1:
+            partials = [block(start) for start in starts]
+        else:
+            with ThreadPoolExecutor(max_workers=min(cls.MAX_WORKERS, len(starts))) as executor:
+                partials = list(executor.map(block, starts))
+
+        moments = partials[0]
+        for partial in partials[1:]:
+            moments = cls.merge_moments(moments, partial)
+        return moments
+
+    @classmethod
+    def map_columns(cls, func, df: 'pd.DataFrame', columns: List[Any]) -> Dict[Any, Any]:
+        """按列并行执行 func(Series)，数据量较小时顺序执行"""
+        columns = list(columns)
+        if len(columns) < 2 or len(df) < cls.BLOCK_ROWS or cls.MAX_WORKERS <= 1:
+            return {col: func(df[col]) for col in columns}
+        with ThreadPoolExecutor(max_workers=min(cls.MAX_WORKERS, len(columns))) as executor:
+            return dict(zip(columns, executor.map(lambda col: func(df[col]), columns)))
+
+    @staticmethod
+    def median(series: 'pd.Series') -> float:
+        """中位数（基于快速选择，O(n)）"""
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        values = values[~np.isnan(values)]
+        return float(np.median(values)) if len(values) else float('nan')
+
+    @staticmethod
+    def top_value(counts: 'pd.Series') -> Any:
+        """频次最高的值，并列时与 mode() 一致取排序后的第一个值"""
+        if counts.empty:
+            return None
+        top_candidates = counts[counts == counts.max()].index
+        try:
+            return sorted(top_candidates)[0]
+        except TypeError:
+            return top_candidates[0]
+
+
+class KLLSketch:
+    """KLL分位数草图
+
+    各层缓冲区中的元素权重为 2^层号，缓冲区超出容量时排序后随机保留奇数或偶数位元素提升到上一层。
+    秩误差约为 error * n，草图之间可以直接合并。
+    """
+
+    def __init__(self, error: float = 0.01, seed: Optional[int] = 0):
+        self.error = error
+        self.k = max(16, int(np.ceil(1.7 / error)))
+        self.levels: List['np.ndarray'] = [np.empty(0)]
+        self.count = 0
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # 奇数个元素时保留一个在当前层
+                keep = len(items) % 2
+                promoted = items[keep:][self._rng.integers(2)::2]
+                self.levels[level] = items[:keep]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values: Any) -> 'KLLSketch':
+        """加入一批数值（忽略缺失值）"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.count += len(values)
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        """合并另一个草图"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def quantile(self, q: float) -> float:
+        """估计分位数"""
+        if self.count == 0:
+            return float('nan')
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = min(int(np.searchsorted(cumulative, q * cumulative[-1])), len(items) - 1)
+        return float(items[order][position])
+
+
+class HyperLogLog:
+    """HyperLogLog基数估计
+
+    值经 pd.util.hash_array 哈希为64位，前 p 位选择寄存器，其余位的前导零个数决定寄存器取值。
+    相对标准误差约为 1.04 / sqrt(2^p)，合并时逐寄存器取最大值。
+    """
+
+    def __init__(self, error: float = 0.01):
+        self.p = min(18, max(4, int(np.ceil(np.log2((1.04 / error) ** 2)))))
+        self.registers = np.zeros(1 << self.p, dtype=np.uint8)
+
+    def update(self, values: Any) -> 'HyperLogLog':
+        """加入一批值（可以包含重复值，调用方负责去除缺失值）"""
+        values = pd.Series(values)
+        if values.empty:
+            return self
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # 分类列只需哈希类别本身
+            categories = pd.util.hash_array(values.cat.categories.to_numpy())
+            hashes = categories[values.cat.codes.to_numpy()[values.cat.codes.to_numpy() >= 0]]
+        else:
+            hashes = pd.util.hash_array(values.to_numpy())
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes << np.uint64(self.p)
+        # 剩余位的前导零个数：高低32位分别转换为float（精确）取指数
+        high = (rest >> np.uint64(32)).astype(np.float64)
+        low = (rest & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        zeros = np.where(high > 0, 32 - np.frexp(high)[1], 64 - np.frexp(low)[1])
+        rank = np.minimum(zeros + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """合并另一个草图（精度必须相同）"""
+        if other.p != self.p:
+            raise ValueError("HyperLogLog 精度不一致，无法合并")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        """估计不同值的个数"""
+        m = len(self.registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and empty > 0:
+            # 小基数时使用线性计数
+            estimate = m * np.log(m / empty)
+        return int(round(estimate))
+
+
+class MisraGriesSketch:
+    """Misra-Gries频繁项草图
+
+    最多保留 1/error 个计数器，计数为真实频次的下界，误差不超过 error * n；
+    超出容量时所有计数减去第 (容量+1) 大的计数，合并满足同样的误差界。
+    """
+
+    def __init__(self, error: float = 0.001):
+        self.error = error
+        self.capacity = max(1, int(np.ceil(1 / error)))
+        self.counts = pd.Series(dtype=float)
+        self.count = 0
+        # 计数器全部被抵消时（没有频繁项）使用的候选值
+        self._candidate = None
+
+    def _merge_counts(self, counts: 'pd.Series'):
+        combined = counts if self.counts.empty else self.counts.add(counts, fill_value=0)
+        if len(combined) > self.capacity:
+            largest = combined.nlargest(self.capacity + 1, keep='all')
+            self._candidate = StatisticsKernel.top_value(largest)
+            combined = combined - largest.iloc[self.capacity]
+            combined = combined[combined > 0]
+        self.counts = combined
+
+    def update(self, counts: 'pd.Series') -> 'MisraGriesSketch':
+        """加入一批值的频次（value_counts 结果）"""
+        counts = counts[counts > 0]
+        if isinstance(counts.index, pd.CategoricalIndex):
+            counts.index = counts.index.astype(object)
+        self.count += int(counts.sum())
+        if not counts.empty:
+            self._merge_counts(counts.astype(float))
+        return self
+
+    def merge(self, other: 'MisraGriesSketch') -> 'MisraGriesSketch':
+        """合并另一个草图"""
+        self.count += other.count
+        if not other.counts.empty:
+            self._merge_counts(other.counts)
+        if self._candidate is None:
+            self._candidate = other._candidate
+        return self
+
+    def top_k(self, k: int = 10) -> List[Tuple[Any, int]]:
+        """频次最高的 k 个值及其频次下界"""
+        return [(value, int(count)) for value, count in self.counts.nlargest(k).items()]
+
+    def top_value(self) -> Any:
+        """频次最高的值"""
+        if self.counts.empty:
+            return self._candidate
+        return StatisticsKernel.top_value(self.counts)
+
+
+class StreamingMetrics:
+    """可合并的流式指标状态
+
+    逐块累积计数、缺失值、矩统计与分类值频次，最终生成与
+    DataProcessor.calculate_metrics 相同结构的指标。
+    启用近似模式时，数值列额外维护KLL分位数草图以输出中位数，分类列使用
+    HyperLogLog 和 Misra-Gries 草图代替完整的值频次，状态大小与数据量无关。
+    """
+
+    # 近似模式的默认误差界；min_rows 为 calculate_metrics 启用近似模式的最小行数
+    SKETCH_DEFAULTS = {'quantile_error': 0.01, 'distinct_error': 0.01, 'topk_error': 0.001, 'min_rows': 100000}
+
+    def __init__(self, approximate: Union[bool, Dict[str, Any], None] = None):
+        self.sketch_options = self.get_sketch_options(approximate)
+        self.quantiles: Dict[str, KLLSketch] = {}
+        self.distinct: Dict[str, HyperLogLog] = {}
+        self.frequent: Dict[str, MisraGriesSketch] = {}
+        self.total_records = 0
+        self.columns: List[str] = []
+        self.missing: Dict[str, int] = {}
+        # 数值列状态：{列名: [计数, 均值, M2, 最小值, 最大值]}
+        self.numeric: Dict[str, List[float]] = {}
+        # 分类列状态：{列名: 值频次Series}
+        self.value_counts: Dict[str, 'pd.Series'] = {}
+        self._non_numeric: set = set()
+        self._non_categorical: set = set()
+
+    @classmethod
+    def get_sketch_options(cls, approximate: Union[bool, Dict[str, Any], None]) -> Optional[Dict[str, Any]]:
+        """解析近似模式参数：True 使用默认误差界，字典覆盖部分默认值"""
+        if not approximate:
+            return None
+        options = dict(cls.SKETCH_DEFAULTS)
+        if isinstance(approximate, dict):
+            options.update(approximate)
+        return options
+
+    @classmethod
+    def from_frame(cls, df: 'pd.DataFrame',
+                   approximate: Union[bool, Dict[str, Any], None] = None) -> 'StreamingMetrics':
+        """将数据框按行块分区并行累积后合并"""
+        block_rows = StatisticsKernel.BLOCK_ROWS
+        starts = range(0, len(df), block_rows)
+
+        def partition(start: int) -> 'StreamingMetrics':
+            metrics = cls(approximate)
+            metrics.update(df.iloc[start:start + block_rows])
+            return metrics
+
+        if len(starts) <= 1 or StatisticsKernel.MAX_WORKERS <= 1:
+            partials = [partition(start) for start in starts] or [partition(0)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(StatisticsKernel.MAX_WORKERS, len(starts))) as executor:
+                partials = list(executor.map(partition, starts))
+
+        result = partials[0]
+        for partial in partials[1:]:
+            result.merge(partial)
+        return result
+
+    def update(self, df: 'pd.DataFrame'):
+        """累积一个数据块"""
+        for col in df.columns:
+            if col not in self.missing:
+                self.columns.append(col)
+                self.missing[col] = 0
+        self.total_records += len(df)
+        if df.empty:
+            return
+
+        for col, count in df.isnull().sum().items():
+            self.missing[col] += int(count)
+
+        numeric_cols = set(df.select_dtypes(include=[np.number]).columns)
+        # 与 calculate_metrics 一致，压缩后的分类类型列按分类列统计
+        categorical_cols = set(StatisticsKernel.categorical_columns(df))
+        for col in df.columns:
+            if col not in numeric_cols:
+                self._non_numeric.add(col)
+            if col not in categorical_cols:
+                self._non_categorical.add(col)
+
+        # 所有数值列一次性计算矩统计
+        numeric_list = [col for col in df.columns if col in numeric_cols]
+        moments = StatisticsKernel.compute(df, numeric_list)
+        for position, col in enumerate(numeric_list):
+            if moments[0, position] > 0:
+                self._merge_moments(col, [float(value) for value in moments[:, position]])
+
+        options = self.sketch_options
+        if options is not None:
+            for col in numeric_list:
+                if col not in self.quantiles:
+                    self.quantiles[col] = KLLSketch(options['quantile_error'])
+                self.quantiles[col].update(df[col].to_numpy(dtype=float, na_value=np.nan))
+
+        for col in categorical_cols:
+            counts = df[col].value_counts(dropna=True, sort=False)
+            if isinstance(counts.index, pd.CategoricalIndex):
+                # 分类列只统计实际出现的值，并转换为普通索引以便与其他数据块合并
+                counts = counts[counts > 0]
+                counts.index = counts.index.astype(counts.index.categories.dtype)
+            if options is None:
+                if col in self.value_counts:
+                    self.value_counts[col] = self.value_counts[col].add(counts, fill_value=0)
+                else:
+                    self.value_counts[col] = counts
+                continue
+            if col not in self.distinct:
+                self.distinct[col] = HyperLogLog(options['distinct_error'])
+                self.frequent[col] = MisraGriesSketch(options['topk_error'])
+            # 基数估计对重复值不敏感，只需哈希块内出现的不同值
+            self.distinct[col].update(counts.index[counts.to_numpy() > 0])
+            self.frequent[col].update(counts)
+
+    def _merge_moments(self, col: str, other: List[float]):
+        """使用并行方差公式合并矩统计"""
+        if col not in self.numeric:
+            self.numeric[col] = other
+            return
+        merged = StatisticsKernel.merge_moments(
+            np.array(self.numeric[col], dtype=float).reshape(5, 1),
+            np.array(other, dtype=float).reshape(5, 1)
+        )
+        self.numeric[col] = [float(value) for value in merged[:, 0]]
+
+    def merge(self, other: 'StreamingMetrics') -> 'StreamingMetrics':
+        """合并另一个分区的指标状态"""
+        for col in other.columns:
+            if col not in self.missing:
+                self.columns.append(col)
+                self.missing[col] = 0
+            self.missing[col] += other.missing[col]
+        self.total_records += other.total_records
+        self._non_numeric |= other._non_numeric
+        self._non_categorical |= other._non_categorical
+        for col, moments in other.numeric.items():
+            self._merge_moments(col, list(moments))
+        for col, counts in other.value_counts.items():
+            if col in self.value_counts:
+                self.value_counts[col] = self.value_counts[col].add(counts, fill_value=0)
+            else:
+                self.value_counts[col] = counts
+        for sketches, other_sketches in ((self.quantiles, other.quantiles), (self.distinct, other.distinct),
+                                         (self.frequent, other.frequent)):
+            for col, sketch in other_sketches.items():
+                if col in sketches:
+                    sketches[col].merge(sketch)
+                else:
+                    sketches[col] = sketch
+        return self
+
+    def result(self) -> Dict[str, Union[int, Dict[str, Any]]]:
+        """生成指标结果"""
+        metrics = {
+            'total_records': self.total_records,
+            'total_columns': len(self.columns),
+            'missing_values': {col: count for col, count in self.missing.items() if count > 0},
+            'numeric_stats': {},
+            'categorical_stats': {}
+        }
+
+        for col in self.columns:
+            if col in self._non_numeric or col not in self.numeric:
+                continue
+            n, mean, m2, min_value, max_value = self.numeric[col]
+            stats = {'mean': mean}
+            if col in self.quantiles:
+                stats['median'] = self.quantiles[col].quantile(0.5)
+            stats.update({
+                'min': min_value,
+                'max': max_value,
+                'std': (m2 / (n - 1)) ** 0.5 if n > 1 else float('nan')
+            })
+            metrics['numeric_stats'][col] = stats
+
+        for col in self.columns:
+            if col in self._non_categorical:
+                continue
+            if col in self.distinct:
+                metrics['categorical_stats'][col] = {
+                    'unique_count': self.distinct[col].count(),
+                    'top_value': self.frequent[col].top_value()
+                }
+            elif col in self.value_counts:
+                counts = self.value_counts[col]
+                metrics['categorical_stats'][col] = {
+                    'unique_count': int(len(counts)),
+                    'top_value': StatisticsKernel.top_value(counts)
+                }
+
+        return metrics
+
+
+class PartialAggregate:
+    """可合并的分组聚合状态，用于流式执行 groupby 计算"""
+
+    # 支持分块合并的聚合函数：{聚合函数: 合并各块部分结果时使用的函数}
+    MERGEABLE_FUNCS = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+    SUPPORTED_FUNCS = set(MERGEABLE_FUNCS) | {'mean'}
+    # 累积的部分结果达到该数量时合并一次
+    COMPACT_THRESHOLD = 16
+
+    def __init__(self, group_by: List[str], aggregate: Dict[str, Union[str, List[str]]]):
+        self.group_by = list(group_by)
+        self.aggregate = aggregate
+        # 需要维护的部分状态：{状态列名: (源列, 部分聚合函数)}
+        self._state_columns: Dict[str, Tuple[str, str]] = {}
+        for col, funcs in aggregate.items():
+            for func in self._as_list(funcs):
+                parts = ['sum', 'count'] if func == 'mean' else [func]
+                for part in parts:
+                    self._state_columns[f"{col}__{part}"] = (col, part)
+        self._partials: List['pd.DataFrame'] = []
+
+    @staticmethod
+    def _as_list(funcs: Union[str, List[str]]) -> List[str]:
+        return list(funcs) if isinstance(funcs, (list, tuple)) else [funcs]
+
+    @classmethod
+    def supports(cls, calc: Dict[str, Any]) -> bool:
+        """判断分组计算能否以部分聚合方式流式执行"""
+        if calc.get('operation') != 'groupby':
+            return False
+        group_cols = calc.get('group_by', [])
+        agg_cols = calc.get('aggregate', {})
+        if not group_cols or not agg_cols or not isinstance(agg_cols, dict):
+            return False
+        return all(
+            isinstance(func, str) and func in cls.SUPPORTED_FUNCS
+            for funcs in agg_cols.values() for func in cls._as_list(funcs)
+        )
+
+    def update(self, df: 'pd.DataFrame'):
+        """对一个数据块执行部分聚合"""
+        if df.empty:
+            return
+        partial = df.groupby(self.group_by).agg(**self._state_columns)
+        self._partials.append(partial)
+        if len(self._partials) >= self.COMPACT_THRESHOLD:
+            self._partials = [self._combine(self._partials)]
+
+    def _combine(self, partials: List['pd.DataFrame']) -> 'pd.DataFrame':
+        """合并多个部分聚合结果"""
+        merge_funcs = {
+            name: self.MERGEABLE_FUNCS[part] for name, (_, part) in self._state_columns.items()
+        }
+        return pd.concat(partials).groupby(level=list(range(len(self.group_by)))).agg(merge_funcs)
+
+    def result(self) -> 'pd.DataFrame':
+        """生成与 DataFrame.groupby().agg() 相同结构的最终结果"""
+        if self._partials:
+            state = self._combine(self._partials)
+        else:
+            state = pd.DataFrame(columns=list(self._state_columns)).set_index(
+                pd.MultiIndex.from_arrays([[]] * len(self.group_by), names=self.group_by)
+                if len(self.group_by) > 1 else pd.Index([], name=self.group_by[0])
+            )
+
+        has_list = any(isinstance(funcs, (list, tuple)) for funcs in self.aggregate.values())
+        result = {}
+        for col, funcs in self.aggregate.items():
+            for func in self._as_list(funcs):
+                if func == 'mean':
+                    values = state[f"{col}__sum"] / state[f"{col}__count"]
+                else:
+                    values = state[f"{col}__{func}"]
+                result[(col, func) if has_list else col] = values
+
+        grouped = pd.DataFrame(result, index=state.index)
+        if has_list:
+            grouped.columns = pd.MultiIndex.from_tuples(grouped.columns)
+        return grouped.reset_index()
+
+
+class StreamingPipeline:
+    """流式处理管道
+
+    每个数据块依次经过过滤、行级计算和部分聚合后再读取下一块，
+    只保留过滤后存活的行以及可合并的聚合状态。
+    """
+
+    def __init__(self, filters: Optional[Dict[str, Any]] = None,
+                 calculations: Optional[List[Dict[str, Any]]] = None,
+                 approximate: Union[bool, Dict[str, Any], None] = None):
+        self.filters = filters or {}
+        self.approximate = approximate
+        calculations = calculations or []
+
+        # 第一个分组/透视操作之前的公式计算可以逐块执行
+        split_index = next(
+            (i for i, calc in enumerate(calculations) if calc.get('operation') in ('groupby', 'pivot')),
+            len(calculations)
+        )
+        self.row_calculations = calculations[:split_index]
+        self.final_calculations = calculations[split_index:]
+
+        self.partial_aggregate = None
+        if self.final_calculations and PartialAggregate.supports(self.final_calculations[0]):
+            calc = self.final_calculations[0]
+            self.partial_aggregate = PartialAggregate(calc['group_by'], calc['aggregate'])
+            logger.info(f"分组聚合将以部分聚合方式流式执行: {calc['group_by']}")
+
+        self.metrics = StreamingMetrics(approximate)
+        self.rows_read = 0
+        self.chunks_read = 0
+        self._kept_chunks: List['pd.DataFrame'] = []
+        # restore_state 恢复的存活行块数，get_state 只返回之后新增的存活行
+        self._restored_chunks = 0
+
+    def process_chunk(self, chunk: 'pd.DataFrame'):
+        """处理单个数据块"""
+        self.rows_read += len(chunk)
+        self.chunks_read += 1
+
+        if self.filters:
+            chunk = DataProcessor.apply_filters(chunk, self.filters)
+        if self.row_calculations:
+            chunk = DataProcessor.apply_calculations(chunk, self.row_calculations)
+
+        if self.partial_aggregate is not None:
+            self.partial_aggregate.update(chunk)
+        else:
+            if not self.final_calculations:
+                self.metrics.update(chunk)
+            if not chunk.empty or not self._kept_chunks:
+                self._kept_chunks.append(chunk)
+
+    def get_state(self) -> Dict[str, Any]:
+        """返回可持久化的累积状态（指标、部分聚合与存活行）
+
+        存活行只包含 restore_state 之后新增的部分，调用方将其追加到已保存的存活行之后。
+        """
+        if self.partial_aggregate is not None and len(self.partial_aggregate._partials) > 1:
+            self.partial_aggregate._partials = [self.partial_aggregate._combine(self.partial_aggregate._partials)]
+        new_chunks = self._kept_chunks[self._restored_chunks:]
+        if len(new_chunks) > 1:
+            new_chunks = [pd.concat(new_chunks, ignore_index=True)]
+            self._kept_chunks[self._restored_chunks:] = new_chunks
+        return {
+            'metrics': self.metrics,
+            'partial_aggregate': self.partial_aggregate,
+            'kept_chunks': new_chunks,
+            'rows_read': self.rows_read,
+            'chunks_read': self.chunks_read
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        """恢复之前保存的累积状态，之后处理的数据块合并到该状态中"""
+        self.metrics = state['metrics']
+        self.partial_aggregate = state['partial_aggregate']
+        self._kept_chunks = list(state['kept_chunks'])
+        self._restored_chunks = len(self._kept_chunks)
+        self.rows_read = state['rows_read']
+        self.chunks_read = state['chunks_read']
+
+    def run(self, chunks: Iterable['pd.DataFrame']) -> Tuple['pd.DataFrame', Dict[str, Any]]:
+        """处理所有数据块并返回结果数据与指标"""
+        for chunk in chunks:
+            self.process_chunk(chunk)
+        return self.finalize()
+
+    def finalize(self) -> Tuple['pd.DataFrame', Dict[str, Any]]:
+        """汇总各数据块的处理结果"""
+        if self.partial_aggregate is not None:
+            df = self.partial_aggregate.result()
+            logger.info(f"成功执行分组聚合: {self.partial_aggregate.group_by}")
+            # 分组之后的计算阶段在聚合结果上执行
+            df = DataProcessor.apply_calculations(df, self.final_calculations[1:])
+            return df, DataProcessor.calculate_metrics(df, self.approximate)
+
+        if self._kept_chunks:
+            df = pd.concat(self._kept_chunks, ignore_index=True)
+        else:
+            df = pd.DataFrame()
+        self._kept_chunks = []
+        logger.info(f"流式处理完成: 读取 {self.chunks_read} 块共 {self.rows_read} 行，保留 {len(df)} 行")
+
+        if self.final_calculations:
+            # 无法流式执行的计算（如透视表）在存活行上统一执行
+            df = DataProcessor.apply_calculations(df, self.final_calculations)
+            return df, DataProcessor.calculate_metrics(df, self.approximate)
+
+        return df, self.metrics.result()
+
+class IncrementalMetricsStore:
+    """增量指标状态存储
+
+    按报表持久化流式管道的累积状态（矩统计、草图、分组部分聚合及存活行），同时记录
+    输入的高水位线和已处理部分的指纹。下次运行时只处理高水位线之后追加的数据；
+    指纹不一致（数据源被改写）或报表配置变化时全量重新计算。
+
+    聚合状态与数据量无关，每次运行整体重写；存活行按运行追加为独立的分段文件，
+    写入量只与新增数据成正比，分段数超过 MAX_SEGMENTS 时合并为一个分段。
+    """
+
+    DEFAULT_DIR = os.path.join(str(Path(__file__).parent), '.cache', 'incremental')
+    VERSION = 2
+    # 计算文件指纹时每次读取的字节数
+    BLOCK_SIZE = 1024 * 1024
+    MAX_SEGMENTS = 32
+
+    def __init__(self, state_dir: Optional[str] = None):
+        self.state_dir = state_dir or self.DEFAULT_DIR
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """根据任意可序列化内容生成键"""
+        return hashlib.sha256(
+            json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+
+    def _state_path(self, report_key: str) -> str:
+        return os.path.join(self.state_dir, f"{report_key}.pkl")
+
+    def _segment_files(self, report_key: str) -> List[str]:
+        prefix = f"{report_key}."
+        return [name for name in os.listdir(self.state_dir)
+                if name.startswith(prefix) and name.endswith('.rows.pkl')]
+
+    def _write_segment(self, report_key: str, df: 'pd.DataFrame') -> str:
+        name = f"{report_key}.{time.time_ns()}.{os.getpid()}.{threading.get_ident()}.rows.pkl"
+        df.to_pickle(os.path.join(self.state_dir, name))
+        return name
+
+    def load(self, report_key: str, plan_key: str) -> Optional[Dict[str, Any]]:
+        """读取报表的增量状态，不存在、损坏或报表配置已变化时返回None
+
+        返回状态中 pipeline.kept_chunks 为各分段的存活行，segments 为分段文件名。
+        """
+        path = self._state_path(report_key)
+        if not os.path.exists(path):
+            return None
+        try:
+            state = pd.read_pickle(path)
+            if state.get('version') != self.VERSION or state.get('plan_key') != plan_key:
+                logger.info("报表配置已变化，增量状态失效")
+                return None
+            state['pipeline']['kept_chunks'] = [
+                pd.read_pickle(os.path.join(self.state_dir, name)) for name in state['segments']
+            ]
+        except Exception as e:
+            logger.warning(f"读取增量状态失败，将全量计算: {e}")
+            return None
+        return state
+
+    def save(self, report_key: str, state: Dict[str, Any], base: Optional[Dict[str, Any]] = None):
+        """原子地保存报表的增量状态
+
+        state['pipeline']['kept_chunks'] 只包含本次新增的存活行。base 为本次运行恢复的状态时
+        新增的存活行追加为新分段，否则替换之前保存的全部分段。
+        """
+        segments = list(base['segments']) if base else []
+        pipeline_state = dict(state['pipeline'], kept_chunks=[])
+        new_chunks = state['pipeline']['kept_chunks']
+        if new_chunks and (not segments or any(not chunk.empty for chunk in new_chunks)):
+            segments.append(self._write_segment(report_key, pd.concat(new_chunks, ignore_index=True)))
+        if len(segments) > self.MAX_SEGMENTS:
+            merged = pd.concat([pd.read_pickle(os.path.join(self.state_dir, name)) for name in segments],
+                               ignore_index=True)
+            segments = [self._write_segment(report_key, merged)]
+
+        path = self._state_path(report_key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pd.to_pickle(dict(state, pipeline=pipeline_state, segments=segments, version=self.VERSION), tmp_path)
+        os.replace(tmp_path, path)
+        # 删除不再被引用的分段
+        for name in set(self._segment_files(report_key)) - set(segments):
+            os.remove(os.path.join(self.state_dir, name))
+
+    def clear(self, report_key: str):
+        """删除报表的增量状态"""
+        path = self._state_path(report_key)
+        if os.path.exists(path):
+            os.remove(path)
+        for name in self._segment_files(report_key):
+            os.remove(os.path.join(self.state_dir, name))
+
     @staticmethod
-    def calculate_metrics(df: 'pd.DataFrame') -> Dict[str, Union[int, Dict[str, Any]]]:
-        """计算关键指标（优化版）"""
-        metrics = {
-            'total_records': len(df),
-            'total_columns': len(df.columns),
-            'missing_values': {},
-            'numeric_stats': {},
-            'categorical_stats': {}
-        }
-        
-        # 计算缺失值（优化：使用更高效的方式）
-        missing_values = df.isnull().sum()
-        metrics['missing_values'] = missing_values[missing_values > 0].to_dict()
-        
-        # 数值列统计
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        if len(numeric_cols) > 0:
-            # 对于大型数据集，只计算基本统计量以提高性能
-            if len(df) > 100000:
-                # 使用describe()一次性计算所有基本统计量，比逐个计算更快
-                desc_stats = df[numeric_cols].describe()
-                for col in numeric_cols:
-                    metrics['numeric_stats'][col] = {
-                        'mean': desc_stats[col]['mean'],
-                        'min': desc_stats[col]['min'],
-                        'max': desc_stats[col]['max'],
-                        'std': desc_stats[col]['std']
-                        # 对于大数据集，不计算中位数以提高性能
-                    }
-            else:
-                # 小数据集计算完整统计量
-                for col in numeric_cols:
-                    metrics['numeric_stats'][col] = {
-                        'mean': df[col].mean(),
-                        'median': df[col].median(),
-                        'min': df[col].min(),
-                        'max': df[col].max(),
-                        'std': df[col].std()
-                    }
-        
-        # 分类列统计
-        categorical_cols = df.select_dtypes(include=['object']).columns
-        if len(categorical_cols) > 0:
-            for col in categorical_cols:
-                # 优化：只计算非空值的唯一数
-                unique_count = df[col].nunique(dropna=True)
-                
-                # 对于大型数据集，不计算top_value以提高性能
-                if len(df) > 100000:
-                    metrics['categorical_stats'][col] = {
-                        'unique_count': unique_count
-                    }
-                else:
-                    # 小数据集计算完整统计量
-                    top_value = df[col].mode().iloc[0] if not df[col].mode().empty else None
-                    metrics['categorical_stats'][col] = {
-                        'unique_count': unique_count,
-                        'top_value': top_value
-                    }
-        
-        return metrics
+    def complete_size(path: str) -> int:
+        """文件中最后一个完整行结束处的字节偏移（忽略正在写入的半行）"""
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            position = size
+            while position > 0:
+                start = max(0, position - 65536)
+                f.seek(start)
+                block = f.read(position - start)
+                newline = block.rfind(b'\n')
+                if newline >= 0:
+                    return start + newline + 1
+                position = start
+        return 0
+
+    @classmethod
+    def file_digest(cls, path: str, start: int, end: int, digest=None):
+        """将文件 [start, end) 区域的字节追加到摘要中（默认新建SHA-256摘要）"""
+        digest = digest if digest is not None else hashlib.sha256()
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                block = f.read(min(cls.BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+        return digest
+
+    @classmethod
+    def file_fingerprint(cls, path: str, offset: int) -> str:
+        """文件前 offset 字节的完整指纹"""
+        return cls.file_digest(path, 0, offset).hexdigest()
+
+    @staticmethod
+    def file_stat(path: str) -> Tuple[int, int]:
+        """文件大小与修改时间（纳秒）"""
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def frame_fingerprint(df: 'pd.DataFrame', rows: int) -> str:
+        """数据框前 rows 行的完整指纹"""
+        digest = hashlib.sha256(json.dumps([rows, [str(col) for col in df.columns]]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(df.iloc[:rows], index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+
 
 class ReportGenerator(ABC):
     """报表生成器抽象基类"""
@@ -1416,50 +4656,184 @@ class ReportGenerator(ABC):
 
 # Excel报表生成器优化
 class ExcelReportGenerator(ReportGenerator):
-    """Excel报表生成器（优化版）"""
+    """Excel报表生成器（优化版）
+
+    使用 openpyxl 的 write_only 工作簿：数据按批次从数据框转换为行后直接写入文件，
+    不在内存中构建单元格对象，内存占用与行数无关；表头通过共享的命名样式设置。
+    数据超过单个工作表的行数上限（sheet_rows）时按 overflow 选项处理：
+    'sheets' 拆分到 数据_1、数据_2 … 多个工作表；'workbooks' 按 workbook_rows 拆分为多个工作簿，
+    在子进程中并行写入后打包为zip；'truncate' 只写入前 sheet_rows 行。
+    图表使用 openpyxl 的原生图表对象，数据来自隐藏的 图表数据 工作表，其中是按图表的
+    分组键一次 groupby 得到的聚合结果，图表的开销与数据行数基本无关。
+    """
+    
+    MAX_ROWS = 1000000
+    # Excel 单个工作表最多 1048576 行（含表头）
+    EXCEL_MAX_ROWS = 1048575
+    OVERFLOW_MODES = ('sheets', 'workbooks', 'truncate')
+    BATCH_ROWS = 10000
+    HEADER_STYLE = 'report_header'
+    MAX_COLUMN_WIDTH = 50
+    # 估计列宽时的抽样行数：开头、末尾和中间随机抽取的行数
+    WIDTH_SAMPLE_DEFAULTS = {'head': 1000, 'tail': 1000, 'random': 1000, 'seed': 0}
+    CHART_SHEET = '图表'
+    CHART_DATA_SHEET = '图表数据'
+    CHART_TYPES = ('bar', 'line', 'pie', 'scatter')
+    # 每个图表最多的类别数（散点图为抽样点数）
+    MAX_CHART_POINTS = 1000
+    CHART_AGGREGATES = ('sum', 'mean', 'median', 'min', 'max', 'count', 'nunique', 'first', 'last', 'std', 'var')
+    # 日期X轴的类别超过 MAX_CHART_POINTS 时依次尝试的重采样粒度
+    CHART_RESAMPLE_FREQS = (('D', '日'), ('W', '周'), ('M', '月'), ('Q', '季度'), ('Y', '年'))
+    # 东亚宽字符（中日韩文字、全角符号）按两个字符宽度计算
+    WIDE_CHAR_PATTERN = ('[\u1100-\u115f\u2e80-\u303e\u3041-\u33ff\u3400-\u4dbf\u4e00-\u9fff'
+                         '\ua000-\ua4cf\uac00-\ud7a3\uf900-\ufaff\ufe30-\ufe4f\uff00-\uff60\uffe0-\uffe6]')
+    
+    def __init__(self, options: Optional[Dict[str, Any]] = None):
+        options = options or {}
+        self.options = options
+        self.width_sample = dict(self.WIDTH_SAMPLE_DEFAULTS)
+        self.width_sample.update(options.get('width_sample') or {})
+        self.overflow = options.get('overflow', 'sheets')
+        if self.overflow not in self.OVERFLOW_MODES:
+            raise ValueError(f"不支持的Excel溢出模式: {self.overflow}")
+        self.sheet_rows = min(int(options.get('sheet_rows') or self.MAX_ROWS), self.EXCEL_MAX_ROWS)
+        self.workbook_rows = int(options.get('workbook_rows') or self.sheet_rows)
+        self.workers = int(options.get('workers') or min(4, os.cpu_count() or 1))
     
     def generate(self, df: 'pd.DataFrame', metrics: Dict[str, Any], output_path: str, charts: Optional[List[Dict[str, Any]]] = None) -> str:
         try:
             logger.info(f"生成Excel报表: {output_path}")
+            start_time = time.perf_counter()
+            summary_df = self._create_summary_table(df, metrics)
+            chart_data = self.aggregate_charts(df, charts)
             
-            # 对于大型数据集，只写入前100万行
-            if len(df) > 1000000:
-                logger.info(f"数据集过大 ({len(df)} 行)，只写入前100万行")
-                df_to_write = df.head(1000000)
+            if self.overflow == 'workbooks' and len(df) > self.workbook_rows:
+                output_path = self._write_bundle(output_path, df, summary_df, chart_data)
             else:
-                df_to_write = df
-            
-            # 创建Excel工作簿
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                # 写入原始数据
-                df_to_write.to_excel(writer, sheet_name='数据', index=False)
-                
-                # 创建摘要表
-                summary_df = self._create_summary_table(df, metrics)
-                summary_df.to_excel(writer, sheet_name='摘要', index=False)
-                
-                # 获取工作表
-                data_worksheet = writer.sheets['数据']
-                summary_worksheet = writer.sheets['摘要']
-                
-                # 应用样式
-                self._apply_excel_styles(data_worksheet, df_to_write)
-                self._apply_excel_styles(summary_worksheet, summary_df)
-                
-                # 自动调整列宽
-                self._auto_adjust_columns(data_worksheet, df_to_write)
-                self._auto_adjust_columns(summary_worksheet, summary_df)
-                
-                # 添加图表（仅当数据量适中时）
-                if charts and len(df_to_write) < 10000:
-                    self._add_charts(writer.book, df_to_write, charts)
+                self._write_workbook(output_path, df, summary_df, chart_data)
             
-            logger.info(f"Excel报表生成成功: {output_path}")
+            logger.info(f"Excel报表生成成功: {output_path}（{len(df)} 行，"
+                        f"耗时 {time.perf_counter() - start_time:.2f}s）")
             return output_path
         except Exception as e:
             logger.error(f"生成Excel报表失败: {e}")
             raise
     
+    def _write_workbook(self, output_path: str, df: 'pd.DataFrame', summary_df: Optional['pd.DataFrame'] = None,
+                        chart_data: Optional[List[Tuple[Dict[str, Any], 'pd.DataFrame']]] = None) -> str:
+        """将数据（超过 sheet_rows 时拆分为多个工作表）、摘要和图表写入一个工作簿"""
+        if len(df) > self.sheet_rows and self.overflow == 'truncate':
+            logger.info(f"数据集过大 ({len(df)} 行)，只写入前 {self.sheet_rows} 行")
+            df = df.head(self.sheet_rows)
+        
+        # 创建只写工作簿（流式写入）
+        workbook = openpyxl.Workbook(write_only=True)
+        self._register_styles(workbook)
+        
+        # 写入原始数据
+        starts = range(0, max(len(df), 1), self.sheet_rows)
+        if len(starts) > 1:
+            logger.info(f"数据超过单个工作表的行数上限 ({len(df)} 行)，拆分为 {len(starts)} 个工作表")
+        for number, start in enumerate(starts, start=1):
+            title = '数据' if len(starts) == 1 else f'数据_{number}'
+            self._write_sheet(workbook, title, df.iloc[start:start + self.sheet_rows])
+        
+        # 创建摘要表
+        if summary_df is not None:
+            self._write_sheet(workbook, '摘要', summary_df)
+        
+        # 添加图表（基于预先聚合的数据）
+        if chart_data:
+            self._add_charts(workbook, chart_data)
+        
+        workbook.save(output_path)
+        return output_path
+    
+    def _write_bundle(self, output_path: str, df: 'pd.DataFrame', summary_df: 'pd.DataFrame',
+                      chart_data: Optional[List[Tuple[Dict[str, Any], 'pd.DataFrame']]] = None) -> str:
+        """按 workbook_rows 拆分为多个工作簿并行写入，打包为与报表同名的zip文件"""
+        path = Path(output_path)
+        bundle_path = str(path.with_suffix('.zip'))
+        starts = range(0, len(df), self.workbook_rows)
+        logger.info(f"数据超过单个工作簿的行数上限 ({len(df)} 行)，拆分为 {len(starts)} 个工作簿")
+        
+        with tempfile.TemporaryDirectory(dir=str(path.parent)) as tmp_dir:
+            def tasks():
+                for number, start in enumerate(starts, start=1):
+                    part_path = os.path.join(tmp_dir, f"{path.stem}_{number}{path.suffix}")
+                    # 摘要和图表只写入第一个工作簿
+                    yield (self.options, part_path, df.iloc[start:start + self.workbook_rows],
+                           summary_df if number == 1 else None, chart_data if number == 1 else None)
+            
+            with zipfile.ZipFile(bundle_path, 'w', compression=zipfile.ZIP_STORED) as bundle:
+                def add(part_path: str):
+                    # xlsx 文件本身已压缩，直接存储；加入压缩包后立即删除临时文件
+                    bundle.write(part_path, arcname=os.path.basename(part_path))
+                    os.remove(part_path)
+                
+                if self.workers > 1 and len(starts) > 1:
+                    with ProcessPoolExecutor(max_workers=min(self.workers, len(starts))) as executor:
+                        # 最多同时提交 2 × 进程数 个工作簿，传给子进程的数据量有界
+                        pending = []
+                        for task in tasks():
+                            pending.append(executor.submit(_write_excel_workbook, task))
+                            if len(pending) >= 2 * self.workers:
+                                add(pending.pop(0).result())
+                        for future in pending:
+                            add(future.result())
+                else:
+                    for task in tasks():
+                        add(_write_excel_workbook(task))
+        return bundle_path
+    
+    def _register_styles(self, workbook):
+        """注册共享的命名样式"""
+        header = NamedStyle(name=self.HEADER_STYLE)
+        header.font = Font(bold=True, color='FFFFFF')
+        header.fill = PatternFill('solid', fgColor='4F81BD')
+        header.alignment = Alignment(horizontal='center', vertical='center')
+        side = Side(style='thin', color='D9D9D9')
+        header.border = Border(left=side, right=side, top=side, bottom=side)
+        workbook.add_named_style(header)
+    
+    def _write_sheet(self, workbook, title: str, df: 'pd.DataFrame'):
+        """创建工作表并按批次流式写入数据框"""
+        worksheet = workbook.create_sheet(title)
+        # 只写工作表的列宽和冻结窗格需要在写入行之前设置
+        self._auto_adjust_columns(worksheet, df)
+        worksheet.freeze_panes = 'A2'
+        
+        header = []
+        for column in df.columns:
+            cell = WriteOnlyCell(worksheet, value=str(column))
+            cell.style = self.HEADER_STYLE
+            header.append(cell)
+        worksheet.append(header)
+        
+        for start in range(0, len(df), self.BATCH_ROWS):
+            for row in zip(*self._excel_columns(df.iloc[start:start + self.BATCH_ROWS])):
+                worksheet.append(row)
+        return worksheet
+    
+    @staticmethod
+    def _excel_columns(df: 'pd.DataFrame') -> List['np.ndarray']:
+        """将数据块逐列转换为可写入Excel的Python对象数组（空值为None）"""
+        columns = []
+        for _, series in df.items():
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype(series.cat.categories.dtype)
+            if isinstance(series.dtype, pd.DatetimeTZDtype):
+                # Excel不支持时区
+                series = series.dt.tz_localize(None)
+            elif pd.api.types.is_timedelta64_dtype(series.dtype):
+                series = series.astype(str).where(series.notna())
+            values = series.to_numpy(dtype=object)
+            missing = series.isna().to_numpy()
+            if missing.any():
+                values[missing] = None
+            columns.append(values)
+        return columns
+    
     def _create_summary_table(self, df: 'pd.DataFrame', metrics: Dict[str, Any]) -> 'pd.DataFrame':
         """创建摘要表"""
         summary_data = {
@@ -1479,34 +4853,300 @@ class ExcelReportGenerator(ReportGenerator):
         
         return pd.DataFrame(summary_data)
     
-    def _apply_excel_styles(self, worksheet, df: 'pd.DataFrame'):
-        """应用Excel样式"""
-        # 简单的样式应用
-        pass
-    
     def _auto_adjust_columns(self, worksheet, df: 'pd.DataFrame'):
-        """自动调整列宽"""
-        for column_cells in worksheet.columns:
-            length = max(len(str(cell.value)) for cell in column_cells)
-            worksheet.column_dimensions[get_column_letter(column_cells[0].column)].width = min(length + 2, 50)
-    
-    def _add_charts(self, workbook, df: 'pd.DataFrame', charts: List[Dict[str, Any]]):
-        """添加图表"""
-        # 简单的图表添加实现
-        pass
+        """按数据框估计的列宽设置工作表列宽（不读取单元格）"""
+        for index, width in enumerate(self.estimate_column_widths(df), start=1):
+            worksheet.column_dimensions[get_column_letter(index)].width = min(width + 2, self.MAX_COLUMN_WIDTH)
+    
+    @classmethod
+    def display_width(cls, values: 'pd.Series') -> 'pd.Series':
+        """字符串的显示宽度：字符数加上宽字符个数"""
+        values = values.astype(str)
+        return values.str.len() + values.str.count(cls.WIDE_CHAR_PATTERN)
+    
+    def sample_rows(self, df: 'pd.DataFrame') -> 'pd.DataFrame':
+        """抽取开头、末尾和中间随机位置的行用于估计列宽"""
+        head = max(int(self.width_sample.get('head') or 0), 0)
+        tail = max(int(self.width_sample.get('tail') or 0), 0)
+        size = max(int(self.width_sample.get('random') or 0), 0)
+        if len(df) <= head + tail + size:
+            return df
+        middle = len(df) - head - tail
+        rng = np.random.default_rng(self.width_sample.get('seed'))
+        positions = np.concatenate([
+            np.arange(head),
+            head + np.sort(rng.choice(middle, size=size, replace=False)),
+            np.arange(len(df) - tail, len(df)),
+        ])
+        return df.iloc[positions]
+    
+    def estimate_column_widths(self, df: 'pd.DataFrame') -> List[int]:
+        """按表头的精确宽度和抽样行的向量化字符串宽度估计每列宽度"""
+        headers = self.display_width(pd.Series([str(column) for column in df.columns], dtype=object))
+        sample = self.sample_rows(df)
+        widths = []
+        for index, header_width in enumerate(headers.tolist()):
+            width = int(header_width)
+            if pd.api.types.is_datetime64_any_dtype(df.dtypes.iloc[index]):
+                # 日期按默认格式 yyyy-mm-dd h:mm:ss 显示
+                width = max(width, 19)
+            elif len(sample):
+                values = sample.iloc[:, index]
+                values = values[values.notna()]
+                if len(values):
+                    width = max(width, int(self.display_width(values).max()))
+            widths.append(width)
+        return widths
+    
+    @classmethod
+    def chart_spec(cls, chart: Dict[str, Any]) -> Dict[str, Any]:
+        """将图表配置（chart_configs.json 的 data_mapping 或 x_field/y_field 写法）解析为统一的规格
+
+        聚合方式不受支持时抛出 ValueError。
+        """
+        mapping = chart.get('data_mapping') or {}
+        style = chart.get('style') or {}
+        chart_type = chart.get('type', 'bar')
+        x = mapping.get('x_axis') or mapping.get('labels') or chart.get('x_field')
+        y = mapping.get('y_axis') or mapping.get('values') or chart.get('y_field')
+        ys = [y] if isinstance(y, str) else list(y or [])
+        group = mapping.get('group_by') if chart_type in ('bar', 'line') else None
+        if chart_type == 'pie':
+            ys = ys[:1]
+        title = chart.get('title') or (style.get('title') or {}).get('text') or chart.get('name')
+        x_axis = chart.get('x_axis') if isinstance(chart.get('x_axis'), dict) else {}
+        y_axis = chart.get('y_axis') if isinstance(chart.get('y_axis'), dict) else {}
+        aggregate = mapping.get('aggregate') or chart.get('aggregate', 'sum')
+        if aggregate not in cls.CHART_AGGREGATES:
+            raise ValueError(f"不支持的聚合方式: {aggregate}")
+        return {
+            'type': chart_type,
+            'x': x,
+            'y': ys,
+            'group_by': group,
+            'aggregate': aggregate,
+            'resample': None,
+            'title': title or f"{'、'.join(map(str, ys))} - {x}",
+            'x_title': x_axis.get('title', x),
+            'y_title': y_axis.get('title', ys[0] if len(ys) == 1 else None),
+            'colors': style.get('colors') or [],
+            'width': style.get('width'),
+            'height': style.get('height'),
+        }
+    
+    def aggregate_charts(self, df: 'pd.DataFrame',
+                         charts: Optional[List[Dict[str, Any]]]) -> List[Tuple[Dict[str, Any], 'pd.DataFrame']]:
+        """计算各图表的数据表：分组键相同的图表共用一次 groupby，散点图使用抽样的行
+
+        日期X轴的类别过多时按日/周/月/季度/年重采样；其他X轴的折线图保留最后的类别，
+        其余图表保留最前的类别。
+        """
+        specs = []
+        for chart in charts or []:
+            if chart.get('active') is False:
+                continue
+            try:
+                spec = self.chart_spec(chart)
+            except ValueError as e:
+                logger.warning(f"图表 {chart.get('title') or chart.get('name')} 配置无效，已跳过: {e}")
+                continue
+            if spec['type'] not in self.CHART_TYPES:
+                logger.warning(f"Excel报表不支持 {spec['type']} 类型的图表，已跳过: {spec['title']}")
+                continue
+            columns = [spec['x'], *spec['y']] + ([spec['group_by']] if spec['group_by'] else [])
+            missing = [column for column in columns if column not in df.columns]
+            if not spec['x'] or not spec['y'] or missing:
+                logger.warning(f"图表 {spec['title']} 引用的列不存在，已跳过: {missing or columns}")
+                continue
+            if spec['type'] != 'scatter':
+                spec['resample'] = self._chart_resample(df[spec['x']])
+                if spec['resample']:
+                    label = spec['resample'][1]
+                    logger.info(f"图表 {spec['title']} 的日期类别过多，按{label}重采样")
+                    spec['x_title'] = f"{spec['x_title']}（按{label}）"
+            specs.append(spec)
+        
+        start_time = time.perf_counter()
+        plans: Dict[Tuple[Any, ...], set] = {}
+        for spec in specs:
+            if spec['type'] != 'scatter':
+                keys = (spec['x'], spec['resample'], spec['group_by'])
+                plans.setdefault(keys, set()).update((y, spec['aggregate']) for y in spec['y'])
+        aggregated = {}
+        for keys, targets in plans.items():
+            x, resample, group = keys
+            by = [df[x].dt.to_period(resample[0]).dt.start_time if resample else x] + ([group] if group else [])
+            targets = sorted(targets)
+            result = df.groupby(by, observed=True, sort=True).agg(
+                **{f'_{index}': target for index, target in enumerate(targets)}
+            )
+            result.columns = pd.MultiIndex.from_tuples(targets)
+            aggregated[keys] = result
+        
+        chart_data = []
+        for spec in specs:
+            if spec['type'] == 'scatter':
+                table = df[[spec['x'], *spec['y']]].dropna()
+                if len(table) > self.MAX_CHART_POINTS:
+                    table = table.sample(n=self.MAX_CHART_POINTS, random_state=0)
+                table = table.sort_values(spec['x'])
+            else:
+                keys = (spec['x'], spec['resample'], spec['group_by'])
+                table = aggregated[keys][[(y, spec['aggregate']) for y in spec['y']]]
+                table.columns = spec['y']
+                if spec['group_by']:
+                    table = table.unstack(spec['group_by'])
+                    table.columns = [str(group) if len(spec['y']) == 1 else f"{y} - {group}"
+                                     for y, group in table.columns]
+                if len(table) > self.MAX_CHART_POINTS and spec['type'] == 'line':
+                    logger.warning(f"图表 {spec['title']} 的类别过多 ({len(table)})，只显示最后 {self.MAX_CHART_POINTS} 个")
+                    table = table.tail(self.MAX_CHART_POINTS)
+                elif len(table) > self.MAX_CHART_POINTS:
+                    logger.warning(f"图表 {spec['title']} 的类别过多 ({len(table)})，只显示前 {self.MAX_CHART_POINTS} 个")
+                    table = table.head(self.MAX_CHART_POINTS)
+            chart_data.append((spec, table.reset_index(drop=spec['type'] == 'scatter')))
+        if chart_data:
+            logger.info(f"图表数据聚合完成: {len(chart_data)} 个图表，{len(plans)} 次分组，"
+                        f"耗时 {time.perf_counter() - start_time:.2f}s")
+        return chart_data
+    
+    @classmethod
+    def _chart_resample(cls, values: 'pd.Series') -> Optional[Tuple[str, str]]:
+        """日期列的类别数超过 MAX_CHART_POINTS 时，返回使类别数不超过上限的最细重采样粒度"""
+        if not pd.api.types.is_datetime64_any_dtype(values) or values.nunique() <= cls.MAX_CHART_POINTS:
+            return None
+        start, end = values.min(), values.max()
+        for freq, label in cls.CHART_RESAMPLE_FREQS:
+            if len(pd.period_range(start, end, freq=freq)) <= cls.MAX_CHART_POINTS:
+                return freq, label
+        return cls.CHART_RESAMPLE_FREQS[-1]
+    
+    def _add_charts(self, workbook, chart_data: List[Tuple[Dict[str, Any], 'pd.DataFrame']]):
+        """添加图表：聚合数据写入隐藏工作表，图表放在 图表 工作表中并引用聚合数据"""
+        chart_sheet = workbook.create_sheet(self.CHART_SHEET)
+        data_sheet = workbook.create_sheet(self.CHART_DATA_SHEET)
+        data_sheet.sheet_state = 'hidden'
+        
+        # 各图表的数据表在隐藏工作表中纵向排列，之间空一行
+        first_row = 1
+        anchor_row = 1
+        for spec, table in chart_data:
+            data_sheet.append([str(column) for column in table.columns])
+            for row in zip(*self._excel_columns(table)):
+                data_sheet.append(row)
+            data_sheet.append([])
+            
+            chart = self._build_chart(spec, data_sheet, first_row, len(table), len(table.columns))
+            chart_sheet.add_chart(chart, f'A{anchor_row}')
+            first_row += len(table) + 2
+            # 默认行高约 0.5cm
+            anchor_row += int(chart.height / 0.5) + 2
+    
+    @staticmethod
+    def _build_chart(spec: Dict[str, Any], data_sheet, first_row: int, rows: int, columns: int):
+        """创建引用聚合数据区域的原生图表：第一列为类别（X值），其余列为数据系列"""
+        last_row = first_row + rows
+        if spec['type'] == 'scatter':
+            chart = ScatterChart()
+            x_values = Reference(data_sheet, min_col=1, min_row=first_row + 1, max_row=last_row)
+            for column in range(2, columns + 1):
+                values = Reference(data_sheet, min_col=column, min_row=first_row, max_row=last_row)
+                series = Series(values, x_values, title_from_data=True)
+                series.marker.symbol = 'circle'
+                series.graphicalProperties.line.noFill = True
+                chart.series.append(series)
+        else:
+            chart = {'bar': BarChart, 'line': LineChart, 'pie': PieChart}[spec['type']]()
+            chart.add_data(Reference(data_sheet, min_col=2, max_col=columns, min_row=first_row, max_row=last_row),
+                           titles_from_data=True)
+            chart.set_categories(Reference(data_sheet, min_col=1, min_row=first_row + 1, max_row=last_row))
+        
+        chart.title = spec['title']
+        if spec['type'] != 'pie':
+            chart.x_axis.title = spec['x_title']
+            chart.y_axis.title = spec['y_title']
+            # 新版Excel中坐标轴默认隐藏
+            chart.x_axis.delete = False
+            chart.y_axis.delete = False
+            for series, color in zip(chart.series, spec['colors']):
+                color = color.lstrip('#').upper()
+                if spec['type'] == 'bar':
+                    series.graphicalProperties.solidFill = color
+                series.graphicalProperties.line.solidFill = color
+        # 配置中的尺寸为像素，openpyxl 使用厘米
+        if spec['width']:
+            chart.width = spec['width'] / 96 * 2.54
+        if spec['height']:
+            chart.height = spec['height'] / 96 * 2.54
+        return chart
+
+
+def _write_excel_workbook(task: Tuple[Dict[str, Any], str, 'pd.DataFrame', Optional['pd.DataFrame'],
+                                      Optional[List[Tuple[Dict[str, Any], 'pd.DataFrame']]]]) -> str:
+    """写入拆分后的一个Excel工作簿（可在子进程中执行）"""
+    options, output_path, df, summary_df, chart_data = task
+    return ExcelReportGenerator(options)._write_workbook(output_path, df, summary_df, chart_data)
+
+class LazyStory(list):
+    """按需从迭代器取出 flowable 的 story
+
+    reportlab 排版时从列表头部逐个取出 flowable，这里只在列表中保留少量待排版的对象，
+    其余的在排版到时才生成，story 的内存占用与文档长度无关。
+    """
+
+    # 保留的待排版对象数，keepWithNext（如标题）需要查看下一个对象
+    LOOKAHEAD = 2
+    _END = object()
+
+    def __init__(self, flowables: Iterable[Any]):
+        super().__init__()
+        self._source = iter(flowables)
+        self._exhausted = False
+
+    def _fill(self):
+        while not self._exhausted and list.__len__(self) < self.LOOKAHEAD:
+            flowable = next(self._source, self._END)
+            if flowable is self._END:
+                self._exhausted = True
+            else:
+                self.append(flowable)
+
+    def __len__(self) -> int:
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
+
 
 # PDF报表生成器优化
 class PDFReportGenerator(ReportGenerator):
-    """PDF报表生成器（优化版）"""
+    """PDF报表生成器（优化版）
+
+    默认只显示前 preview_rows 行；报表参数 pdf 的 full_data 为 True 时输出全部数据。
+    数据按 chunk_rows 行拆分为多个 LongTable（跨页时重复表头），单元格按列向量化转换为字符串，
+    表格在排版到时才从 LazyStory 中逐块生成，内存占用与总行数无关。
+    """
+    
+    DEFAULT_OPTIONS = {'full_data': False, 'chunk_rows': 1000, 'preview_rows': 100}
+    MAX_COLUMN_WIDTH = 100
+    
+    def __init__(self, options: Optional[Dict[str, Any]] = None):
+        self.options = dict(self.DEFAULT_OPTIONS)
+        self.options.update(options or {})
+        self.stats: Dict[str, Any] = {}
     
     def generate(self, df: 'pd.DataFrame', metrics: Dict[str, Any], output_path: str, charts: Optional[List[Dict[str, Any]]] = None) -> str:
         try:
             logger.info(f"生成PDF报表: {output_path}")
+            start_time = time.perf_counter()
             
-            # 对于大型数据集，只显示前100行
-            if len(df) > 100:
-                logger.info(f"数据集过大 ({len(df)} 行)，PDF中只显示前100行")
-                df_to_display = df.head(100)
+            # 非全量模式下只显示前 preview_rows 行
+            preview_rows = int(self.options['preview_rows'])
+            if not self.options['full_data'] and len(df) > preview_rows:
+                logger.info(f"数据集过大 ({len(df)} 行)，PDF中只显示前{preview_rows}行")
+                df_to_display = df.head(preview_rows)
             else:
                 df_to_display = df
             
@@ -1553,67 +5193,58 @@ class PDFReportGenerator(ReportGenerator):
             data_title = Paragraph("数据内容", styles['Heading2'])
             story.append(data_title)
             
-            # 转换DataFrame为列表
-            data = [df_to_display.columns.tolist()] + df_to_display.values.tolist()
-            
-            # 创建表格
-            data_table = Table(data, colWidths=[100] * len(df_to_display.columns))
-            data_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F81BD')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10)
-            ]))
-            story.append(data_table)
-            
-            # 生成PDF
-            doc.build(story)
+            # 数据表格在排版时逐块生成
+            tables = self._data_tables(df_to_display, doc.width)
+            doc.build(LazyStory(chain(story, tables)))
             
-            logger.info(f"PDF报表生成成功: {output_path}")
+            self.stats = {
+                'rows': len(df_to_display),
+                'tables': -(-len(df_to_display) // int(self.options['chunk_rows'])),
+                'pages': doc.page,
+                'seconds': time.perf_counter() - start_time,
+            }
+            logger.info(f"PDF报表生成成功: {output_path}（{self.stats['rows']} 行，{self.stats['tables']} 个表格，"
+                        f"{self.stats['pages']} 页，耗时 {self.stats['seconds']:.2f}s）")
             return output_path
         except Exception as e:
             logger.error(f"生成PDF报表失败: {e}")
             raise
-
-# Excel报表生成器辅助方法
-    def _create_summary_table(self, df: 'pd.DataFrame', metrics: Dict[str, Any]) -> 'pd.DataFrame':
-        """创建摘要表"""
-        summary_data = {
-            '指标': [],
-            '值': []
-        }
-        
-        # 添加基本统计信息
-        summary_data['指标'].extend(['总记录数', '总列数'])
-        summary_data['值'].extend([metrics['total_records'], metrics['total_columns']])
-        
-        # 添加数值列统计
-        for col, stats in metrics['numeric_stats'].items():
-            for stat_name, value in stats.items():
-                summary_data['指标'].append(f"{col} - {stat_name}")
-                summary_data['值'].append(value)
-        
-        return pd.DataFrame(summary_data)
     
-    def _apply_excel_styles(self, worksheet, df: 'pd.DataFrame'):
-        """应用Excel样式"""
-        # 简单的样式应用
-        pass
+    def _data_tables(self, df: 'pd.DataFrame', available_width: float) -> Iterator['LongTable']:
+        """按 chunk_rows 行逐块生成数据表格，每块的第一行为表头并在跨页时重复"""
+        chunk_rows = int(self.options['chunk_rows'])
+        header = [str(column) for column in df.columns]
+        col_width = min(self.MAX_COLUMN_WIDTH, available_width / max(len(header), 1))
+        # 所有表格共用同一个样式对象
+        style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F81BD')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10)
+        ])
+        for start in range(0, len(df), chunk_rows):
+            rows = self._format_cells(df.iloc[start:start + chunk_rows])
+            table = LongTable([header] + rows, colWidths=[col_width] * len(header), repeatRows=1)
+            table.setStyle(style)
+            yield table
     
-    def _auto_adjust_columns(self, worksheet, df: 'pd.DataFrame'):
-        """自动调整列宽"""
-        for column_cells in worksheet.columns:
-            length = max(len(str(cell.value)) for cell in column_cells)
-            worksheet.column_dimensions[get_column_letter(column_cells[0].column)].width = min(length + 2, 50)
-    
-    def _add_charts(self, workbook, df: 'pd.DataFrame', charts: List[Dict[str, Any]]):
-        """添加图表"""
-        # 简单的图表添加实现
-        pass
+    @staticmethod
+    def _format_cells(df: 'pd.DataFrame') -> List[List[str]]:
+        """按列向量化地将数据块转换为字符串单元格（空值为空字符串）"""
+        columns = []
+        for _, series in df.items():
+            text = series.astype(str)
+            missing = series.isna()
+            if missing.any():
+                text = text.where(~missing, '')
+            columns.append(text.to_numpy(dtype=object))
+        if not columns:
+            return [[] for _ in range(len(df))]
+        return np.column_stack(columns).tolist()
 
 # HTML报表生成器优化
 class HTMLReportGenerator(ReportGenerator):
@@ -1854,9 +5485,219 @@ class HTMLReportGenerator(ReportGenerator):
         return html_start + charts_section + html_end
 
 # 自动化报表引擎优化
+class QueryPlan:
+    """报表的逻辑查询计划
+
+    根据过滤条件、计算和图表配置推导需要从数据源读取的列（投影），并将过滤条件（谓词）下推给数据源：
+        - CSV/Excel: 投影转换为 usecols，过滤在加载后执行
+        - SQL: 原查询包装为子查询，只选择需要的列并生成WHERE子句
+        - API: 通过 fields_param/filter_params 转换为查询参数
+    下推只是减少读取的数据量，加载后仍由pandas执行完整的过滤和计算。
+
+    计算中没有分组/透视时报表输出全部明细列，只有报表参数 output_columns 显式指定输出列时才裁剪；
+    多数据源报表需要按公共列合并，不裁剪列也不下推过滤。报表参数 pushdown 为 False 时禁用。
+    启用业务规则（business_rules）时，规则引用的列加入投影；规则在过滤之前执行并可能修改过滤列，
+    因此不下推过滤条件。
+    """
+
+    AGGREGATE_OPERATIONS = ('groupby', 'pivot')
+    CHART_FIELDS = ('x_field', 'y_field')
+    CHART_MAPPING_FIELDS = ('x_axis', 'y_axis', 'group_by', 'color_by', 'labels', 'values')
+
+    def __init__(self, config: ReportConfig, data_sources: List[DataSourceConfig]):
+        self.config = config
+        self.data_sources = data_sources
+        parameters = config.parameters or {}
+
+        self.disabled_reason = None
+        if not parameters.get('pushdown', True):
+            self.disabled_reason = "报表参数 pushdown 为 False"
+        elif len(data_sources) != 1:
+            self.disabled_reason = "多数据源需要按公共列合并"
+
+        rules = parameters.get('business_rules')
+        self.rules_engine = BusinessRulesEngine.from_file(rules if isinstance(rules, str) else None) if rules else None
+
+        self.required_columns = None
+        self.predicates = {}
+        if self.disabled_reason is None:
+            self.required_columns = self._required_columns()
+            if self.rules_engine is None:
+                self.predicates = dict(config.filters or {})
+
+    @staticmethod
+    def formula_columns(formula: str) -> Optional[List[str]]:
+        """提取公式引用的列名（支持 列名、`列 名` 和 df['列名'] 写法），无法解析时返回None"""
+        placeholders = {}
+
+        def replace(match):
+            name = f"__column_{len(placeholders)}"
+            placeholders[name] = match.group(1)
+            return name
+
+        try:
+            tree = ast.parse(re.sub(r'`([^`]+)`', replace, formula).strip(), mode='eval')
+        except SyntaxError:
+            return None
+
+        # 函数名和被下标访问的对象（如 df['列名'] 中的 df）不是列
+        excluded = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+        excluded |= {id(node.value) for node in ast.walk(tree) if isinstance(node, ast.Subscript)}
+
+        columns = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and id(node) not in excluded and node.id != 'df':
+                columns[placeholders.get(node.id, node.id)] = None
+            elif (isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Constant)
+                  and isinstance(node.slice.value, str)):
+                columns[node.slice.value] = None
+        return list(columns)
+
+    @classmethod
+    def _chart_columns(cls, chart: Dict[str, Any]) -> List[Any]:
+        """图表配置引用的列"""
+        values = [chart.get(key) for key in cls.CHART_FIELDS]
+        mapping = chart.get('data_mapping') or {}
+        values += [mapping.get(key) for key in cls.CHART_MAPPING_FIELDS]
+        return values
+
+    def _required_columns(self) -> Optional[List[str]]:
+        """推导需要从数据源读取的列，需要全部列时返回None"""
+        calculations = self.config.calculations or []
+        output_columns = (self.config.parameters or {}).get('output_columns')
+        aggregate_index = next(
+            (i for i, calc in enumerate(calculations) if calc.get('operation') in self.AGGREGATE_OPERATIONS), None
+        )
+        if aggregate_index is None and not output_columns:
+            return None
+
+        columns = {}
+        created = set()
+
+        def add(values):
+            values = values if isinstance(values, (list, tuple)) else [values]
+            for value in values:
+                if value is not None and value not in created:
+                    columns[value] = None
+
+        # 业务规则在过滤和计算之前执行
+        if self.rules_engine is not None:
+            usage = self.rules_engine.column_usage()
+            if usage is None:
+                logger.info("无法解析业务规则中的公式，读取全部列")
+                return None
+            add(usage[0])
+            created.update(usage[1])
+
+        add(list(self.config.filters or {}))
+        add([predicate.value_column for predicate in FilterCompiler.compile(self.config.filters).predicates])
+        if aggregate_index is None:
+            add(list(output_columns))
+            for chart in self.config.charts or []:
+                for value in self._chart_columns(chart):
+                    add(value)
+
+        # 分组/透视之后的计算只引用聚合结果，不需要源数据列
+        stages = calculations if aggregate_index is None else calculations[:aggregate_index + 1]
+        for calc in stages:
+            operation = calc.get('operation')
+            if calc.get('column') and calc.get('formula'):
+                references = self.formula_columns(calc['formula'])
+                if references is None:
+                    logger.info(f"无法解析公式，读取全部列: {calc['formula']}")
+                    return None
+                add(references)
+                created.add(calc['column'])
+            elif operation == 'groupby':
+                add(calc.get('group_by', []))
+                add(list(calc.get('aggregate', {})))
+            elif operation == 'pivot':
+                for key in ('index', 'columns', 'values'):
+                    add(calc.get(key, []))
+        return list(columns)
+
+    def source_parameters(self, ds_config: DataSourceConfig) -> Dict[str, Any]:
+        """返回加入投影和谓词后的数据源参数（数据源已显式配置时不覆盖）"""
+        parameters = dict(ds_config.parameters or {})
+        if self.disabled_reason is not None:
+            return parameters
+        if self.required_columns is not None and 'projection' not in parameters:
+            required = AutoReportEngine._get_data_source_instance(ds_config.type).REQUIRED_COLUMNS
+            parameters['projection'] = list(dict.fromkeys([*self.required_columns, *required]))
+        if self.predicates and 'predicates' not in parameters:
+            parameters['predicates'] = self.predicates
+        return parameters
+
+    def explain(self) -> str:
+        """生成可读的查询计划说明"""
+        lines = [f"查询计划: {self.config.report_name}"]
+        for position, ds_config in enumerate(self.data_sources, 1):
+            source_type = ds_config.type.lower()
+            path = SQLEngineRegistry._mask_url(ds_config.path) if source_type == 'sql' else ds_config.path
+            lines.append(f"  数据源 {position}: {ds_config.name or source_type}（{source_type}）{path}")
+
+            parameters = self.source_parameters(ds_config)
+            projection = parameters.get('projection')
+            if projection:
+                lines.append(f"    列裁剪: {len(projection)} 列 [{', '.join(map(str, projection))}]")
+            else:
+                lines.append("    列裁剪: 无（读取全部列）")
+
+            predicates = parameters.get('predicates') or {}
+            if not predicates:
+                lines.append("    过滤下推: 无")
+            elif source_type == 'sql':
+                lines.append(f"    过滤下推: WHERE 子句（列: {', '.join(map(str, predicates))}，"
+                             f"无法翻译的条件由pandas处理）")
+            elif source_type == 'api':
+                mapped = [col for col in predicates if col in (parameters.get('filter_params') or {})]
+                lines.append(f"    过滤下推: 查询参数（列: {', '.join(map(str, mapped)) or '无映射'}）")
+            else:
+                lines.append("    过滤下推: 不支持，加载后过滤")
+
+        if self.disabled_reason:
+            lines.append(f"  下推已禁用: {self.disabled_reason}")
+
+        filters = self.config.filters or {}
+        lines.append(f"  过滤: {json.dumps(filters, ensure_ascii=False, default=str) if filters else '无'}")
+        lines.append("  计算阶段:")
+        calculations = self.config.calculations or []
+        if not calculations:
+            lines.append("    无")
+        for position, calc in enumerate(calculations, 1):
+            operation = calc.get('operation')
+            if calc.get('column') and calc.get('formula'):
+                lines.append(f"    {position}. 计算字段 {calc['column']} = {calc['formula']}")
+            elif operation == 'groupby':
+                lines.append(f"    {position}. 分组聚合 按 {calc.get('group_by')} "
+                             f"{json.dumps(calc.get('aggregate', {}), ensure_ascii=False)}")
+            elif operation == 'pivot':
+                lines.append(f"    {position}. 透视 索引 {calc.get('index')} 列 {calc.get('columns')} "
+                             f"值 {calc.get('values')}（{calc.get('aggfunc', 'mean')}）")
+            else:
+                lines.append(f"    {position}. 未识别的计算: {json.dumps(calc, ensure_ascii=False, default=str)}")
+        return '\n'.join(lines)
+
+
+def _load_source_data(data_source_type: str, source_config: ReportConfig) -> 'pd.DataFrame':
+    """加载单个数据源（模块级函数，便于在子进程中执行）
+    
+    数据源参数 optimize_dtypes 为 True（或阈值字典）时，加载后压缩列类型。
+    """
+    df = AutoReportEngine._get_data_source_instance(data_source_type).load_data(source_config)
+    optimize = (source_config.parameters or {}).get('optimize_dtypes')
+    if optimize:
+        df = DataProcessor.optimize_dtypes(df, **(optimize if isinstance(optimize, dict) else {}))
+    return df
+
+
 class AutoReportEngine:
     """自动化报表引擎（优化版）"""
     
+    # 解析文件的数据源在进程池中加载，其余（SQL/API等I/O密集型）在线程池中加载
+    PROCESS_SOURCE_TYPES = ('excel', 'csv')
+    DEFAULT_MAX_CONCURRENT_SOURCES = 4
+    
     def _get_data_source(self) -> DataSource:
         """获取数据源实例"""
         data_source_type = self.config.data_source_type.lower()
@@ -1875,8 +5716,8 @@ class AutoReportEngine:
     def _get_report_generators(self) -> Dict[str, ReportGenerator]:
         """获取报表生成器实例字典"""
         return {
-            'excel': ExcelReportGenerator(),
-            'pdf': PDFReportGenerator(),
+            'excel': ExcelReportGenerator((self.config.parameters or {}).get('excel')),
+            'pdf': PDFReportGenerator((self.config.parameters or {}).get('pdf')),
             'html': HTMLReportGenerator(template_type=self.config.template_type)
         }
     
@@ -1929,12 +5770,14 @@ class AutoReportEngine:
     def __init__(self, config: 'ReportConfig'):
         """初始化报表引擎"""
         self.config = config
+        self.plan = QueryPlan(config, self._get_data_sources_to_process())
         
         # 确保输出目录存在
         self.output_dir = config_manager.get('output_dir', 'reports')
         os.makedirs(self.output_dir, exist_ok=True)
     
-    def _get_data_source_instance(self, data_source_type: str) -> DataSource:
+    @staticmethod
+    def _get_data_source_instance(data_source_type: str) -> DataSource:
         """获取数据源实例"""
         data_source_type = data_source_type.lower()
         
@@ -1949,79 +5792,357 @@ class AutoReportEngine:
         else:
             raise ValueError(f"不支持的数据源类型: {data_source_type}")
     
+    def _get_data_sources_to_process(self) -> List[DataSourceConfig]:
+        """获取需要处理的数据源配置（兼容旧版本的单数据源配置）"""
+        if self.config.data_sources:
+            return list(self.config.data_sources)
+        if self.config.data_source_type and self.config.data_source_path:
+            # 从旧版本字段创建数据源配置
+            return [DataSourceConfig(
+                name="legacy_source",
+                type=self.config.data_source_type,
+                path=self.config.data_source_path,
+                parameters=self.config.parameters or {}
+            )]
+        return []
+    
+    def _build_source_config(self, ds_config: DataSourceConfig) -> ReportConfig:
+        """创建用于加载单个数据源的临时ReportConfig"""
+        return ReportConfig(
+            report_name=self.config.report_name,
+            output_format=self.config.output_format,
+            schedule=self.config.schedule,
+            recipients=self.config.recipients,
+            template_path=self.config.template_path,
+            filters=self.config.filters,
+            calculations=self.config.calculations,
+            charts=self.config.charts,
+            parameters=self.plan.source_parameters(ds_config),  # 使用数据源的参数（含查询计划下推的列和过滤）
+            data_source_type=ds_config.type,  # 兼容旧版
+            data_source_path=ds_config.path  # 兼容旧版
+        )
+    
+    def explain(self) -> str:
+        """返回优化后的查询计划说明"""
+        return self.plan.explain()
+    
+    def _load_data_frames(self, data_sources: List[DataSourceConfig]) -> Dict[str, 'pd.DataFrame']:
+        """并发加载所有数据源，结果按配置顺序返回
+        
+        并发数由报表参数 max_concurrent_sources 限制（分别作用于线程池和进程池），
+        为1时按顺序加载。
+        """
+        parameters = self.config.parameters or {}
+        max_workers = max(1, int(parameters.get('max_concurrent_sources', self.DEFAULT_MAX_CONCURRENT_SOURCES)))
+        source_configs = [self._build_source_config(ds_config) for ds_config in data_sources]
+        start_time = time.perf_counter()
+        
+        if len(data_sources) == 1 or max_workers == 1:
+            frames = []
+            for ds_config, source_config in zip(data_sources, source_configs):
+                logger.info(f"加载数据源: {ds_config.name or ds_config.type}")
+                frames.append(_load_source_data(ds_config.type, source_config))
+        else:
+            process_indices = [i for i, ds_config in enumerate(data_sources)
+                               if ds_config.type.lower() in self.PROCESS_SOURCE_TYPES]
+            thread_indices = [i for i in range(len(data_sources)) if i not in process_indices]
+            futures = {}
+            process_pool = thread_pool = None
+            try:
+                # 先在主线程中提交进程任务，避免在工作线程运行期间fork子进程
+                if process_indices:
+                    process_pool = ProcessPoolExecutor(max_workers=min(max_workers, len(process_indices)))
+                    for i in process_indices:
+                        futures[i] = process_pool.submit(_load_source_data, data_sources[i].type, source_configs[i])
+                if thread_indices:
+                    thread_pool = ThreadPoolExecutor(max_workers=min(max_workers, len(thread_indices)))
+                    for i in thread_indices:
+                        futures[i] = thread_pool.submit(_load_source_data, data_sources[i].type, source_configs[i])
+                logger.info(f"并发加载 {len(data_sources)} 个数据源（进程: {len(process_indices)}，"
+                            f"线程: {len(thread_indices)}）")
+                
+                frames = []
+                for i, ds_config in enumerate(data_sources):
+                    try:
+                        frames.append(futures[i].result())
+                    except BrokenProcessPool as e:
+                        logger.warning(f"子进程加载数据源失败，改为在当前进程中加载: {e}")
+                        frames.append(_load_source_data(ds_config.type, source_configs[i]))
+            finally:
+                for pool in (process_pool, thread_pool):
+                    if pool is not None:
+                        pool.shutdown(wait=True, cancel_futures=True)
+        
+        data_frames = {}
+        for ds_config, df in zip(data_sources, frames):
+            # 验证数据
+            if not self._get_data_source_instance(ds_config.type).validate_data(df):
+                raise ValueError(f"数据源 {ds_config.name or ds_config.type} 验证失败")
+            data_frames[ds_config.name or f"source_{len(data_frames)}"] = df
+        
+        logger.info(f"数据源加载完成，耗时 {time.perf_counter() - start_time:.2f} 秒")
+        return data_frames
+    
+    def _run_streaming(self, ds_config: DataSourceConfig) -> Tuple['pd.DataFrame', Dict[str, Any]]:
+        """以流式方式加载并处理单个数据源"""
+        logger.info(f"流式加载数据源: {ds_config.name or ds_config.type}")
+        data_source = self._get_data_source_instance(ds_config.type)
+        temp_config = self._build_source_config(ds_config)
+        
+        def validated_chunks():
+            for index, chunk in enumerate(data_source.iter_chunks(temp_config)):
+                # 首个数据块用于数据验证
+                if index == 0 and not data_source.validate_data(chunk):
+                    raise ValueError(f"数据源 {ds_config.name or ds_config.type} 验证失败")
+                yield chunk
+        
+        pipeline = StreamingPipeline(self.config.filters, self.config.calculations,
+                                     (self.config.parameters or {}).get('approximate_metrics'))
+        return pipeline.run(validated_chunks())
+    
+    def _get_rules_engine(self) -> Optional[BusinessRulesEngine]:
+        """报表参数 business_rules 为 True（使用默认规则文件）或规则文件路径时创建规则引擎"""
+        rules = (self.config.parameters or {}).get('business_rules')
+        if not rules:
+            return None
+        return BusinessRulesEngine.from_file(rules if isinstance(rules, str) else None)
+    
+    def _run_incremental(self, ds_config: DataSourceConfig) -> Tuple['pd.DataFrame', Dict[str, Any]]:
+        """增量处理单个数据源
+        
+        CSV文件以字节偏移作为高水位线，只解析新追加的行；其他数据源以行数作为高水位线，
+        加载后只对新增的行执行过滤、计算和指标累积。信任高水位线之前先校验文件大小、修改时间
+        及高水位线以下区域的完整摘要。状态保存在 incremental.state_dir（默认 .cache/incremental）。
+        """
+        parameters = self.config.parameters or {}
+        options = parameters.get('incremental')
+        store = IncrementalMetricsStore(options.get('state_dir') if isinstance(options, dict) else None)
+        approximate = parameters.get('approximate_metrics')
+        data_source = self._get_data_source_instance(ds_config.type)
+        temp_config = self._build_source_config(ds_config)
+        
+        report_key = store.make_key(self.config.report_name, ds_config.type, ds_config.path)
+        plan_key = store.make_key(self.config.filters, self.config.calculations, approximate, temp_config.parameters)
+        state = store.load(report_key, plan_key)
+        mark = state['mark'] if state else None
+        pipeline = StreamingPipeline(self.config.filters, self.config.calculations, approximate)
+        
+        def validated(chunks):
+            for index, chunk in enumerate(chunks):
+                # 全量计算时首个数据块用于数据验证
+                if index == 0 and not data_source.validate_data(chunk):
+                    raise ValueError(f"数据源 {ds_config.name or ds_config.type} 验证失败")
+                yield chunk
+        
+        base = None
+        if isinstance(data_source, CSVDataSource) and data_source.supports_append(temp_config):
+            path = ds_config.path
+            # 先记录文件状态再定位完整行，之后追加的数据在下次运行时会使状态不一致而重新校验
+            size, mtime = store.file_stat(path)
+            end = store.complete_size(path)
+            fingerprint = digest = None
+            if mark and mark['kind'] == 'bytes' and mark['offset'] <= end:
+                if (mark['size'], mark['mtime']) == (size, mtime):
+                    # 大小和修改时间均未变化：没有追加数据，无需重新读取
+                    fingerprint = mark['fingerprint']
+                else:
+                    # 高水位线以下的区域完整计算摘要，中间被改写的文件不会被误判为追加
+                    digest = store.file_digest(path, 0, mark['offset'])
+                    if digest.hexdigest() != mark['fingerprint']:
+                        digest = None
+            if fingerprint is not None or digest is not None:
+                base = state
+                pipeline.restore_state(state['pipeline'])
+                logger.info(f"增量处理: 从第 {mark['offset']} 字节开始读取新追加的数据")
+                header = mark['header']
+                chunks = data_source.iter_appended(temp_config, mark['offset'], end, header)
+                if fingerprint is None:
+                    fingerprint = store.file_digest(path, mark['offset'], end, digest).hexdigest()
+            else:
+                if mark:
+                    logger.info("数据源已被改写，全量重新计算")
+                header = data_source.read_header(temp_config)
+                if end == os.path.getsize(path):
+                    chunks = data_source.iter_chunks(temp_config)
+                else:
+                    # 末尾的半行留到下次运行处理
+                    with open(path, 'rb') as f:
+                        header_end = len(f.readline())
+                    chunks = data_source.iter_appended(temp_config, header_end, end, header)
+                chunks = validated(chunks)
+                fingerprint = store.file_fingerprint(path, end)
+            new_mark = {'kind': 'bytes', 'offset': end, 'size': size, 'mtime': mtime,
+                        'fingerprint': fingerprint, 'header': header}
+        else:
+            df = next(iter(self._load_data_frames([ds_config]).values()))
+            if mark and mark['kind'] == 'rows' and mark['rows'] <= len(df) and \
+                    store.frame_fingerprint(df, mark['rows']) == mark['fingerprint']:
+                base = state
+                pipeline.restore_state(state['pipeline'])
+                logger.info(f"增量处理: 跳过已处理的 {mark['rows']} 行")
+                chunks = [df.iloc[mark['rows']:]]
+            else:
+                if mark:
+                    logger.info("数据源已被改写，全量重新计算")
+                chunks = [df]
+            new_mark = {'kind': 'rows', 'rows': len(df), 'fingerprint': store.frame_fingerprint(df, len(df))}
+        
+        rows_before = pipeline.rows_read
+        for chunk in chunks:
+            pipeline.process_chunk(chunk)
+        logger.info(f"增量处理完成: 新处理 {pipeline.rows_read - rows_before} 行，累计 {pipeline.rows_read} 行")
+        
+        store.save(report_key, {
+            'plan_key': plan_key,
+            'mark': new_mark,
+            'pipeline': pipeline.get_state(),
+            'updated_at': datetime.now().isoformat()
+        }, base)
+        return pipeline.finalize()
+    
+    def _should_spill(self, data_sources: List[DataSourceConfig]) -> bool:
+        """两个数据源按键连接且估计内存占用（输入 + 结果）超过 memory_budget 时使用溢写连接"""
+        parameters = self.config.parameters or {}
+        budget = parameters.get('memory_budget')
+        merge_config = parameters.get('merge_config') or {}
+        if not budget or len(data_sources) != 2 or merge_config.get('merge_type', 'merge') != 'merge':
+            return False
+        estimate = 2 * sum(SpillJoiner.estimate_source_bytes(ds_config) for ds_config in data_sources)
+        budget = SpillJoiner.parse_size(budget)
+        if estimate <= budget:
+            return False
+        logger.info(f"估计内存占用 {estimate / 1024 / 1024:.0f}MB 超过预算 {budget / 1024 / 1024:.0f}MB，使用溢写连接")
+        return True
+    
+    def _run_spill_join(self, data_sources: List[DataSourceConfig]) -> Tuple['pd.DataFrame', Dict[str, Any]]:
+        """两个数据源逐块溢写到磁盘分区后按分区连接，连接结果流式进入后续的过滤、计算和指标累积"""
+        parameters = self.config.parameters or {}
+        merge_config = parameters.get('merge_config') or {}
+        planner = JoinPlanner(merge_config.get('how', 'inner'), merge_config.get('on'),
+                              merge_config.get('suffixes', ('_1', '_2')))
+        
+        sides = []
+        for ds_config in data_sources:
+            data_source = self._get_data_source_instance(ds_config.type)
+            chunks = data_source.iter_chunks(self._build_source_config(ds_config))
+            first = next(chunks)
+            if not data_source.validate_data(first):
+                raise ValueError(f"数据源 {ds_config.name or ds_config.type} 验证失败")
+            sides.append((first, chain([first], chunks)))
+        (left_first, left_chunks), (right_first, right_chunks) = sides
+        
+        pipeline = StreamingPipeline(self.config.filters, self.config.calculations,
+                                     parameters.get('approximate_metrics'))
+        keys = planner.choose_keys(left_first, right_first)
+        if not keys:
+            logger.warning("没有找到共同列，无法使用溢写连接，改为在内存中合并")
+            merged = DataProcessor.merge_dataframes(
+                [pd.concat(left_chunks, ignore_index=True), pd.concat(right_chunks, ignore_index=True)], merge_config
+            )
+            return pipeline.run([merged])
+        
+        budget = SpillJoiner.parse_size(parameters['memory_budget'])
+        workers = int(parameters.get('spill_workers', 1) or 1)
+        estimate = 2 * sum(SpillJoiner.estimate_source_bytes(ds_config) for ds_config in data_sources)
+        # 每个分区（两侧 + 结果）约占预算的一部分，并行时按进程数再细分
+        partitions = max(SpillJoiner.DEFAULT_PARTITIONS, int(np.ceil(2 * estimate / budget)) * workers)
+        with SpillJoiner(keys, SpillJoiner.key_kinds(left_first, right_first, keys), planner.how,
+                         planner.suffixes, partitions, parameters.get('spill_dir'), workers) as joiner:
+            joiner.add('left', left_chunks)
+            joiner.add('right', right_chunks)
+            return pipeline.run(joiner.iter_results())
+    
+    def _try_sql_pushdown(self, ds_config: DataSourceConfig) -> Optional['pd.DataFrame']:
+        """首个计算为分组/透视时，尝试将过滤与聚合下推到SQL数据源"""
+        calculations = self.config.calculations or []
+        if ds_config.type.lower() != 'sql' or not calculations:
+            return None
+        if calculations[0].get('operation') not in ('groupby', 'pivot'):
+            return None
+        
+        data_source = self._get_data_source_instance(ds_config.type)
+        df = data_source.load_pushdown(
+            self._build_source_config(ds_config), self.config.filters, calculations[0]
+        )
+        if df is not None and not data_source.validate_data(df):
+            raise ValueError(f"数据源 {ds_config.name or ds_config.type} 验证失败")
+        return df
+    
     def run(self) -> Dict[str, str]:
         """运行报表生成流程（优化版）"""
         try:
             logger.info(f"开始生成报表: {self.config.report_name}")
             
             # 1. 加载数据
-            data_frames = {}  # 存储所有数据源的数据
-            
-            # 兼容旧版本的单数据源配置
-            data_sources_to_process = []
-            if self.config.data_sources:
-                data_sources_to_process = self.config.data_sources
-            elif self.config.data_source_type and self.config.data_source_path:
-                # 从旧版本字段创建数据源配置
-                legacy_source = DataSourceConfig(
-                    name="legacy_source",
-                    type=self.config.data_source_type,
-                    path=self.config.data_source_path,
-                    parameters=self.config.parameters or {}
-                )
-                data_sources_to_process.append(legacy_source)
-            
-            for ds_config in data_sources_to_process:
-                logger.info(f"加载数据源: {ds_config.name or ds_config.type}")
+            data_sources_to_process = self._get_data_sources_to_process()
+            approximate = (self.config.parameters or {}).get('approximate_metrics')
+            # 业务规则包含跨记录的分组条件，需要在完整数据上执行
+            rules_engine = self._get_rules_engine()
+            
+            # 单个SQL数据源的分组/透视计算优先下推到数据库执行
+            pushdown_df = None
+            if len(data_sources_to_process) == 1 and rules_engine is None:
+                pushdown_df = self._try_sql_pushdown(data_sources_to_process[0])
+            
+            # 启用增量模式时，只处理上次运行之后追加的数据
+            incremental_source = None
+            if pushdown_df is None and len(data_sources_to_process) == 1 and rules_engine is None and \
+                    (self.config.parameters or {}).get('incremental'):
+                incremental_source = data_sources_to_process[0]
+            
+            # 单数据源且满足流式条件时，逐块执行过滤、计算和指标累积
+            streaming_source = None
+            if pushdown_df is None and incremental_source is None and rules_engine is None and \
+                    len(data_sources_to_process) == 1:
+                ds_config = data_sources_to_process[0]
                 data_source = self._get_data_source_instance(ds_config.type)
+                if data_source.should_stream(self._build_source_config(ds_config)):
+                    streaming_source = ds_config
+            
+            # 多数据源连接的估计内存占用超过 memory_budget 时，使用溢写到磁盘的分区连接
+            spill_join = pushdown_df is None and rules_engine is None and self._should_spill(data_sources_to_process)
+            
+            if pushdown_df is not None:
+                # 下推的是第一个计算，其余计算阶段在聚合结果上执行
+                df = DataProcessor.apply_calculations(pushdown_df, (self.config.calculations or [])[1:])
+                metrics = DataProcessor.calculate_metrics(df, approximate)
+            elif incremental_source is not None:
+                df, metrics = self._run_incremental(incremental_source)
+            elif streaming_source is not None:
+                df, metrics = self._run_streaming(streaming_source)
+            elif spill_join:
+                df, metrics = self._run_spill_join(data_sources_to_process)
+            else:
+                data_frames = self._load_data_frames(data_sources_to_process)
+                
+                # 合并数据
+                if len(data_frames) == 0:
+                    raise ValueError("没有可用的数据源")
+                elif len(data_frames) == 1:
+                    # 只有一个数据源，直接使用
+                    df = next(iter(data_frames.values()))
+                else:
+                    # 多个数据源，需要合并
+                    logger.info(f"合并 {len(data_frames)} 个数据源")
+                    # 这里使用简单的合并策略，实际应用中可能需要更复杂的逻辑
+                    df = DataProcessor.merge_dataframes(list(data_frames.values()),
+                                                        (self.config.parameters or {}).get('merge_config'))
                 
-                # 创建临时ReportConfig用于加载单个数据源
-                temp_config = ReportConfig(
-                    report_name=self.config.report_name,
-                    output_format=self.config.output_format,
-                    schedule=self.config.schedule,
-                    recipients=self.config.recipients,
-                    template_path=self.config.template_path,
-                    filters=self.config.filters,
-                    calculations=self.config.calculations,
-                    charts=self.config.charts,
-                    parameters=ds_config.parameters,  # 使用数据源的参数
-                    data_source_type=ds_config.type,  # 兼容旧版
-                    data_source_path=ds_config.path  # 兼容旧版
-                )
+                # 3. 处理数据
+                # 执行业务规则
+                if rules_engine is not None:
+                    df = rules_engine.apply(df)
                 
-                # 加载数据
-                df = data_source.load_data(temp_config)
+                # 应用筛选
+                if self.config.filters:
+                    df = DataProcessor.apply_filters(df, self.config.filters)
                 
-                # 验证数据
-                if not data_source.validate_data(df):
-                    raise ValueError(f"数据源 {ds_config.name or ds_config.type} 验证失败")
+                # 应用计算字段
+                if self.config.calculations:
+                    df = DataProcessor.apply_calculations(df, self.config.calculations)
                 
-                data_frames[ds_config.name or f"source_{len(data_frames)}"] = df
-            
-            # 合并数据
-            if len(data_frames) == 0:
-                raise ValueError("没有可用的数据源")
-            elif len(data_frames) == 1:
-                # 只有一个数据源，直接使用
-                df = next(iter(data_frames.values()))
-            else:
-                # 多个数据源，需要合并
-                logger.info(f"合并 {len(data_frames)} 个数据源")
-                # 这里使用简单的合并策略，实际应用中可能需要更复杂的逻辑
-                df = DataProcessor.merge_dataframes(list(data_frames.values()))
-            
-            # 3. 处理数据
-            # 应用筛选
-            if self.config.filters:
-                df = DataProcessor.apply_filters(df, self.config.filters)
-            
-            # 应用计算字段
-            if self.config.calculations:
-                df = DataProcessor.apply_calculations(df, self.config.calculations)
-            
-            # 4. 计算指标
-            metrics = DataProcessor.calculate_metrics(df)
+                # 4. 计算指标
+                metrics = DataProcessor.calculate_metrics(df, approximate)
             
             # 5. 生成报表
             generators = self._get_report_generators()
@@ -2226,6 +6347,7 @@ def main():
     parser.add_argument("--recipients", type=str, nargs="+", help="邮件接收者")
     parser.add_argument("--template", type=str, help="模板文件路径")
     parser.add_argument("--example", action="store_true", help="运行示例用法")
+    parser.add_argument("--explain", action="store_true", help="打印优化后的查询计划，不生成报表")
     
     args = parser.parse_args()
     
@@ -2238,6 +6360,9 @@ def main():
     if args.config:
         # 这里应该实现从配置文件加载ReportConfig的逻辑
         logger.info(f"从配置文件加载: {args.config}")
+        if args.explain:
+            print(AutoReportEngine(get_config_from_dict(load_config_from_file(args.config))).explain())
+            return
         # 示例：
         # config = load_config_from_file(args.config)
         # engine = AutoReportEngine(config)
@@ -2259,6 +6384,9 @@ def main():
         )
         
         engine = AutoReportEngine(config)
+        if args.explain:
+            print(engine.explain())
+            return
         engine.run()
 
 if __name__ == "__main__":
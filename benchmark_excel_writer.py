@@ -0,0 +1,88 @@
+"""
+Excel写入基准测试：比较只写（流式）工作簿与 pd.ExcelWriter(engine='openpyxl') 的耗时和峰值内存
+
+每个用例在独立的子进程中运行，峰值内存为写入过程中进程最大常驻内存的增量。
+
+用法: python benchmark_excel_writer.py --rows 100000 500000 1000000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from auto_report import DataProcessor, ExcelReportGenerator
+
+
+def make_data(rows):
+    rng = np.random.default_rng(42)
+    return pd.DataFrame({
+        '日期': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D'),
+        '订单号': [f'SO{i:08d}' for i in range(rows)],
+        '类别': rng.choice(['电子产品', '服装', '食品', '家居用品', '办公用品'], rows),
+        '地区': rng.choice(['华东', '华南', '华北', '西南'], rows),
+        '数量': rng.integers(1, 100, rows),
+        '金额': np.round(rng.random(rows) * 10000, 2),
+    })
+
+
+def legacy_write(df, metrics, output_path):
+    """原 ExcelReportGenerator.generate 的写入方式（构建完整的单元格对象后保存）"""
+    generator = ExcelReportGenerator()
+    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='数据', index=False)
+        generator._create_summary_table(df, metrics).to_excel(writer, sheet_name='摘要', index=False)
+
+
+def streaming_write(df, metrics, output_path):
+    ExcelReportGenerator().generate(df, metrics, output_path)
+
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 的单位为KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(name, rows, queue):
+    df = make_data(rows)
+    metrics = DataProcessor.calculate_metrics(df)
+    writer = legacy_write if name == 'legacy' else streaming_write
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'report.xlsx')
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        writer(df, metrics, output_path)
+        elapsed = time.perf_counter() - start
+        queue.put((elapsed, peak_rss_mb() - baseline, os.path.getsize(output_path) / 1024 / 1024))
+
+
+def measure(name, rows):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=run_case, args=(name, rows, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Excel写入基准测试")
+    parser.add_argument("--rows", type=int, nargs='+', default=[100000, 500000, 1000000], help="数据行数")
+    parser.add_argument("--skip-legacy", action='store_true', help="只测试流式写入")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        names = ['streaming'] if args.skip_legacy else ['legacy', 'streaming']
+        for name in names:
+            elapsed, peak, size = measure(name, rows)
+            label = '原实现' if name == 'legacy' else '只写工作簿'
+            print(f"{rows:>9,} 行 {label}: 耗时 {elapsed:.1f}s，峰值内存增量 {peak:.0f}MB，文件 {size:.1f}MB", flush=True)
+
+
+if __name__ == "__main__":
+    main()
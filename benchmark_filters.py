@@ -0,0 +1,83 @@
+"""
+过滤性能基准测试：比较编译后的过滤引擎与原实现
+
+用法: python benchmark_filters.py --rows 10000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from auto_report import DataProcessor
+
+
+def legacy_apply_filters(df, filters):
+    """原 DataProcessor.apply_filters 实现（仅支持范围、值列表和单值过滤）"""
+    mask = pd.Series([True] * len(df), index=df.index)
+    for column, condition in filters.items():
+        if column not in df.columns:
+            continue
+        if isinstance(condition, dict):
+            if 'min' in condition and 'max' in condition:
+                mask &= (df[column] >= condition['min']) & (df[column] <= condition['max'])
+            elif 'values' in condition:
+                mask &= df[column].isin(condition['values'])
+        elif isinstance(condition, list):
+            mask &= df[column].isin(condition)
+        else:
+            mask &= (df[column] == condition)
+    return df[mask].copy()
+
+
+def make_data(rows):
+    rng = np.random.default_rng(42)
+    return pd.DataFrame({
+        '金额': rng.random(rows) * 10000,
+        '数量': rng.integers(1, 100, rows),
+        '类别': pd.Categorical.from_codes(rng.integers(0, 5, rows),
+                                         ['电子产品', '服装', '食品', '家居用品', '办公用品']),
+        '地区': rng.choice(['华东', '华南', '华北', '西南'], rows),
+    })
+
+
+def timed(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="过滤性能基准测试")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="数据行数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数（取最短耗时）")
+    args = parser.parse_args()
+
+    print(f"生成 {args.rows:,} 行测试数据...")
+    df = make_data(args.rows)
+
+    # 两种实现都支持的条件，以及只有编译引擎支持的运算符
+    cases = {
+        '范围+值列表+单值': {'金额': {'min': 1000, 'max': 9000}, '类别': ['服装', '食品'], '地区': '华东'},
+        '高选择率条件在后': {'地区': ['华东', '华南', '华北'], '数量': {'min': 1, 'max': 98},
+                         '金额': {'min': 0, 'max': 100}},
+    }
+    for name, filters in cases.items():
+        legacy_time, expected = timed(lambda: legacy_apply_filters(df, filters), args.repeat)
+        compiled_time, actual = timed(lambda: DataProcessor.apply_filters(df, filters), args.repeat)
+        assert expected.index.equals(actual.index)
+        print(f"{name}: 原实现 {legacy_time:.3f}s，编译引擎 {compiled_time:.3f}s，"
+              f"加速 {legacy_time / compiled_time:.1f}x（结果 {len(actual):,} 行）")
+
+    extended = {'金额': {'operator': 'gt', 'value': 5000}, '地区': {'operator': 'matches_regex', 'value': '^华[东南]'},
+                '数量': {'operator': 'not_in_list', 'value': [1, 2, 3]}}
+    compiled_time, actual = timed(lambda: DataProcessor.apply_filters(df, extended), args.repeat)
+    print(f"扩展运算符（gt + 正则 + not_in_list）: 编译引擎 {compiled_time:.3f}s（结果 {len(actual):,} 行）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import sys
+import os
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from auto_report import APIDataSource, ReportConfig, TokenBucket
+
+TOTAL_RECORDS = 95
+
+
+class _PagedHandler(BaseHTTPRequestHandler):
+    """返回分页数据的测试API"""
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+    etag_responses = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, payload, headers=None, status=200):
+        body = json.dumps(payload).encode('utf-8') if status != 304 else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        type(self).connections.add(self.client_address)
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        records = [{'id': i, '金额': i * 10} for i in range(TOTAL_RECORDS)]
+
+        if parts.path == '/page':
+            size = int(query['page_size'])
+            start = (int(query['page']) - 1) * size
+            self._send({'data': records[start:start + size], 'meta': {'total': TOTAL_RECORDS}})
+        elif parts.path == '/offset':
+            start, limit = int(query['offset']), int(query['limit'])
+            self._send({'data': records[start:start + limit]})
+        elif parts.path == '/cursor':
+            start = int(query.get('cursor', 0))
+            next_cursor = start + 20 if start + 20 < TOTAL_RECORDS else None
+            self._send({'data': records[start:start + 20], 'next': next_cursor})
+        elif parts.path == '/link':
+            start = int(query.get('start', 0))
+            headers = {}
+            if start + 30 < TOTAL_RECORDS:
+                headers['Link'] = f'<http://{self.headers["Host"]}/link?start={start + 30}>; rel="next"'
+            self._send(records[start:start + 30], headers)
+        elif parts.path in ('/etag', '/nested'):
+            # 数据版本由查询参数 version 模拟；/nested 的记录包含嵌套字段；响应内容随 Authorization 变化
+            etag = f'"v{query.get("version", "1")}"'
+            status = 304 if self.headers.get('If-None-Match') == etag else 200
+            type(self).etag_responses.append(status)
+            owner = self.headers.get('Authorization', '')
+            if parts.path == '/nested':
+                records = [{'id': i, '明细': {'金额': i}} for i in range(5)]
+            else:
+                records = [{'id': i, '金额': i, '用户': owner} for i in range(5)]
+            self._send(records, {'ETag': etag}, status)
+        else:
+            self._send(records)
+
+
+def _start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _PagedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _api_config(url, **parameters):
+    return ReportConfig(
+        report_name="API测试",
+        output_format=["excel"],
+        data_source_type="api",
+        data_source_path=url,
+        parameters=parameters
+    )
+
+
+def test_paginated_api_loading():
+    """各种分页方式都能完整加载数据，并复用keep-alive连接"""
+    server = _start_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    source = APIDataSource()
+    try:
+        cases = [
+            ('/page', {'type': 'page', 'page_size': 10, 'total_key': 'meta.total', 'concurrency': 3}),
+            ('/offset', {'type': 'offset', 'page_size': 10, 'concurrency': 3}),
+            ('/cursor', {'type': 'cursor', 'cursor_key': 'next'}),
+            ('/link', {'type': 'link'}),
+        ]
+        for path, pagination in cases:
+            response_key = None if path == '/link' else 'data'
+            df = source.load_data(_api_config(base + path, pagination=pagination, response_key=response_key))
+            assert df['id'].tolist() == list(range(TOTAL_RECORDS)), path
+
+        # 所有请求复用keep-alive连接，连接数不超过并发上限
+        assert len(_PagedHandler.connections) <= 3
+
+        limited = source.load_data(_api_config(
+            base + '/page', response_key='data',
+            pagination={'type': 'page', 'page_size': 10, 'max_pages': 2}
+        ))
+        assert len(limited) == 20
+    finally:
+        server.shutdown()
+
+
+def test_conditional_request_cache():
+    """ETag未变化时服务器返回304，复用缓存的数据框；TTL内不发送请求"""
+    server = _start_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    source = APIDataSource()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = os.path.join(tmp_dir, 'cache')
+            first = source.load_data(_api_config(base + '/etag', cache_dir=cache_dir))
+            second = source.load_data(_api_config(base + '/etag', cache_dir=cache_dir))
+            assert _PagedHandler.etag_responses == [200, 304]
+            assert second['金额'].tolist() == first['金额'].tolist()
+
+            # 请求参数不同则缓存键不同
+            source.load_data(_api_config(base + '/etag', cache_dir=cache_dir, params={'version': 2}))
+            assert _PagedHandler.etag_responses[-1] == 200
+
+            # TTL内直接使用缓存
+            source.load_data(_api_config(base + '/etag', cache_dir=cache_dir, cache_ttl=60))
+            assert len(_PagedHandler.etag_responses) == 3
+    finally:
+        server.shutdown()
+
+
+def test_api_cache_isolated_by_credentials_and_columnar_only():
+    """不同请求头/认证的请求不共用缓存条目，凭据不以明文保存；无法按列保存的响应不缓存"""
+    server = _start_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    source = APIDataSource()
+    _PagedHandler.etag_responses = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = os.path.join(tmp_dir, 'cache')
+            first = source.load_data(_api_config(base + '/etag', cache_dir=cache_dir,
+                                                 headers={'Authorization': 'Bearer tenant-a'}))
+            second = source.load_data(_api_config(base + '/etag', cache_dir=cache_dir,
+                                                  headers={'Authorization': 'Bearer tenant-b'}))
+            assert _PagedHandler.etag_responses == [200, 200]
+            assert set(first['用户']) == {'Bearer tenant-a'} and set(second['用户']) == {'Bearer tenant-b'}
+            again = source.load_data(_api_config(base + '/etag', cache_dir=cache_dir,
+                                                 headers={'authorization': 'Bearer tenant-a'}))
+            assert _PagedHandler.etag_responses[-1] == 304 and set(again['用户']) == {'Bearer tenant-a'}
+            source.load_data(_api_config(base + '/etag', cache_dir=cache_dir, auth=('user', 'secret')))
+            assert _PagedHandler.etag_responses[-1] == 200
+
+            for root, _, files in os.walk(cache_dir):
+                for name in files:
+                    if name.endswith('.json'):
+                        with open(os.path.join(root, name), encoding='utf-8') as f:
+                            content = f.read()
+                        assert 'tenant' not in content and 'secret' not in content
+
+            # 嵌套字段无法按列保存：不缓存（也不使用pickle），每次都重新请求
+            for _ in range(2):
+                nested = source.load_data(_api_config(base + '/nested', cache_dir=cache_dir))
+                assert nested['明细'].tolist()[1] == {'金额': 1}
+            assert _PagedHandler.etag_responses[-2:] == [200, 200]
+            assert not any(name.endswith('.pkl') for _, _, files in os.walk(cache_dir) for name in files)
+    finally:
+        server.shutdown()
+
+
+def test_token_bucket_limits_rate():
+    """令牌桶限制请求速率"""
+    import time
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.18
+
+
+if __name__ == "__main__":
+    test_paginated_api_loading()
+    test_conditional_request_cache()
+    test_api_cache_isolated_by_credentials_and_columnar_only()
+    test_token_bucket_limits_rate()
+    print("\n✅ 所有测试通过！")
@@ -0,0 +1,141 @@
+import sys
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from auto_report import AutoReportEngine, BusinessRulesEngine, ReportConfig
+
+
+def _sales_frame():
+    return pd.DataFrame({
+        '销售额': [12000.0, -5.0, 800.0, 20000.0],
+        '销售数量': [3, 1, 0, 5],
+        '销售日期': ['2024-01-01', '2024-01-02', None, '2024-01-03'],
+        '产品类别': ['电子产品', '服装', '食品', '玩具'],
+        '成本价': [100.0, 50.0, 30.0, 0.0],
+        '销售价': [150.0, 40.0, 45.0, 10.0],
+        '销售地区': ['华东', '华南', '待分配', 'huabei'],
+        '客户ID': ['C1', 'C2', 'C1', 'C3'],
+        '累计消费金额': [60000.0, 1000.0, 50000.0, 200000.0],
+        '客户姓名': ['张三', '李四', ' ', '赵六'],
+        '联系电话': ['13800000000', '12345', '13900000000', '15000000000'],
+        '产品名称': ['  手机 ', '衬衫', '面包 ', ' 积木'],
+        '当前库存': [5, 50, 1, 20],
+        '安全库存': [10, 20, 1, 30],
+    })
+
+
+def test_rules_file_executes_vectorized_actions():
+    """按优先级执行 business_rules.json 中的规则"""
+    engine = BusinessRulesEngine.from_file()
+    assert [rule.get('priority') for rule in engine.rules] == sorted(rule.get('priority') for rule in engine.rules)
+
+    df = _sales_frame()
+    result = engine.apply(df)
+
+    # 验证规则标记不满足条件的记录
+    assert result['invalid_sales_data'].tolist() == [False, True, True, True]
+    # 列间比较：销售价 > 成本价 且 成本价 > 0 时计算利润率
+    assert np.isclose(result.loc[0, '利润率'], 100 / 3)
+    assert result['利润率'].isna().tolist() == [False, True, False, True]
+    # 高销售额标签
+    assert result['标签'].tolist()[0] == 'high_value_sale'
+    assert 'high_value_sale' in result['标签'].tolist()[3]
+    # 按客户分组累计消费金额后更新等级（else_actions 作用于其余记录）
+    assert result['客户等级'].tolist() == ['VIP', '普通', 'VIP', 'VIP']
+    # 清洗规则只作用于满足条件的记录
+    assert result['产品名称'].tolist() == ['手机', '衬衫', '面包 ', '积木']
+    assert result['销售地区'].tolist() == ['华东', '华南', '待分配', 'HUABEI']
+    # 输入数据不被修改
+    assert '标签' not in df.columns and df.loc[0, '产品名称'] == '  手机 '
+    assert {stat['id'] for stat in engine.stats} >= {'validate_sales_data', 'customer_segmentation'}
+
+
+def test_shared_conditions_evaluated_once():
+    """多个规则共用的条件只计算一次，动作修改引用列后重新计算"""
+    rules = [
+        {'id': 'a', 'priority': 1, 'conditions': [{'field': '销售额', 'operator': 'greater_than', 'value': 1000}],
+         'actions': [{'type': 'flag_record', 'flag': '大额'}]},
+        {'id': 'b', 'priority': 2, 'conditions': [{'field': '销售额', 'operator': 'greater_than', 'value': 1000}],
+         'actions': [{'type': 'update_field', 'field': '销售额', 'value': 0.0}]},
+        {'id': 'c', 'priority': 3, 'conditions': [{'field': '销售额', 'operator': 'greater_than', 'value': 1000}],
+         'actions': [{'type': 'tag_record', 'tag': '仍为大额'}]},
+    ]
+    engine = BusinessRulesEngine(rules)
+    calls = []
+    evaluate = engine._evaluate_condition
+    engine._evaluate_condition = lambda df, condition: calls.append(condition) or evaluate(df, condition)
+
+    result = engine.apply(_sales_frame())
+    assert len(calls) == 2
+    assert result['大额'].tolist() == [True, False, False, True]
+    assert result['销售额'].tolist() == [0.0, -5.0, 800.0, 0.0]
+    assert result['标签'].tolist() == ['', '', '', '']
+
+
+def test_periodic_aggregation_requires_date_field():
+    """按日聚合的条件按日期列分组，未配置日期列时跳过规则；new_field 只接受白名单公式"""
+    condition = {'field': '销售额', 'operator': 'greater_than', 'value': 12500, 'aggregation': 'daily',
+                 'group_by': '客户ID'}
+    rule = {'id': 'daily', 'priority': 1, 'conditions': [condition],
+            'actions': [{'type': 'flag_record', 'flag': '日高额'}]}
+    df = _sales_frame().assign(销售日期=['2024-01-01', '2024-01-01', '2024-01-02', '2024-01-02'])
+
+    result = BusinessRulesEngine([rule]).apply(df)
+    assert '日高额' not in result.columns
+
+    # C1 的销售额合计为 12800，但每日的销售额均未超过 12500
+    result = BusinessRulesEngine([dict(rule, date_field='销售日期')]).apply(df)
+    assert result['日高额'].tolist() == [False, False, False, True]
+    result = BusinessRulesEngine([rule], settings={'date_field': '销售日期'}).apply(df)
+    assert result['日高额'].tolist() == [False, False, False, True]
+
+    rules = [{'id': 'f', 'priority': 1, 'conditions': [],
+              'actions': [{'type': 'new_field', 'name': '绝对值', 'formula': '销售额.abs()'},
+                          {'type': 'new_field', 'name': '单价', 'formula': '销售额 / 销售数量'}]}]
+    result = BusinessRulesEngine(rules).apply(df)
+    assert '绝对值' not in result.columns and result.loc[0, '单价'] == 4000.0
+
+
+def test_rules_with_groupby_keep_rule_columns_in_projection():
+    """启用业务规则时列裁剪保留规则引用的列，可以按规则生成的列分组"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'sales.csv')
+        df = _sales_frame()
+        df['备注'] = 'x'
+        df.to_csv(path, index=False)
+
+        def run(parameters):
+            engine = AutoReportEngine(ReportConfig(
+                report_name="规则分组测试", output_format=["excel"],
+                data_source_type='csv', data_source_path=path,
+                parameters=dict(parameters, cache=False, business_rules=True),
+                filters={'销售地区': ['华东', 'HUABEI']},
+                calculations=[{'operation': 'groupby', 'group_by': ['标签'], 'aggregate': {'销售额': 'sum'}}],
+            ))
+            engine.output_dir = tmp_dir
+            return engine, pd.read_excel(engine.run()['excel'], sheet_name='数据')
+
+        engine, result = run({})
+        required = engine.plan.required_columns
+        assert {'销售价', '成本价', '客户ID', '累计消费金额', '产品名称', '销售地区'} <= set(required)
+        assert '备注' not in required and '利润率' not in required
+        # 规则会修改过滤列（销售地区转为大写），过滤条件不下推
+        assert engine.plan.predicates == {}
+
+        _, expected = run({'pushdown': False})
+        pd.testing.assert_frame_equal(result, expected)
+        assert result['销售额'].sum() == 32000.0
+
+
+if __name__ == "__main__":
+    test_rules_file_executes_vectorized_actions()
+    test_shared_conditions_evaluated_once()
+    test_periodic_aggregation_requires_date_field()
+    test_rules_with_groupby_keep_rule_columns_in_projection()
+    print("\n✅ 所有测试通过！")
@@ -0,0 +1,356 @@
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import auto_report
+from auto_report import (CalculationPlan, DataProcessor, FilterCompiler, FormulaExpression, HyperLogLog,
+                         JoinPlanner, KLLSketch, MisraGriesSketch, StatisticsKernel, StreamingMetrics)
+
+
+def _sales_frame(rows=2000):
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        '订单号': [f'SO{i:06d}' for i in range(rows)],
+        '类别': rng.choice(['电子产品', '服装', '食品'], rows),
+        '地区': rng.choice(['华东', '华南', None], rows),
+        '日期': rng.choice(['2024-01-01', '2024-02-01', '2024-03-01'], rows),
+        '数量': rng.integers(1, 100, rows),
+        '单价': rng.choice([9.5, 19.25, 100.0], rows),
+        '金额': rng.random(rows) * 1000,
+    })
+
+
+def test_optimize_dtypes_compacts_columns():
+    """低基数字符串转换为分类类型，数值列无损向下转换"""
+    df = _sales_frame()
+    optimized = DataProcessor.optimize_dtypes(df)
+
+    assert isinstance(optimized['类别'].dtype, pd.CategoricalDtype)
+    assert isinstance(optimized['地区'].dtype, pd.CategoricalDtype)
+    assert not isinstance(optimized['订单号'].dtype, pd.CategoricalDtype)
+    # 整数不窄于int32，避免后续计算溢出
+    assert optimized['数量'].dtype == np.int32
+    assert optimized['单价'].dtype == np.float32
+    # 无法用float32精确表示的金额保持float64
+    assert optimized['金额'].dtype == np.float64
+    assert optimized.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum() / 2
+    pd.testing.assert_frame_equal(optimized, df, check_dtype=False, check_categorical=False)
+
+
+def test_processing_works_on_optimized_frame():
+    """过滤、分组、指标计算在压缩后的数据框上结果一致"""
+    df = _sales_frame()
+    optimized = DataProcessor.optimize_dtypes(df)
+    filters = {'类别': ['电子产品', '食品'], '日期': {'min': '2024-01-15', 'max': '2024-03-01'}, '地区': '华东'}
+    calculations = [{'operation': 'groupby', 'group_by': ['类别'], 'aggregate': {'数量': 'sum'}}]
+
+    expected = DataProcessor.apply_calculations(DataProcessor.apply_filters(df, filters), calculations)
+    actual = DataProcessor.apply_calculations(DataProcessor.apply_filters(optimized, filters), calculations)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_categorical=False)
+
+    metrics = DataProcessor.calculate_metrics(optimized)
+    assert metrics['categorical_stats']['类别']['unique_count'] == 3
+    assert metrics['numeric_stats']['数量']['max'] == df['数量'].max()
+
+    # 压缩后的整数列参与计算时不溢出（编译的公式和pandas回退求值）
+    calculations = [{'column': '数量百倍', 'formula': '数量 * 100'},
+                    {'column': '数量亿倍', 'formula': '数量 * 100000000'},
+                    {'column': '绝对值亿倍', 'formula': '数量.abs() * 100000000'}]
+    expected = DataProcessor.apply_calculations(df, calculations)
+    actual = DataProcessor.apply_calculations(optimized, calculations)
+    for calc in calculations:
+        assert actual[calc['column']].tolist() == expected[calc['column']].tolist(), calc
+    assert actual['数量亿倍'].max() == df['数量'].max() * 100000000
+
+
+def test_filter_operators_and_null_semantics():
+    """扩展运算符、列间比较及空值语义"""
+    df = pd.DataFrame({
+        '销售价': [120.0, 80.0, None, 300.0, 50.0],
+        '成本价': [100.0, 90.0, 10.0, 200.0, 60.0],
+        '产品类别': ['电子产品', '服装', None, '  ', '食品'],
+        '订单号': ['SO-001', 'SO-002', 'RT-003', 'SO-004', None],
+    })
+    cases = [
+        ({'销售价': {'operator': 'greater_than', 'value_column': '成本价'}}, [0, 3]),
+        ({'销售价': {'operator': 'gte', 'value': 80}}, [0, 1, 3]),
+        ({'产品类别': {'operator': 'not_empty'}}, [0, 1, 4]),
+        ({'产品类别': {'operator': 'is_empty'}}, [2, 3]),
+        ({'产品类别': {'operator': 'not_in_list', 'value': ['服装']}}, [0, 3, 4]),
+        ({'产品类别': {'operator': 'not_in_list', 'value': ['服装'], 'keep_null': True}}, [0, 2, 3, 4]),
+        ({'订单号': {'operator': 'matches_regex', 'value': r'^SO-\d+$'}}, [0, 1, 3]),
+        ({'订单号': {'operator': 'contains', 'value': 'RT'}}, [2]),
+        ({'成本价': [{'operator': 'gt', 'value': 50}, {'operator': 'lt', 'value': 150}]}, [0, 1, 4]),
+        ({'成本价': {'min': 60, 'max': 100}, '产品类别': ['电子产品', '食品']}, [0, 4]),
+        ({'成本价': {'operator': 'between', 'value': [10, 60]}}, [2, 4]),
+    ]
+    for filters, expected in cases:
+        assert DataProcessor.apply_filters(df, filters).index.tolist() == expected, filters
+
+
+def test_filter_value_matching_column_name_is_literal():
+    """过滤值与列名相同时仍按字面值比较，只有 value_column 才与另一列比较"""
+    df = pd.DataFrame({'地区': ['华东', '华南', '华东'], '华东': ['华南', '华南', '华北'],
+                       '销售额': [5.0, 8.0, 2.0], '目标': [4.0, 9.0, 1.0]})
+    assert DataProcessor.apply_filters(df, {'地区': '华东'}).index.tolist() == [0, 2]
+    assert DataProcessor.apply_filters(df, {'地区': {'operator': 'equals', 'value': '华东'}}).index.tolist() == [0, 2]
+    assert DataProcessor.apply_filters(df, {'地区': {'operator': 'not_equals', 'value': '华东'}}).index.tolist() == [1]
+    assert DataProcessor.apply_filters(
+        df, {'销售额': {'operator': 'greater_than', 'value_column': '目标'}}
+    ).index.tolist() == [0, 2]
+    try:
+        auto_report.FilterCompiler({'地区': {'operator': 'in_list', 'value_column': '华东'}})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("in_list 不支持 value_column")
+
+
+def test_compiled_filter_cache_is_bounded():
+    """每次运行都变化的过滤条件不会使编译缓存无限增长"""
+    df = pd.DataFrame({'金额': np.arange(10, dtype=float)})
+    compiler = auto_report.FilterCompiler
+    first = compiler.compile({'金额': {'operator': 'gt', 'value': 0}})
+    for threshold in range(compiler.CACHE_SIZE * 2):
+        assert len(DataProcessor.apply_filters(df, {'金额': {'operator': 'gte', 'value': threshold}})) == \
+            max(0, 10 - threshold)
+    assert len(compiler._cache) == compiler.CACHE_SIZE
+    assert compiler.compile({'金额': {'operator': 'gt', 'value': 0}}) is not first
+    again = compiler.compile({'金额': {'operator': 'gt', 'value': 0}})
+    assert compiler.compile({'金额': {'operator': 'gt', 'value': 0}}) is again
+
+def test_filter_order_and_short_circuit():
+    """大数据量时按选择率排序，结果与条件顺序无关"""
+    df = _sales_frame(rows=60000)
+    filters = {'类别': ['电子产品', '服装', '食品'], '数量': {'operator': 'gt', 'value': 95},
+               '地区': {'operator': 'not_empty'}}
+    compiler = FilterCompiler.compile(filters)
+    assert FilterCompiler.compile(dict(filters)) is compiler
+    ordered = compiler._order(df, compiler.predicates)
+    assert ordered[0].column == '数量'
+
+    expected = df[df['类别'].isin(['电子产品', '服装', '食品']) & (df['数量'] > 95) & df['地区'].notna()]
+    pd.testing.assert_frame_equal(DataProcessor.apply_filters(df, filters), expected)
+
+
+def test_fused_numexpr_filters_match_numpy_path():
+    """数值条件融合为numexpr表达式时与逐个条件计算的结果一致（含空值）"""
+    df = _sales_frame(rows=5000)
+    df.loc[df.index % 7 == 0, '金额'] = np.nan
+    cases = [
+        {'金额': {'operator': 'ne', 'value': 500.0}, '数量': {'operator': 'gt', 'value': 10}},
+        {'金额': [{'operator': 'gte', 'value': 100}, {'operator': 'ne', 'value': 0}],
+         '单价': {'operator': 'eq', 'value': 9.5}},
+        {'数量': {'operator': 'ne', 'value': 50}, '单价': {'operator': 'lt', 'value': 50}},
+    ]
+    available = auto_report.numexpr_available
+    for filters in cases:
+        results = []
+        for fused in ([False, True] if available else [False]):
+            auto_report.numexpr_available = fused
+            try:
+                results.append(FilterCompiler(filters).mask(df))
+            finally:
+                auto_report.numexpr_available = available
+        assert all((result == results[0]).all() for result in results), filters
+    # 不等于条件排除空值
+    assert not df['金额'][FilterCompiler(cases[0]).mask(df)].isna().any()
+
+
+def test_calculations_follow_dependencies_across_stages():
+    """公式按依赖顺序计算，分组之后继续执行后续计算阶段"""
+    df = _sales_frame(rows=500)
+    calculations = [
+        {'column': '毛利率', 'formula': '毛利 / `金额`'},
+        {'column': '毛利', 'formula': "df['金额'] - 数量 * 单价"},
+        {'column': '高毛利', 'formula': '(毛利率 > 0.5) & (类别 in ["电子产品", "食品"])'},
+        {'operation': 'groupby', 'group_by': ['类别'], 'aggregate': {'毛利': 'sum', '金额': 'sum'}},
+        {'column': '汇总毛利率', 'formula': 'round(毛利 / 金额, 4)'},
+    ]
+    result = DataProcessor.apply_calculations(df, calculations)
+
+    profit = df['金额'] - df['数量'] * df['单价']
+    grouped = df.assign(毛利=profit).groupby('类别').agg({'毛利': 'sum', '金额': 'sum'}).reset_index()
+    assert np.allclose(result['汇总毛利率'], (grouped['毛利'] / grouped['金额']).round(4))
+    assert list(result['类别']) == list(grouped['类别'])
+    # 输入数据框不被修改
+    assert '毛利' not in df.columns
+
+    rows = DataProcessor.apply_calculations(df, calculations[:3])
+    expected = ((profit / df['金额']) > 0.5) & df['类别'].isin(['电子产品', '食品'])
+    assert rows['高毛利'].tolist() == expected.tolist()
+    assert CalculationPlan.compile(calculations[:3]) is CalculationPlan.compile(list(calculations[:3]))
+
+
+def test_redefined_input_column_keeps_sequential_semantics():
+    """输入数据中已有的列被之后的公式重新定义时，之前的公式使用输入的值"""
+    df = pd.DataFrame({'金额': [200.0, 400.0]})
+    result = DataProcessor.apply_calculations(df, [
+        {'column': '双倍', 'formula': '金额 * 2'},
+        {'column': '金额', 'formula': '金额 / 100'},
+        {'column': '三倍', 'formula': '金额 * 3'},
+    ])
+    assert result['双倍'].tolist() == [400.0, 800.0]
+    assert result['金额'].tolist() == [2.0, 4.0]
+    assert result['三倍'].tolist() == [6.0, 12.0]
+
+    # 输入中没有的列仍可引用之后的定义
+    result = DataProcessor.apply_calculations(df, [
+        {'column': '含税', 'formula': '净额 * 1.1'},
+        {'column': '净额', 'formula': '金额 - 100'},
+    ])
+    assert np.allclose(result['含税'], [110.0, 330.0])
+
+
+def test_calculation_plan_caches_are_bounded():
+    """计算计划及其执行顺序的缓存容量有限"""
+    plan_class = auto_report.CalculationPlan
+    df = pd.DataFrame({'金额': [1.0, 2.0]})
+    for factor in range(plan_class.CACHE_SIZE * 2):
+        result = DataProcessor.apply_calculations(df, [{'column': '结果', 'formula': f'金额 * {factor}'}])
+        assert result['结果'].tolist() == [factor, 2.0 * factor]
+    assert len(plan_class._cache) == plan_class.CACHE_SIZE
+
+    columns = [f'c{i}' for i in range(8)]
+    plan = plan_class.compile([{'column': '合计', 'formula': ' + '.join(columns)}])
+    for width in range(1, len(columns) + 1):
+        for start in range(len(columns) - width + 1):
+            plan.execute(pd.DataFrame({name: [1.0] for name in columns[start:start + width]}))
+    assert len(plan._orders) == plan_class.ORDER_CACHE_SIZE
+
+def test_formula_whitelist_and_fallback():
+    """不在白名单内的写法回退到pandas求值，循环依赖被跳过"""
+    df = pd.DataFrame({'金额': [1.0, -2.0, 3.0], '类别': ['a', 'b', 'c']})
+    assert FormulaExpression("abs(金额) * 2").columns == ['金额']
+    try:
+        FormulaExpression("__import__('os').system('ls')")
+        assert False, "应拒绝不支持的函数调用"
+    except ValueError:
+        pass
+
+    result = DataProcessor.apply_calculations(df, [
+        {'column': '大写', 'formula': '类别.str.upper()'},
+        {'column': 'x', 'formula': 'y + 1'},
+        {'column': 'y', 'formula': 'x + 1'},
+    ])
+    assert result['大写'].tolist() == ['A', 'B', 'C']
+    assert 'x' not in result.columns and 'y' not in result.columns
+
+
+def test_metrics_kernel_matches_pandas_on_large_data():
+    """大数据集也输出完整指标，融合内核结果与pandas一致"""
+    df = _sales_frame(rows=150000)
+    df.loc[df.index % 7 == 0, '金额'] = np.nan
+    df['空列'] = np.nan
+    metrics = DataProcessor.calculate_metrics(df)
+
+    for col in ['数量', '单价', '金额']:
+        stats = metrics['numeric_stats'][col]
+        assert np.isclose(stats['mean'], df[col].mean())
+        assert np.isclose(stats['median'], df[col].median())
+        assert np.isclose(stats['std'], df[col].std())
+        assert stats['min'] == df[col].min() and stats['max'] == df[col].max()
+    assert np.isnan(metrics['numeric_stats']['空列']['mean'])
+    assert metrics['categorical_stats']['类别']['top_value'] == df['类别'].mode()[0]
+    assert metrics['missing_values']['金额'] == df['金额'].isna().sum()
+
+    # 按行块并行计算的结果与单块一致，并与流式指标共享同一内核
+    block_rows = StatisticsKernel.BLOCK_ROWS
+    StatisticsKernel.BLOCK_ROWS = 10000
+    try:
+        blocked = StatisticsKernel.compute(df, ['数量', '金额'])
+    finally:
+        StatisticsKernel.BLOCK_ROWS = block_rows
+    assert np.allclose(blocked, StatisticsKernel.compute(df, ['数量', '金额']), equal_nan=True)
+
+    streaming = StreamingMetrics()
+    for start in range(0, len(df), 40000):
+        streaming.update(df.iloc[start:start + 40000])
+    assert np.isclose(streaming.result()['numeric_stats']['金额']['std'], df['金额'].std())
+
+
+def test_sketches_merge_within_error_bounds():
+    """草图分区合并后仍在误差界内，近似指标与精确指标结构一致"""
+    rng = np.random.default_rng(5)
+    values = rng.normal(size=200000)
+    ids = pd.Series([f'U{i}' for i in rng.integers(0, 50000, 200000)])
+
+    quantiles, distinct, frequent = KLLSketch(0.01), HyperLogLog(0.01), MisraGriesSketch(0.01)
+    for start in range(0, 200000, 50000):
+        part = slice(start, start + 50000)
+        quantiles.merge(KLLSketch(0.01).update(values[part]))
+        distinct.merge(HyperLogLog(0.01).update(ids[part]))
+        frequent.merge(MisraGriesSketch(0.01).update(ids[part].value_counts()))
+    assert quantiles.count == 200000
+    assert abs((values < quantiles.quantile(0.5)).mean() - 0.5) < 0.01
+    assert abs(distinct.count() / ids.nunique() - 1) < 0.03
+    assert frequent.top_k(1)[0][1] <= ids.value_counts().max()
+
+    df = _sales_frame(rows=20000)
+    exact = DataProcessor.calculate_metrics(df)
+    approximate = DataProcessor.calculate_metrics(df, {'min_rows': 0, 'topk_error': 0.01})
+    assert approximate['numeric_stats'].keys() == exact['numeric_stats'].keys()
+    assert list(approximate['numeric_stats']['金额']) == ['mean', 'median', 'min', 'max', 'std']
+    assert abs(approximate['numeric_stats']['金额']['median'] - exact['numeric_stats']['金额']['median']) < 20
+    assert approximate['categorical_stats']['类别'] == exact['categorical_stats']['类别']
+    assert abs(approximate['categorical_stats']['订单号']['unique_count'] - 20000) < 600
+    # 未达到最小行数时仍使用精确计算
+    assert DataProcessor.calculate_metrics(df, True)['numeric_stats']['金额']['median'] == df['金额'].median()
+
+
+def test_merge_dataframes_join_planner():
+    """连接计划：确定性的键、类型统一、按代价排序，结果与逐个 pd.merge 一致"""
+    rng = np.random.default_rng(9)
+    orders = pd.DataFrame({'客户ID': rng.integers(0, 500, 20000), '产品ID': rng.integers(0, 50, 20000),
+                           '金额': rng.random(20000)})
+    customers = pd.DataFrame({'客户ID': [str(i) for i in range(0, 1000, 3)], '地区': 'R' + pd.Series(range(334)).astype(str)})
+    products = pd.DataFrame({'产品ID': pd.Categorical(range(0, 50, 2)), '品类': [f'P{i}' for i in range(25)]})
+
+    planner = JoinPlanner()
+    result = planner.execute([orders, customers, products])
+    expected = orders.merge(customers.assign(客户ID=customers['客户ID'].astype(int)), on='客户ID') \
+        .merge(products.assign(产品ID=products['产品ID'].astype(int)), on='产品ID')
+    # 小维表先连接，结果列保持配置顺序
+    assert planner.stats[0]['right_rows'] in (len(customers), len(products))
+    assert list(result.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(
+        result.sort_values(['客户ID', '产品ID', '金额']).reset_index(drop=True),
+        expected.sort_values(['客户ID', '产品ID', '金额']).reset_index(drop=True), check_dtype=False
+    )
+    assert all(stat['strategy'] == 'broadcast' for stat in planner.stats)
+    assert planner.stats[0]['prefiltered'] > 0
+
+    # 左连接保留左表全部行；有重复键时回退到哈希连接
+    left = DataProcessor.merge_dataframes([orders, customers], {'how': 'left'})
+    assert len(left) == len(orders) and left['地区'].isna().sum() == (orders['客户ID'] % 3 != 0).sum()
+    dup = pd.concat([products, products], ignore_index=True)
+    merged = DataProcessor.merge_dataframes([orders.head(100), dup])
+    assert len(merged) == 2 * (orders.head(100)['产品ID'] % 2 == 0).sum()
+
+    # 多个共同列时按左表列顺序选择连接键
+    a = pd.DataFrame({'b': [1, 2], 'a': [1, 2], 'x': [1, 2]})
+    b = pd.DataFrame({'a': [1, 2], 'b': [2, 1], 'y': [3, 4]})
+    assert JoinPlanner().choose_keys(a, b) == ['b']
+
+
+if __name__ == "__main__":
+    test_optimize_dtypes_compacts_columns()
+    test_processing_works_on_optimized_frame()
+    test_filter_operators_and_null_semantics()
+    test_filter_value_matching_column_name_is_literal()
+    test_compiled_filter_cache_is_bounded()
+    test_filter_order_and_short_circuit()
+    test_fused_numexpr_filters_match_numpy_path()
+    test_calculations_follow_dependencies_across_stages()
+    test_redefined_input_column_keeps_sequential_semantics()
+    test_calculation_plan_caches_are_bounded()
+    test_formula_whitelist_and_fallback()
+    test_metrics_kernel_matches_pandas_on_large_data()
+    test_sketches_merge_within_error_bounds()
+    test_merge_dataframes_join_planner()
+    print("\n✅ 所有测试通过！")
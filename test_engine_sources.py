@@ -0,0 +1,78 @@
+import sys
+import os
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from auto_report import AutoReportEngine, DataSourceConfig, ReportConfig
+
+API_DELAY = 0.5
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    """延迟响应的测试API"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(API_DELAY)
+        body = json.dumps([{'类别': 'A', '来源': self.path}]).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def test_sources_loaded_concurrently_in_order():
+    """多个数据源并发加载，结果按配置顺序返回"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, 'sales.csv')
+            xlsx_path = os.path.join(tmp_dir, 'sales.xlsx')
+            pd.DataFrame({'类别': ['A', 'B'], '金额': [1.0, 2.0]}).to_csv(csv_path, index=False)
+            pd.DataFrame({'日期': ['2024-01-01', '2024-01-02'], '金额': [3.0, 4.0], '类别': ['A', 'B']}).to_excel(
+                xlsx_path, index=False)
+
+            data_sources = [
+                DataSourceConfig(type='api', path=base + '/first', name='接口1', parameters={'cache': False}),
+                DataSourceConfig(type='csv', path=csv_path, name='销售', parameters={'cache': False}),
+                DataSourceConfig(type='api', path=base + '/second', name='接口2', parameters={'cache': False}),
+                DataSourceConfig(type='excel', path=xlsx_path, name='成本', parameters={'cache': False}),
+            ]
+            engine = AutoReportEngine(ReportConfig(
+                report_name="并发加载测试", output_format=["excel"], data_sources=data_sources
+            ))
+
+            start = time.perf_counter()
+            data_frames = engine._load_data_frames(data_sources)
+            elapsed = time.perf_counter() - start
+
+            assert list(data_frames) == ['接口1', '销售', '接口2', '成本']
+            assert data_frames['接口2']['来源'].iloc[0] == '/second'
+            assert list(data_frames['成本'].columns) == ['日期', '金额', '类别']
+            # 两个API请求并发执行，耗时接近单个请求
+            assert elapsed < API_DELAY * 2
+
+            engine.config.parameters = {'max_concurrent_sources': 1}
+            sequential = engine._load_data_frames(data_sources)
+            for name, df in data_frames.items():
+                pd.testing.assert_frame_equal(df, sequential[name])
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_sources_loaded_concurrently_in_order()
+    print("\n✅ 所有测试通过！")
@@ -0,0 +1,168 @@
+import sys
+import os
+import json
+import tempfile
+import zipfile
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from auto_report import DataProcessor, ExcelReportGenerator
+
+
+def _report_frame(rows=25000):
+    rng = np.random.default_rng(3)
+    return pd.DataFrame({
+        '日期': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 30, rows), unit='D'),
+        '类别': pd.Categorical(rng.choice(['电子产品', '服装'], rows)),
+        '金额': np.where(np.arange(rows) % 10 == 0, np.nan, np.round(rng.random(rows) * 100, 2)),
+        '备注': np.where(np.arange(rows) % 7 == 0, None, 'ok'),
+    })
+
+
+def test_streaming_excel_writer_round_trip():
+    """只写工作簿按批次写入，内容与数据框一致，表头使用共享的命名样式"""
+    df = _report_frame()
+    generator = ExcelReportGenerator()
+    generator.BATCH_ROWS = 4000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'report.xlsx')
+        generator.generate(df, DataProcessor.calculate_metrics(df), path)
+
+        workbook = openpyxl.load_workbook(path)
+        assert workbook.sheetnames == ['数据', '摘要']
+        assert ExcelReportGenerator.HEADER_STYLE in workbook.named_styles
+        sheet = workbook['数据']
+        assert sheet['A1'].style == ExcelReportGenerator.HEADER_STYLE and sheet['A1'].font.b
+        assert sheet.freeze_panes == 'A2'
+        assert sheet.column_dimensions['A'].width >= len('2024-01-01 00:00:00')
+
+        loaded = pd.read_excel(path, sheet_name='数据')
+        assert len(loaded) == len(df)
+        pd.testing.assert_series_equal(loaded['金额'], df['金额'])
+        assert loaded['日期'].tolist() == df['日期'].tolist()
+        assert loaded['类别'].tolist() == df['类别'].astype(str).tolist()
+        assert loaded['备注'].isna().sum() == df['备注'].isna().sum()
+
+
+def test_column_widths_from_sampled_frame():
+    """列宽由抽样行向量化估计，中文按两个字符宽度计算，表头宽度精确计算"""
+    rows = 50000
+    df = pd.DataFrame({
+        '产品名称': ['手机'] * rows,
+        'code': ['x'] * rows,
+        '金额': np.arange(rows, dtype=float),
+    })
+    df.loc[rows - 1, 'code'] = 'a-very-long-code'
+    df.loc[rows // 2, '产品名称'] = '超长的产品名称'
+
+    generator = ExcelReportGenerator({'width_sample': {'head': 10, 'tail': 10, 'random': 0}})
+    assert len(generator.sample_rows(df)) == 20
+    # 末尾的行被抽样，中间的行未被抽样
+    assert generator.estimate_column_widths(df) == [8, len('a-very-long-code'), len('49999.0')]
+
+    generator = ExcelReportGenerator({'width_sample': {'head': 10, 'tail': 10, 'random': 100}})
+    sample = generator.sample_rows(df)
+    assert len(sample) == 120 and sample.index.is_monotonic_increasing
+    # 抽样行数不少于数据行数时使用全部数据
+    assert ExcelReportGenerator().estimate_column_widths(df.head(100))[0] == 8
+    assert ExcelReportGenerator({'width_sample': {'random': rows}}).estimate_column_widths(df)[0] == 14
+
+
+def test_overflow_spills_to_sheets_and_workbooks():
+    """超过行数上限时拆分为多个工作表或打包的多个工作簿，不丢失数据"""
+    df = _report_frame(rows=3500)
+    metrics = DataProcessor.calculate_metrics(df)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'report.xlsx')
+        assert ExcelReportGenerator({'sheet_rows': 1000}).generate(df, metrics, path) == path
+        sheets = pd.read_excel(path, sheet_name=None)
+        assert list(sheets) == ['数据_1', '数据_2', '数据_3', '数据_4', '摘要']
+        assert [len(sheet) for sheet in sheets.values()][:4] == [1000, 1000, 1000, 500]
+        loaded = pd.concat([sheets[f'数据_{i}'] for i in range(1, 5)], ignore_index=True)
+        pd.testing.assert_series_equal(loaded['金额'], df['金额'])
+
+        ExcelReportGenerator({'sheet_rows': 1000, 'overflow': 'truncate'}).generate(df, metrics, path)
+        assert pd.ExcelFile(path).sheet_names == ['数据', '摘要']
+        assert len(pd.read_excel(path, sheet_name='数据')) == 1000
+
+        for workers in (1, 2):
+            options = {'sheet_rows': 1000, 'workbook_rows': 1500, 'overflow': 'workbooks', 'workers': workers}
+            bundle_path = ExcelReportGenerator(options).generate(df, metrics, path)
+            assert bundle_path == os.path.join(tmp_dir, 'report.zip')
+            with zipfile.ZipFile(bundle_path) as bundle:
+                assert bundle.namelist() == ['report_1.xlsx', 'report_2.xlsx', 'report_3.xlsx']
+                parts = [pd.read_excel(bundle.open(name), sheet_name=None) for name in bundle.namelist()]
+            assert list(parts[0]) == ['数据_1', '数据_2', '摘要'] and list(parts[2]) == ['数据']
+            loaded = pd.concat([sheet for part in parts for name, sheet in part.items() if name != '摘要'],
+                               ignore_index=True)
+            assert loaded['日期'].tolist() == df['日期'].tolist()
+        # 临时工作簿在打包后删除
+        assert sorted(os.listdir(tmp_dir)) == ['report.xlsx', 'report.zip']
+
+
+def test_native_charts_reference_aggregated_sheet():
+    """chart_configs.json 中的图表使用原生图表对象，引用隐藏工作表中的聚合数据"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chart_configs.json'), encoding='utf-8') as f:
+        charts = json.load(f)['chart_configs']
+    charts.append({'type': 'bar', 'title': '类别销售', 'x_field': '产品类别', 'y_field': ['销售额', '利润']})
+    rows = 30000
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({
+        '日期': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 90, rows), unit='D'),
+        '产品类别': rng.choice(['电子产品', '服装', '食品'], rows),
+        '销售地区': rng.choice(['华东', '华南'], rows),
+        '销售额': rng.random(rows) * 1000,
+        '利润': rng.random(rows) * 100,
+        '品牌': rng.choice(['A', 'B', 'C', 'D'], rows),
+        '市场份额': rng.random(rows),
+    })
+    generator = ExcelReportGenerator()
+    chart_data = generator.aggregate_charts(df, charts)
+    # 雷达图不支持；柱状图按类别和地区聚合
+    assert [spec['type'] for spec, _ in chart_data] == ['bar', 'line', 'pie', 'scatter', 'bar']
+    bar = chart_data[0][1]
+    assert list(bar.columns) == ['产品类别', '华东', '华南']
+    expected = df.groupby(['产品类别', '销售地区'])['销售额'].sum().unstack()
+    assert np.allclose(bar.set_index('产品类别').to_numpy(), expected.to_numpy())
+    assert len(chart_data[3][1]) == ExcelReportGenerator.MAX_CHART_POINTS
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'report.xlsx')
+        generator.generate(df, DataProcessor.calculate_metrics(df), path, charts)
+        workbook = openpyxl.load_workbook(path)
+        assert workbook.sheetnames == ['数据', '摘要', '图表', '图表数据']
+        assert workbook['图表数据'].sheet_state == 'hidden'
+        assert workbook['图表数据'].max_row < 2000
+        assert len(workbook['图表']._charts) == 5
+
+
+def test_chart_resamples_long_date_axis_and_skips_invalid_aggregate():
+    """日期X轴超过类别上限时重采样而不截断尾部，聚合方式无效的图表被跳过"""
+    days = pd.date_range('2020-01-01', periods=1500, freq='D')
+    df = pd.DataFrame({'日期': days, '销售额': np.arange(len(days), dtype=float)})
+    charts = [
+        {'type': 'line', 'title': '日销售趋势', 'x_field': '日期', 'y_field': '销售额'},
+        {'type': 'bar', 'title': '无效聚合', 'x_field': '日期', 'y_field': '销售额', 'aggregate': 'total'},
+    ]
+    chart_data = ExcelReportGenerator().aggregate_charts(df, charts)
+    assert len(chart_data) == 1
+    spec, table = chart_data[0]
+    assert spec['resample'] == ('W', '周')
+    weekly = df.groupby(df['日期'].dt.to_period('W').dt.start_time)['销售额'].sum()
+    assert len(table) == len(weekly) and spec['x_title'] == '日期（按周）'
+    assert table['日期'].iloc[-1] == weekly.index[-1]
+    assert table['销售额'].sum() == df['销售额'].sum()
+
+
+if __name__ == "__main__":
+    test_streaming_excel_writer_round_trip()
+    test_column_widths_from_sampled_frame()
+    test_overflow_spills_to_sheets_and_workbooks()
+    test_native_charts_reference_aggregated_sheet()
+    test_chart_resamples_long_date_axis_and_skips_invalid_aggregate()
+    print("\n✅ 所有测试通过！")
@@ -0,0 +1,131 @@
+import sys
+import os
+import tempfile
+from unittest import mock
+
+import pandas as pd
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import auto_report
+from auto_report import ExcelDataSource, ReportConfig, iter_xlsx_batches
+
+
+def _write_workbook(path, sheet_count=4, rows=20):
+    """生成包含多个工作表的测试工作簿"""
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for i in range(sheet_count):
+            pd.DataFrame({
+                '日期': pd.date_range('2024-01-01', periods=rows).strftime('%Y-%m-%d'),
+                '金额': [float(i * 100 + j) for j in range(rows)],
+                '类别': ['A', 'B'] * (rows // 2),
+            }).to_excel(writer, sheet_name=f'月份{i + 1}', index=False)
+
+
+def _config(path, **parameters):
+    return ReportConfig(
+        report_name="工作表测试",
+        output_format=["excel"],
+        data_source_path=path,
+        parameters={'cache': False, **parameters}
+    )
+
+
+def test_only_first_sheet_is_parsed_by_default():
+    """未指定工作表时只解析第一个工作表"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'monthly.xlsx')
+        _write_workbook(path)
+
+        with mock.patch.object(auto_report, '_read_excel_sheet', wraps=auto_report._read_excel_sheet) as reader:
+            df = ExcelDataSource().load_data(_config(path))
+
+        assert reader.call_count == 1
+        assert len(df) == 20
+        assert df['金额'].iloc[0] == 0.0
+
+
+def test_selected_sheets_concat_and_union():
+    """按列表选择工作表并合并"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'monthly.xlsx')
+        _write_workbook(path)
+
+        df = ExcelDataSource().load_data(_config(
+            path, sheets=['月份2', '月份4'], sheet_column='工作表'
+        ))
+        assert len(df) == 40
+        assert sorted(df['工作表'].unique()) == ['月份2', '月份4']
+
+        union = ExcelDataSource().load_data(_config(
+            path, sheets=['月份1', '月份1'], sheet_combine='union'
+        ))
+        assert len(union) == 20
+
+        # 不同工作表中的重复行按数据列去重，来源工作表为第一次出现的工作表
+        overlap_path = os.path.join(tmp_dir, 'overlap.xlsx')
+        with pd.ExcelWriter(overlap_path, engine='openpyxl') as writer:
+            pd.DataFrame({'金额': [1.0, 2.0, 3.0]}).to_excel(writer, sheet_name='一月', index=False)
+            pd.DataFrame({'金额': [3.0, 4.0]}).to_excel(writer, sheet_name='二月', index=False)
+        union = ExcelDataSource().load_data(_config(
+            overlap_path, sheets='all', sheet_combine='union', sheet_column='工作表'
+        ))
+        assert union['金额'].tolist() == [1.0, 2.0, 3.0, 4.0]
+        assert union['工作表'].tolist() == ['一月', '一月', '一月', '二月']
+
+
+def test_all_sheets_parsed_in_process_pool():
+    """并行解析全部工作表，结果顺序与工作表顺序一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'monthly.xlsx')
+        _write_workbook(path)
+
+        parallel = ExcelDataSource().load_data(_config(path, sheets='all', sheet_workers=2))
+        sequential = ExcelDataSource().load_data(_config(path, sheets='all'))
+
+        assert len(parallel) == 80
+        pd.testing.assert_frame_equal(parallel, sequential)
+
+
+def test_streaming_xlsx_reader_matches_read_excel():
+    """流式读取器分批产出的数据与 pd.read_excel 一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'large.xlsx')
+        _write_workbook(path, sheet_count=2, rows=1000)
+
+        batches = list(iter_xlsx_batches(path, '月份2', batch_size=300))
+        assert [len(batch) for batch in batches] == [300, 300, 300, 100]
+        assert batches[-1].index[0] == 900
+
+        streamed = pd.concat(batches)
+        expected = pd.read_excel(path, sheet_name='月份2')
+        pd.testing.assert_frame_equal(streamed, expected, check_dtype=False)
+
+
+def test_chunksize_and_iter_chunks_use_streaming_reader():
+    """chunksize 参数与 iter_chunks 使用流式读取器，索引跨工作表连续"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'large.xlsx')
+        _write_workbook(path, sheet_count=3, rows=100)
+
+        df = ExcelDataSource().load_data(_config(path, chunksize=40))
+        assert len(df) == 100
+
+        source = ExcelDataSource()
+        config = _config(path, sheets='all', chunksize=40, streaming=True, sheet_column='工作表')
+        assert source.should_stream(config)
+        chunks = list(source.iter_chunks(config))
+        combined = pd.concat(chunks)
+        assert len(combined) == 300
+        assert combined.index.is_unique
+        assert list(combined['工作表'].unique()) == ['月份1', '月份2', '月份3']
+
+
+if __name__ == "__main__":
+    test_only_first_sheet_is_parsed_by_default()
+    test_selected_sheets_concat_and_union()
+    test_all_sheets_parsed_in_process_pool()
+    test_streaming_xlsx_reader_matches_read_excel()
+    test_chunksize_and_iter_chunks_use_streaming_reader()
+    print("\n✅ 所有测试通过！")
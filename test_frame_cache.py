@@ -0,0 +1,121 @@
+import sys
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from auto_report import CSVDataSource, ExcelDataSource, FrameCache, ReportConfig
+
+
+def _sample_frame(rows=200):
+    return pd.DataFrame({
+        '日期': pd.date_range('2024-01-01', periods=rows, freq='D'),
+        '金额': np.arange(rows, dtype=float),
+        '数量': np.arange(rows, dtype=np.int64),
+        '类别': ['A', 'B', None, 'C'] * (rows // 4),
+        '有效': [True, False] * (rows // 2),
+    })
+
+
+def test_frame_cache_round_trip():
+    """缓存写入后读取的数据应与原数据一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = FrameCache(os.path.join(tmp_dir, 'cache'))
+        df = _sample_frame()
+        assert cache.put('key', df)
+
+        cached = cache.get('key')
+        pd.testing.assert_frame_equal(cached, df, check_dtype=False)
+        assert cached['金额'].dtype == df['金额'].dtype
+        assert cached['日期'].dtype == df['日期'].dtype
+        assert cache.get_stats() == {'hits': 1, 'misses': 0}
+
+
+def test_frame_cache_lru_eviction():
+    """超过容量上限时淘汰最久未使用的条目"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        df = pd.DataFrame({'值': np.arange(10000, dtype=float)})
+        cache = FrameCache(os.path.join(tmp_dir, 'cache'), max_bytes=200 * 1024)
+        cache.put('first', df)
+        time.sleep(0.01)
+        cache.put('second', df)
+        time.sleep(0.01)
+        cache.get('first')
+        time.sleep(0.01)
+        cache.put('third', df)
+
+        assert cache.get('second') is None
+        assert cache.get('first') is not None
+        assert cache.get('third') is not None
+
+
+def test_frame_cache_stores_strings_as_utf8_buffer():
+    """字符串列按实际字节长度保存，缓存目录不可用时写入失败而不抛出异常"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = FrameCache(os.path.join(tmp_dir, 'cache'))
+        rows = 5000
+        df = pd.DataFrame({
+            '备注': ['短'] * (rows - 1) + ['很长的备注' * 2000],
+            '客户': [f'客户{i}' if i % 7 else None for i in range(rows)],
+            '代码': ['ab', 'é', '', '中文🙂'] * (rows // 4),
+        })
+        assert cache.put('key', df)
+        cached = cache.get('key')
+        pd.testing.assert_frame_equal(cached, df, check_dtype=False)
+        assert cached['客户'].isna().sum() == df['客户'].isna().sum()
+        # 定长Unicode数组需要 rows * 最大长度 * 4 字节，UTF-8缓冲区只与文本总长度相关
+        text_bytes = sum(len(value.encode('utf-8')) for value in df['备注'])
+        entry_dir = os.path.join(cache.cache_dir, 'key')
+        assert os.path.getsize(os.path.join(entry_dir, 'col_0000.npy')) < text_bytes + 1024
+
+        blocker = os.path.join(tmp_dir, 'blocker')
+        with open(blocker, 'w') as f:
+            f.write('')
+        cache.cache_dir = blocker
+        assert cache.put('other', df) is False
+
+
+def test_sources_skip_parsing_on_unchanged_file():
+    """文件未变化时第二次加载命中缓存，文件修改后重新解析"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_dir = os.path.join(tmp_dir, 'cache')
+        csv_path = os.path.join(tmp_dir, 'data.csv')
+        xlsx_path = os.path.join(tmp_dir, 'data.xlsx')
+        df = _sample_frame(40)
+        df.to_csv(csv_path, index=False)
+        df.to_excel(xlsx_path, index=False)
+
+        for source, path in ((CSVDataSource(), csv_path), (ExcelDataSource(), xlsx_path)):
+            config = ReportConfig(
+                report_name="缓存测试",
+                output_format=["excel"],
+                data_source_path=path,
+                parameters={'cache_dir': cache_dir}
+            )
+            first = source.load_data(config)
+            cache = source._get_frame_cache(config)
+            hits = cache.hits
+            second = source.load_data(config)
+            assert cache.hits == hits + 1
+            pd.testing.assert_frame_equal(first, second, check_dtype=False)
+
+        # 修改文件后缓存键变化
+        df.head(10).to_csv(csv_path, index=False)
+        os.utime(csv_path, (time.time() + 5, time.time() + 5))
+        assert len(CSVDataSource().load_data(ReportConfig(
+            report_name="缓存测试", output_format=["excel"], data_source_path=csv_path,
+            parameters={'cache_dir': cache_dir}
+        ))) == 10
+
+
+if __name__ == "__main__":
+    test_frame_cache_round_trip()
+    test_frame_cache_lru_eviction()
+    test_frame_cache_stores_strings_as_utf8_buffer()
+    test_sources_skip_parsing_on_unchanged_file()
+    print("\n✅ 所有测试通过！")
@@ -0,0 +1,134 @@
+import sys
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from auto_report import AutoReportEngine, CSVDataSource, DataProcessor, ReportConfig
+
+
+def _history(start, rows):
+    rng = np.random.default_rng(start)
+    return pd.DataFrame({
+        '订单号': [f'SO{i:07d}' for i in range(start, start + rows)],
+        '地区': rng.choice(['华东', '华南', '华北'], rows),
+        '金额': rng.integers(1, 1000, rows).astype(float),
+    })
+
+
+def _engine(path, state_dir, calculations=None):
+    return AutoReportEngine(ReportConfig(
+        report_name="增量测试",
+        output_format=["excel"],
+        data_source_type='csv',
+        data_source_path=path,
+        parameters={'cache': False, 'incremental': {'state_dir': state_dir}},
+        filters={'地区': ['华东', '华南']},
+        calculations=calculations or [],
+    ))
+
+
+def test_incremental_run_processes_only_appended_rows():
+    """追加数据后只处理新增的行，结果与全量计算一致"""
+    calculations = [{'operation': 'groupby', 'group_by': ['地区'], 'aggregate': {'金额': ['sum', 'mean']}}]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'history.csv')
+        state_dir = os.path.join(tmp_dir, 'state')
+        _history(0, 3000).to_csv(path, index=False)
+        engine = _engine(path, state_dir, calculations)
+        engine._run_incremental(engine._get_data_sources_to_process()[0])
+
+        # 追加数据（末尾包含一行未写完的数据）
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(_history(3000, 500).to_csv(index=False, header=False))
+            f.write('SO9999999,华东,')
+        full_read = CSVDataSource.iter_chunks
+        CSVDataSource.iter_chunks = None
+        try:
+            df, metrics = engine._run_incremental(engine._get_data_sources_to_process()[0])
+        finally:
+            CSVDataSource.iter_chunks = full_read
+
+        history = pd.concat([_history(0, 3000), _history(3000, 500)], ignore_index=True)
+        expected = DataProcessor.apply_calculations(
+            DataProcessor.apply_filters(history, engine.config.filters), calculations
+        )
+        pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+        assert metrics['total_records'] == len(expected)
+
+        # 写完最后一行后，下次运行只读取这一行
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('10.0\n')
+        df, _ = engine._run_incremental(engine._get_data_sources_to_process()[0])
+        assert df.loc[df['地区'] == '华东', ('金额', 'sum')].iloc[0] == \
+            expected.loc[expected['地区'] == '华东', ('金额', 'sum')].iloc[0] + 10.0
+
+
+def test_incremental_state_invalidated_by_rewrite_and_config_change():
+    """数据源被改写或报表配置变化时全量重新计算"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'history.csv')
+        state_dir = os.path.join(tmp_dir, 'state')
+        _history(0, 1000).to_csv(path, index=False)
+        engine = _engine(path, state_dir)
+        engine._run_incremental(engine._get_data_sources_to_process()[0])
+
+        rewritten = _history(5000, 1200)
+        rewritten.to_csv(path, index=False)
+        df, metrics = engine._run_incremental(engine._get_data_sources_to_process()[0])
+        expected = DataProcessor.apply_filters(rewritten, engine.config.filters)
+        assert df['订单号'].tolist() == expected['订单号'].tolist()
+        assert metrics['numeric_stats']['金额']['max'] == expected['金额'].max()
+
+        engine.config.filters = {'地区': '华北'}
+        df, _ = engine._run_incremental(engine._get_data_sources_to_process()[0])
+        assert set(df['地区']) == {'华北'}
+        assert len(df) == (rewritten['地区'] == '华北').sum()
+
+
+def test_incremental_state_appends_rows_and_detects_mid_file_rewrite():
+    """存活行按运行追加保存；高水位线以下中间区域被改写时全量重新计算"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'history.csv')
+        state_dir = os.path.join(tmp_dir, 'state')
+        history = _history(0, 20000)
+        history.to_csv(path, index=False)
+        engine = _engine(path, state_dir)
+        engine._run_incremental(engine._get_data_sources_to_process()[0])
+        first_segments = {name for name in os.listdir(state_dir) if name.endswith('.rows.pkl')}
+        assert len(first_segments) == 1
+
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(_history(20000, 100).to_csv(index=False, header=False))
+        engine._run_incremental(engine._get_data_sources_to_process()[0])
+        segments = {name for name in os.listdir(state_dir) if name.endswith('.rows.pkl')}
+        assert first_segments < segments and len(segments) == 2
+        appended = pd.read_pickle(os.path.join(state_dir, (segments - first_segments).pop()))
+        assert len(appended) == _history(20000, 100)['地区'].isin(['华东', '华南']).sum()
+
+        # 改写文件中间一行的地区（字节长度不变），并继续追加
+        with open(path, 'rb') as f:
+            content = f.read()
+        region = history.loc[10000, '地区']
+        target = f'SO0010000,{region}'.encode('utf-8')
+        assert target in content
+        content = content.replace(target, f"SO0010000,{'华北' if region != '华北' else '华东'}".encode('utf-8'))
+        with open(path, 'wb') as f:
+            f.write(content)
+            f.write(_history(30000, 10).to_csv(index=False, header=False).encode('utf-8'))
+        df, metrics = engine._run_incremental(engine._get_data_sources_to_process()[0])
+        expected = DataProcessor.apply_filters(pd.read_csv(path), engine.config.filters)
+        assert df['订单号'].tolist() == expected['订单号'].tolist()
+        assert metrics['total_records'] == len(expected)
+        assert len([name for name in os.listdir(state_dir) if name.endswith('.rows.pkl')]) == 1
+
+
+if __name__ == "__main__":
+    test_incremental_run_processes_only_appended_rows()
+    test_incremental_state_invalidated_by_rewrite_and_config_change()
+    test_incremental_state_appends_rows_and_detects_mid_file_rewrite()
+    print("\n✅ 所有测试通过！")
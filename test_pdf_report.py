@@ -0,0 +1,69 @@
+import sys
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from auto_report import DataProcessor, LazyStory, PDFReportGenerator
+
+
+def _ledger(rows):
+    rng = np.random.default_rng(9)
+    return pd.DataFrame({
+        '凭证号': [f'V{i:06d}' for i in range(rows)],
+        '日期': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D'),
+        '金额': np.where(np.arange(rows) % 5 == 0, np.nan, np.round(rng.random(rows) * 1000, 2)),
+    })
+
+
+def test_full_data_pdf_paginates_in_chunks():
+    """全量模式按块输出全部数据，默认模式只输出预览行"""
+    df = _ledger(2500)
+    metrics = DataProcessor.calculate_metrics(df)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'ledger.pdf')
+        generator = PDFReportGenerator({'full_data': True, 'chunk_rows': 1000})
+        assert generator.generate(df, metrics, path) == path
+        assert generator.stats['rows'] == 2500 and generator.stats['tables'] == 3
+        assert generator.stats['pages'] > 50
+        with open(path, 'rb') as f:
+            assert f.read(5) == b'%PDF-'
+
+        preview = PDFReportGenerator()
+        preview.generate(df, metrics, path)
+        assert preview.stats['rows'] == 100 and preview.stats['pages'] < generator.stats['pages']
+
+    tables = list(PDFReportGenerator({'chunk_rows': 1000})._data_tables(df, 500))
+    assert [len(table._cellvalues) for table in tables] == [1001, 1001, 501]
+    assert all(table.repeatRows == 1 for table in tables)
+    cells = PDFReportGenerator._format_cells(df.head(5))
+    assert cells[0][0] == 'V000000' and cells[0][2] == '' and cells[1][2] == str(df.loc[1, '金额'])
+
+
+def test_lazy_story_generates_flowables_on_demand():
+    """LazyStory 只保留少量待排版的对象"""
+    produced = []
+
+    def flowables():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    story = LazyStory(flowables())
+    assert story[0] == 0 and len(produced) == LazyStory.LOOKAHEAD
+    consumed = []
+    while len(story):
+        consumed.append(story[0])
+        del story[0]
+        assert len(produced) - len(consumed) <= LazyStory.LOOKAHEAD
+    assert consumed == list(range(10))
+
+
+if __name__ == "__main__":
+    test_full_data_pdf_paginates_in_chunks()
+    test_lazy_story_generates_flowables_on_demand()
+    print("\n✅ 所有测试通过！")
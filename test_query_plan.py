@@ -0,0 +1,107 @@
+import sys
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from auto_report import AutoReportEngine, DataProcessor, QueryPlan, ReportConfig
+
+
+def _wide_frame(rows=500, extra_columns=200):
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        '地区': rng.choice(['华东', '华南', '华北'], rows),
+        '销售额': rng.integers(100, 1000, rows).astype(float),
+        '成本': rng.integers(10, 100, rows).astype(float),
+    })
+    extra = pd.DataFrame(rng.random((rows, extra_columns)), columns=[f'指标{i}' for i in range(extra_columns)])
+    return pd.concat([df, extra], axis=1)
+
+
+def _report(source_type, path, **overrides):
+    settings = dict(
+        report_name="查询计划测试",
+        output_format=["excel"],
+        data_source_type=source_type,
+        data_source_path=path,
+        parameters={'cache': False},
+        filters={'地区': ['华东', '华南']},
+        calculations=[
+            {'column': '毛利', 'formula': '销售额 - `成本`'},
+            {'operation': 'groupby', 'group_by': ['地区'], 'aggregate': {'毛利': 'sum', '销售额': 'mean'}},
+            {'column': '占比', 'formula': "df['毛利'] / 100"},
+        ],
+    )
+    settings.update(overrides)
+    return ReportConfig(**settings)
+
+
+def test_formula_columns():
+    """从公式中提取引用的列"""
+    assert QueryPlan.formula_columns("(df['销售金额'] - df['成本']) / df['销售金额']") == ['销售金额', '成本']
+    assert QueryPlan.formula_columns("`单 价` * 数量 + abs(折扣)") == ['单 价', '数量', '折扣']
+    assert QueryPlan.formula_columns("销售额 -") is None
+
+
+def test_csv_projection_loads_only_used_columns():
+    """宽表只读取计划所需的列，结果与全量读取一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'wide.csv')
+        full = _wide_frame()
+        full.to_csv(path, index=False)
+
+        engine = AutoReportEngine(_report('csv', path))
+        assert engine.plan.required_columns == ['地区', '销售额', '成本']
+        data_frames = engine._load_data_frames(engine._get_data_sources_to_process())
+        loaded = next(iter(data_frames.values()))
+        assert list(loaded.columns) == ['地区', '销售额', '成本']
+        assert loaded.memory_usage(deep=True).sum() < full.memory_usage(deep=True).sum() / 10
+
+        config = engine.config
+        expected = DataProcessor.apply_calculations(
+            DataProcessor.apply_filters(full, config.filters), config.calculations
+        )
+        actual = DataProcessor.apply_calculations(
+            DataProcessor.apply_filters(loaded, config.filters), config.calculations
+        )
+        pd.testing.assert_frame_equal(actual, expected)
+
+        # 行级明细输出需要全部列
+        detail = AutoReportEngine(_report('csv', path, calculations=[{'column': '毛利', 'formula': '销售额 - 成本'}]))
+        assert detail.plan.required_columns is None
+        assert '列裁剪: 无' in detail.explain()
+
+
+def test_sql_projection_and_predicate_pushdown():
+    """SQL数据源只选择需要的列，并在数据库端过滤"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'wide.db')
+        full = _wide_frame(rows=300, extra_columns=20)
+        with sqlite3.connect(db_path) as conn:
+            full.to_sql('sales', conn, index=False)
+
+        engine = AutoReportEngine(_report(
+            'sql', f"sqlite:///{db_path}",
+            parameters={'query': 'SELECT * FROM sales', 'params': {}, 'pushdown': True}
+        ))
+        data_frames = engine._load_data_frames(engine._get_data_sources_to_process())
+        loaded = next(iter(data_frames.values()))
+
+        assert list(loaded.columns) == ['地区', '销售额', '成本']
+        assert set(loaded['地区']) == {'华东', '华南'}
+        assert len(loaded) == full['地区'].isin(['华东', '华南']).sum()
+
+        plan = engine.explain()
+        assert 'WHERE 子句' in plan and '3 列' in plan
+
+
+if __name__ == "__main__":
+    test_formula_columns()
+    test_csv_projection_loads_only_used_columns()
+    test_sql_projection_and_predicate_pushdown()
+    print("\n✅ 所有测试通过！")
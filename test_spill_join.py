@@ -0,0 +1,80 @@
+import sys
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from auto_report import AutoReportEngine, DataProcessor, DataSourceConfig, ReportConfig, SpillJoiner
+
+
+def _sources(rows=20000):
+    rng = np.random.default_rng(11)
+    orders = pd.DataFrame({'客户ID': rng.integers(0, 3000, rows), '金额': rng.integers(1, 1000, rows).astype(float),
+                           '类别': rng.choice(['A', 'B', 'C'], rows)})
+    customers = pd.DataFrame({'客户ID': np.arange(0, 3000, 2), '地区': rng.choice(['华东', '华南'], 1500)})
+    return orders, customers
+
+
+def test_spill_join_matches_in_memory_merge():
+    """超过内存预算时自动使用溢写连接，结果与内存中合并一致"""
+    orders, customers = _sources()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        orders_path = os.path.join(tmp_dir, 'orders.csv')
+        customers_path = os.path.join(tmp_dir, 'customers.csv')
+        orders.to_csv(orders_path, index=False)
+        customers.to_csv(customers_path, index=False)
+        chunked = {'cache': False, 'chunksize': 3000}
+        engine = AutoReportEngine(ReportConfig(
+            report_name="溢写连接测试", output_format=["excel"],
+            data_sources=[DataSourceConfig(type='csv', path=orders_path, name='订单', parameters=chunked),
+                          DataSourceConfig(type='csv', path=customers_path, name='客户', parameters=chunked)],
+            parameters={'memory_budget': '64KB', 'spill_dir': tmp_dir},
+            filters={'类别': ['A', 'B']},
+            calculations=[{'operation': 'groupby', 'group_by': ['地区'], 'aggregate': {'金额': 'sum'}}],
+        ))
+        sources = engine._get_data_sources_to_process()
+        assert engine._should_spill(sources)
+        df, metrics = engine._run_spill_join(sources)
+
+        merged = orders.merge(customers, on='客户ID')
+        expected = DataProcessor.apply_calculations(
+            DataProcessor.apply_filters(merged, engine.config.filters), engine.config.calculations
+        )
+        pd.testing.assert_frame_equal(df.sort_values('地区').reset_index(drop=True), expected, check_dtype=False)
+        assert metrics['total_records'] == 2
+        # 溢写文件在连接结束后删除
+        assert set(os.listdir(tmp_dir)) == {'orders.csv', 'customers.csv'}
+
+        engine.config.parameters = {'memory_budget': '1GB'}
+        assert not engine._should_spill(sources)
+
+
+def test_spill_joiner_partitions_mixed_key_types():
+    """数值键与文本键按统一的比较类型分区，左连接保留无匹配的行"""
+    orders, customers = _sources(rows=5000)
+    customers = customers.assign(客户ID=customers['客户ID'].astype(str))
+    kinds = SpillJoiner.key_kinds(orders, customers, ['客户ID'])
+    assert kinds == {'客户ID': 'numeric'}
+
+    for workers in (1, 2):
+        with SpillJoiner(['客户ID'], kinds, how='left', partitions=8, max_workers=workers) as joiner:
+            joiner.add('left', [orders.iloc[:2000], orders.iloc[2000:]])
+            joiner.add('right', [customers])
+            result = pd.concat(joiner.iter_results(), ignore_index=True)
+            spill_dir = joiner.spill_dir
+        assert not os.path.exists(spill_dir)
+        assert len(result) == len(orders)
+        assert list(result.columns) == ['客户ID', '金额', '类别', '地区']
+        assert result['地区'].isna().sum() == (orders['客户ID'] % 2 == 1).sum()
+
+    assert SpillJoiner.parse_size('1.5GB') == int(1.5 * 1024 ** 3) and SpillJoiner.parse_size(2048) == 2048
+
+
+if __name__ == "__main__":
+    test_spill_join_matches_in_memory_merge()
+    test_spill_joiner_partitions_mixed_key_types()
+    print("\n✅ 所有测试通过！")
@@ -0,0 +1,160 @@
+import sys
+import os
+import sqlite3
+import tempfile
+
+import pandas as pd
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from auto_report import (
+    DataProcessor, DataSourceConfig, ReportConfig, ScheduleManager, SQLDataSource,
+    SQLEngineRegistry, engine_registry
+)
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'customer.db')
+CONNECTION_STR = f"sqlite:///{DB_PATH}"
+
+
+def _sql_config(**parameters):
+    return ReportConfig(
+        report_name="SQL测试",
+        output_format=["excel"],
+        data_source_type="sql",
+        data_source_path=CONNECTION_STR,
+        parameters={'query': 'SELECT customer_id, customer_name, region FROM customers', **parameters}
+    )
+
+
+def test_engine_registry_reuses_engines():
+    """相同连接和连接池选项复用同一引擎"""
+    registry = SQLEngineRegistry()
+    first = registry.get_engine(CONNECTION_STR, pool_size=2)
+    second = registry.get_engine(CONNECTION_STR, pool_size=2)
+    other = registry.get_engine(CONNECTION_STR, pool_size=3)
+
+    assert first is second
+    assert first is not other
+    stats = registry.get_stats()
+    assert (stats['engines'], stats['hits'], stats['misses']) == (2, 1, 2)
+    registry.dispose_all()
+    assert registry.get_stats()['engines'] == 0
+
+
+def test_sql_source_uses_global_registry():
+    """多次加载同一SQL数据源时命中连接池"""
+    source = SQLDataSource()
+    source.load_data(_sql_config(pool_size=2))
+    hits = engine_registry.hits
+    df = source.load_data(_sql_config(pool_size=2))
+
+    assert engine_registry.hits == hits + 1
+    assert list(df.columns) == ['customer_id', 'customer_name', 'region']
+
+
+def test_scheduler_warms_up_sql_pools():
+    """启动调度器时预热SQL数据源的连接池"""
+    registry_misses = engine_registry.misses
+    scheduler = ScheduleManager()
+    config = ReportConfig(
+        report_name="预热测试",
+        output_format=["excel"],
+        data_sources=[DataSourceConfig(type='sql', path=CONNECTION_STR, parameters={'pool_size': 4})]
+    )
+    scheduler.add_task(config.report_name, config, "00 09 * * *", [])
+    try:
+        scheduler.start_scheduler()
+        assert engine_registry.misses == registry_misses + 1
+        assert engine_registry.warm_up([(CONNECTION_STR, {'pool_size': 4})]) == {CONNECTION_STR: True}
+    finally:
+        scheduler.stop_scheduler()
+
+
+def test_sql_streaming_batches():
+    """流式读取按批次产出，索引连续且批次类型一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'orders.db')
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE orders (order_id INTEGER, amount REAL, region TEXT)")
+            conn.executemany(
+                "INSERT INTO orders VALUES (?, ?, ?)",
+                [(i, i * 1.5, None if i >= 200 else ['华东', '华南'][i % 2]) for i in range(250)]
+            )
+
+        config = ReportConfig(
+            report_name="SQL流式测试",
+            output_format=["excel"],
+            data_source_type="sql",
+            data_source_path=f"sqlite:///{db_path}",
+            parameters={'query': 'SELECT * FROM orders WHERE order_id >= :start',
+                        'params': {'start': 10}, 'chunksize': 60, 'streaming': True}
+        )
+        source = SQLDataSource()
+        assert source.should_stream(config)
+
+        batches = list(source.iter_chunks(config))
+        assert [len(batch) for batch in batches] == [60, 60, 60, 60]
+        assert all(batch['region'].dtype == batches[0]['region'].dtype for batch in batches)
+        combined = pd.concat(batches)
+        assert combined.index.equals(pd.RangeIndex(0, 240))
+        pd.testing.assert_frame_equal(combined, source.load_data(config), check_dtype=False)
+
+        empty = ReportConfig(**{**config.__dict__, 'parameters': {
+            'query': 'SELECT * FROM orders WHERE order_id < 0', 'chunksize': 60}})
+        batches = list(source.iter_chunks(empty))
+        assert len(batches) == 1 and batches[0].empty
+        assert list(batches[0].columns) == ['order_id', 'amount', 'region']
+
+
+def _make_orders_db(db_path, rows=300):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE orders (order_id INTEGER, amount REAL, region TEXT, category TEXT)")
+        conn.executemany(
+            "INSERT INTO orders VALUES (?, ?, ?, ?)",
+            [(i, float(i % 17) * 10, ['华东', '华南', '华北', None][i % 4], ['A', 'B', 'C'][i % 3])
+             for i in range(rows)]
+        )
+
+
+def test_groupby_and_pivot_pushdown_match_pandas():
+    """下推到SQL的分组/透视结果与pandas计算一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'orders.db')
+        _make_orders_db(db_path)
+        config = ReportConfig(
+            report_name="下推测试",
+            output_format=["excel"],
+            data_source_type="sql",
+            data_source_path=f"sqlite:///{db_path}",
+            parameters={'query': 'SELECT * FROM orders WHERE order_id >= :start', 'params': {'start': 5}}
+        )
+        source = SQLDataSource()
+        raw = source.load_data(config)
+        filters = {'category': ['A', 'B'], 'amount': {'min': 20, 'max': 150}}
+
+        calculations = [
+            {'operation': 'groupby', 'group_by': ['region'], 'aggregate': {'amount': 'sum', 'order_id': 'count'}},
+            {'operation': 'groupby', 'group_by': ['region', 'category'],
+             'aggregate': {'amount': ['sum', 'mean', 'max'], 'order_id': 'min'}},
+            {'operation': 'pivot', 'index': ['region'], 'columns': ['category'], 'values': ['amount'],
+             'aggfunc': 'sum'},
+        ]
+        for calc in calculations:
+            expected = DataProcessor.apply_calculations(DataProcessor.apply_filters(raw, filters), [calc])
+            pushed = source.load_pushdown(config, filters, calc)
+            assert pushed is not None
+            pd.testing.assert_frame_equal(pushed, expected, check_dtype=False)
+
+        unsupported = {'operation': 'groupby', 'group_by': ['region'], 'aggregate': {'amount': 'median'}}
+        assert source.load_pushdown(config, filters, unsupported) is None
+        assert source.load_pushdown(config, {'amount': {'operator': 'gt', 'value': 1}}, calculations[0]) is None
+
+
+if __name__ == "__main__":
+    test_engine_registry_reuses_engines()
+    test_sql_source_uses_global_registry()
+    test_scheduler_warms_up_sql_pools()
+    test_sql_streaming_batches()
+    test_groupby_and_pivot_pushdown_match_pandas()
+    print("\n✅ 所有测试通过！")
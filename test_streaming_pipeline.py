@@ -0,0 +1,135 @@
+import sys
+import os
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# 添加项目路径到系统路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from auto_report import (
+    CSVDataSource, DataProcessor, ReportConfig, StreamingPipeline
+)
+
+
+def _make_sales_csv(path, rows=5000):
+    """生成测试用的销售CSV文件"""
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        '地区': rng.choice(['华东', '华南', '华北'], rows),
+        '类别': rng.choice(['A', 'B', 'C', 'D'], rows),
+        '销售额': rng.integers(100, 10000, rows).astype(float),
+        '成本': rng.integers(50, 5000, rows).astype(float),
+    })
+    df.loc[::97, '成本'] = np.nan
+    df.to_csv(path, index=False)
+    return df
+
+
+def _csv_config(path, **parameters):
+    return ReportConfig(
+        report_name="流式测试",
+        output_format=["excel"],
+        data_source_type="csv",
+        data_source_path=path,
+        parameters={"parse_dates": False, **parameters}
+    )
+
+
+def test_streaming_matches_in_memory_metrics():
+    """流式处理的结果和指标应与整体加载一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'sales.csv')
+        _make_sales_csv(path)
+        filters = {'地区': ['华东', '华南']}
+        calculations = [{'column': '毛利', 'formula': '销售额 - 成本'}]
+
+        source = CSVDataSource()
+        full = pd.read_csv(path)
+        expected_df = DataProcessor.apply_calculations(
+            DataProcessor.apply_filters(full, filters), calculations
+        )
+        expected = DataProcessor.calculate_metrics(expected_df)
+
+        pipeline = StreamingPipeline(filters, calculations)
+        df, metrics = pipeline.run(source.iter_chunks(_csv_config(path, chunksize=700)))
+
+        assert pipeline.chunks_read > 1
+        assert len(df) == len(expected_df)
+        assert metrics['total_records'] == expected['total_records']
+        assert metrics['missing_values'] == expected['missing_values']
+        for col, stats in expected['numeric_stats'].items():
+            for name in ('mean', 'min', 'max', 'std'):
+                assert np.isclose(metrics['numeric_stats'][col][name], stats[name])
+        for col, stats in expected['categorical_stats'].items():
+            assert metrics['categorical_stats'][col] == stats
+
+
+def test_streaming_partial_groupby():
+    """分组聚合以部分聚合方式逐块执行，结果与pandas一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'sales.csv')
+        full = _make_sales_csv(path)
+        calculations = [{
+            'operation': 'groupby',
+            'group_by': ['地区', '类别'],
+            'aggregate': {'销售额': ['sum', 'mean'], '成本': 'count'}
+        }]
+
+        expected = DataProcessor.apply_calculations(full, calculations)
+        pipeline = StreamingPipeline({}, calculations)
+        df, _ = pipeline.run(CSVDataSource().iter_chunks(_csv_config(path, chunksize=300)))
+
+        pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+
+def test_streaming_reserved_parameters_not_passed_to_reader():
+    """引擎参数不应传递给 pd.read_csv"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'sales.csv')
+        _make_sales_csv(path, rows=100)
+        config = _csv_config(path, streaming=True, chunksize=30)
+
+        source = CSVDataSource()
+        assert source.should_stream(config)
+        assert len(source.load_data(config)) == 100
+
+
+def test_streaming_metrics_include_category_columns():
+    """压缩为分类类型的列在流式指标中与 calculate_metrics 一样按分类列统计"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'sales.csv')
+        df = DataProcessor.optimize_dtypes(_make_sales_csv(path))
+        assert isinstance(df['地区'].dtype, pd.CategoricalDtype)
+        expected = DataProcessor.calculate_metrics(df)
+
+        for approximate in (None, True):
+            pipeline = StreamingPipeline(approximate=approximate)
+            # 分块中部分类别不出现，只统计实际出现的值
+            chunks = [df.iloc[start:start + 700] for start in range(0, len(df), 700)]
+            chunks.insert(0, df[df['类别'] == 'A'].head(50))
+            _, metrics = pipeline.run(chunks)
+            assert set(metrics['categorical_stats']) == set(expected['categorical_stats']) == {'地区', '类别'}
+
+        pipeline = StreamingPipeline()
+        _, metrics = pipeline.run(df.iloc[start:start + 700] for start in range(0, len(df), 700))
+        assert metrics['categorical_stats'] == expected['categorical_stats']
+
+        # 字符串列显式按 str 类型选择，不依赖 pandas 已弃用的兼容路径
+        text = pd.read_csv(path)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            expected = DataProcessor.calculate_metrics(text)
+            _, metrics = StreamingPipeline().run([text.iloc[:2000], text.iloc[2000:]])
+        assert set(expected['categorical_stats']) == {'地区', '类别'}
+        assert metrics['categorical_stats'] == expected['categorical_stats']
+
+
+if __name__ == "__main__":
+    test_streaming_matches_in_memory_metrics()
+    test_streaming_partial_groupby()
+    test_streaming_reserved_parameters_not_passed_to_reader()
+    test_streaming_metrics_include_category_columns()
+    print("\n✅ 所有测试通过！")